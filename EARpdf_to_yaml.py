@@ -10,14 +10,23 @@ import sys
 from collections import OrderedDict
 
 import pdfplumber
-import yaml
+from pdfminer.pdftypes import resolve1
 
+from ear.eardata import EAR_DATA_NAME, decode_ear_data, save_to_yaml
 
-def custom_representer(dumper, data):
-    return dumper.represent_dict(data.items())
 
-
-yaml.add_representer(OrderedDict, custom_representer)
+# Data embedded by make_EAR.py (EAR.json attachment), None for PDFs without it
+def extract_embedded_data(pdf_path):
+    with pdfplumber.open(pdf_path) as pdf:
+        names = resolve1(pdf.doc.catalog.get("Names"))
+        embedded_files = resolve1(names.get("EmbeddedFiles")) if isinstance(names, dict) else None
+        name_list = resolve1(embedded_files.get("Names")) if isinstance(embedded_files, dict) else None
+        # name tree leaf: [name1, filespec1, name2, filespec2, ...]
+        for name, filespec in zip((name_list or [])[::2], (name_list or [])[1::2]):
+            if resolve1(name) == EAR_DATA_NAME.encode():
+                stream = resolve1(resolve1(resolve1(filespec)["EF"])["F"])
+                return decode_ear_data(stream.get_data())
+    return None
 
 
 def extract_text_from_pdf(pdf_path):
@@ -278,14 +287,23 @@ def extract_pipeline_info(text, pipeline_name):
                 key, value = line.split(":", 1)
                 key = key.strip().replace("|_", "").strip()
                 value = value.strip()
-                if key == "ver" or (key == "key param" and value.lower() != "na"):
+                if key == "ver":
                     pipeline_info[current_tool][key] = value
+                elif key == "key param" and value.lower() != "na":
+                    # one line per parameter in the PDF, kept together as in the EAR YAML files
+                    previous = pipeline_info[current_tool].get(key)
+                    pipeline_info[current_tool][key] = f"{previous}/{value}" if previous else value
 
     return pipeline_info
 
 
 #####
 def extract_data_from_pdf(pdf_path):
+    # PDFs made by make_EAR.py since the data is embedded in them
+    data = extract_embedded_data(pdf_path)
+    if data is not None:
+        return data
+
     text = extract_text_from_pdf(pdf_path)
 
     data = extract_basic_info(text)
@@ -308,54 +326,6 @@ def extract_data_from_pdf(pdf_path):
     return data
 
 
-def save_to_yaml(data, output_path):
-    # Custom YAML dumper to control formatting
-    class CustomDumper(yaml.Dumper):
-        def increase_indent(self, flow=False, indentless=False):
-            return super(CustomDumper, self).increase_indent(flow, False)
-
-    def str_presenter(dumper, data):
-        if "\n" in data:  # check for multiline string
-            return dumper.represent_scalar("tag:yaml.org,2002:str", data, style="|")
-        return dumper.represent_scalar("tag:yaml.org,2002:str", data)
-
-    yaml.add_representer(str, str_presenter)
-
-    # Convert to YAML string
-    yaml_string = yaml.dump(
-        data, Dumper=CustomDumper, default_flow_style=False, sort_keys=False
-    )
-
-    # Post-process the YAML string
-    lines = yaml_string.split("\n")
-    processed_lines = []
-    sections_to_add_space_before = [
-        "EBP metrics:",
-        "Metrics:",
-        "Curator notes:",
-        "BUSCO:",
-        "Data:",
-        "Assembly pipeline:",
-        "Curation pipeline:",
-        "Submitter:",
-        "Date and time:",
-    ]
-
-    for i, line in enumerate(lines):
-        if any(line.startswith(section) for section in sections_to_add_space_before):
-            processed_lines.append("")  # Add a blank line before these sections
-        processed_lines.append(line)
-        if line.startswith("Tags:") or line.startswith("Order:"):
-            processed_lines.append("")  # Add a blank line after Tags and Order
-
-    # Join lines back together
-    processed_yaml = "\n".join(processed_lines)
-
-    # Write to file
-    with open(output_path, "w") as yaml_file:
-        yaml_file.write(processed_yaml.strip() + "\n")
-
-
 def main():
     parser = argparse.ArgumentParser(
         description=f"EARpdf_to_yaml {version} - Parse EAR PDF and convert to YAML",
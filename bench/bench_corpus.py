@@ -0,0 +1,154 @@
+# bench_corpus.py
+# ERGA Sequencing and Assembly Committee
+#
+# Scaling benchmark of the scans of the Assembly_Reports/ tree, on synthetic corpora of
+# bench/make_corpus.py (written once in --work-dir, and reused by later runs):
+#   python bench/bench_corpus.py --sizes 1000 10000 100000 --jobs 8 --output corpus_results.json
+# For each corpus size it times, in a fresh process each, the steps of the glob + load everything
+# design of get_EARs_bp.py: listing the YAMLs, reading them, parsing them with yaml.safe_load (and
+# with the libyaml CSafeLoader, when PyYAML has it), and get_EARs_bp.py --all-tags itself. A scan
+# taking longer than --timeout is recorded as such, and not run on the larger corpora.
+
+import argparse
+import contextlib
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.bench_report import peak_rss_mb
+from bench.make_corpus import make_corpus
+
+
+SCANS = ['glob', 'read', 'safe_load', 'csafe_load', 'get_EARs_bp']
+
+
+def yaml_files(root):
+    return glob.glob(os.path.join(root, "Assembly_Reports", "*", "*", "*.yaml"))
+
+
+# One scan of the corpus in root, in the child process: print its wall time and peak RSS as JSON
+def run_scan(scan, root):
+    start = time.perf_counter()
+    if scan == 'glob':
+        files = len(yaml_files(root))
+    elif scan == 'read':
+        files = 0
+        for yaml_file in yaml_files(root):
+            with open(yaml_file, 'r') as file:
+                file.read()
+            files += 1
+    elif scan in ('safe_load', 'csafe_load'):
+        loader = yaml.SafeLoader if scan == 'safe_load' else yaml.CSafeLoader
+        reports = []
+        for yaml_file in yaml_files(root):
+            with open(yaml_file, 'r') as file:
+                reports.append(yaml.load(file, Loader=loader))
+        files = len(reports)
+    elif scan == 'get_EARs_bp':
+        import get_EARs_bp
+        os.chdir(root)
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            get_EARs_bp.process_all_tags(show_full=True)
+        files = len(yaml_files(root))
+    seconds = time.perf_counter() - start
+    print(json.dumps({'seconds': seconds, 'files': files, 'peak_rss_mb': peak_rss_mb()}))
+
+
+def time_scan(scan, root, runs, timeout):
+    samples = []
+    for _ in range(runs):
+        try:
+            process = subprocess.run([sys.executable, os.path.abspath(__file__), '--scan', scan, root],
+                                     stdout=subprocess.PIPE, check=True, universal_newlines=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return {'timeout': timeout}
+        samples.append(json.loads(process.stdout.strip().splitlines()[-1]))
+    seconds = statistics.median(sample['seconds'] for sample in samples)
+    files = samples[0]['files']
+    return {
+        'seconds_median': seconds,
+        'us_per_file': 1e6 * seconds / files if files else None,
+        'peak_rss_mb': max(sample['peak_rss_mb'] for sample in samples),
+        'files': files,
+    }
+
+
+# The corpus of the given size in work_dir, written unless a previous run left it there
+def corpus(work_dir, reports, seed, jobs):
+    root = os.path.join(work_dir, f"corpus_{reports}_{seed}")
+    try:
+        with open(os.path.join(root, "corpus.json"), 'r') as file:
+            if json.load(file).get('reports') == reports:
+                return root
+    except (OSError, ValueError):
+        pass
+    start = time.perf_counter()
+    make_corpus(root, reports, seed, jobs=jobs)
+    print(f"{reports} reports written in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return root
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == '--scan':
+        return run_scan(*sys.argv[2:])
+
+    parser = argparse.ArgumentParser(description='Scaling benchmark of the scans of Assembly_Reports/ on synthetic corpora')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='Corpus sizes, in reports (default: %(default)s)')
+    parser.add_argument('--scan', action='append', choices=SCANS, default=None, help='Scan to time, can be repeated (default: all)')
+    parser.add_argument('--runs', type=int, default=3, help='Runs of each scan (default: %(default)s)')
+    parser.add_argument('--timeout', type=float, default=600, help='Seconds before giving up on a scan (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=1, help='Seed of the corpora (default: %(default)s)')
+    parser.add_argument('--jobs', type=int, default=1, help='Worker processes writing the corpora (default: %(default)s)')
+    parser.add_argument('--work-dir', type=str, default=None, help='Directory of the corpora (default: a temporary one)')
+    parser.add_argument('--output', type=str, default=None, help='Write the results to this JSON file')
+    args = parser.parse_args()
+
+    scans = args.scan or SCANS
+    if 'csafe_load' in scans and not hasattr(yaml, 'CSafeLoader'):
+        print("PyYAML was built without libyaml, skipping csafe_load", file=sys.stderr)
+        scans = [scan for scan in scans if scan != 'csafe_load']
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='ear_corpus_')
+    results = {
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'pyyaml': yaml.__version__,
+        'platform': platform.platform(),
+        'sizes': {},
+    }
+    timed_out = set()
+    for reports in sorted(args.sizes):
+        root = corpus(work_dir, reports, args.seed, args.jobs)
+        results['sizes'][str(reports)] = {}
+        for scan in scans:
+            if scan in timed_out:
+                continue
+            result = time_scan(scan, root, args.runs, args.timeout)
+            results['sizes'][str(reports)][scan] = result
+            if 'timeout' in result:
+                timed_out.add(scan)
+                print(f"{reports:>8} {scan:<12} timed out after {args.timeout:.0f}s", file=sys.stderr)
+            else:
+                print(f"{reports:>8} {scan:<12} {result['seconds_median']:>9.3f}s {result['us_per_file']:>9.1f} us/file "
+                      f"{result['peak_rss_mb']:>8.0f} MB", file=sys.stderr)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# bench_gfastats.py
+# ERGA Sequencing and Assembly Committee
+#
+# Micro-benchmark of the gfastats report extraction on large --nstar-report files, in the
+# gfastats CLI (colon) and Galaxy (tab) formats:
+#   python bench/bench_gfastats.py --lines 20000
+# It compares the per-key regex scans make_EAR.py used to run with the single scan of all the
+# keys in ear/artifacts.py.
+
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ear.artifacts import GfastatsReport, scan_gfastats
+from ear.report import keys
+
+
+# A gfastats --nstar-report with the summary first, the N*/L* series, then filler sequence lines
+# up to the requested number of lines
+def make_report(lines, separator=": "):
+    report = ["+++Assembly summary+++"]
+    values = {
+        "# contigs": "1,532", "# scaffolds": "412", "Total scaffold length": "3,272,090,000",
+        "Average scaffold length": "7,941,966.02", "Scaffold N50": "143,552,233", "Scaffold auN": "152,118,227.61",
+        "Scaffold L50": "9", "Scaffold L90": "24", "Largest scaffold": "248,956,422",
+        "Smallest scaffold": "1,000", "Total contig length": "3,270,412,551", "Contig N50": "56,413,054",
+        "Contig auN": "60,317,224.99", "Contig L50": "20", "Contig L90": "61", "# gaps in scaffolds": "1,120",
+        "Total gap length in scaffolds": "1,677,449", "Average gap length in scaffolds": "1,497.72",
+        "Base composition (A:C:G:T)": "969,812,228:665,829,128:668,070,118:966,701,077",
+        "GC content %": "40.77", "# soft-masked bases": "0", "# segments": "1,532", "# edges": "0",
+    }
+    report += [f"{key}{separator}{value}" for key, value in values.items()]
+    for series in ("Scaffold", "Contig", "Gap"):
+        for n in range(1, 101):
+            report.append(f"{series} N{n}{separator}{(101 - n) * 1_000_003:,}")
+            report.append(f"{series} L{n}{separator}{n}")
+    n = 0
+    while len(report) < lines:
+        n += 1
+        report.append(f"Sequence scaffold_{n} length{separator}{n * 7919:,}")
+    return "\n".join(report) + "\n"
+
+
+# make_EAR.py up to v24.10.15: one regex built and run over the whole report per key
+def legacy_extract(content, keys):
+    values = []
+    for key in keys:
+        values.append(re.findall(f"{key}: (.+)", content)[0])
+    return values
+
+
+# Galaxy version of the above, trying the colon format and then the tab one
+def legacy_glxy_extract(content, keys):
+    values = []
+    for key in keys:
+        match = re.search(rf"{re.escape(key)}:\s*(.+)", content)
+        if not match:
+            match = re.search(rf"{re.escape(key)}\t(.+)", content)
+        values.append(match.group(1).strip() if match else "N/A")
+    return values
+
+
+def single_scan_extract(content, keys):
+    return GfastatsReport("bench", scan_gfastats(content)).extract(keys)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmark of the gfastats report extraction')
+    parser.add_argument('--lines', type=int, default=10000, help='Lines in the generated report (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=5, help='Best of this many runs (default: %(default)s)')
+    parser.add_argument('--number', type=int, default=20, help='Extractions per run (default: %(default)s)')
+    args = parser.parse_args()
+
+    formats = [("colon", make_report(args.lines, ": ")), ("tab", make_report(args.lines, "\t"))]
+    methods = [
+        ("per-key regex", legacy_extract, ("colon",)),
+        ("per-key regex (glxy)", legacy_glxy_extract, ("colon", "tab")),
+        ("single scan", single_scan_extract, ("colon", "tab")),
+    ]
+
+    print(f"{'method':<22}{'format':>8}{'ms/report':>12}")
+    for name, extract, supported in methods:
+        for format_name, content in formats:
+            if format_name not in supported:
+                continue
+            expected = single_scan_extract(formats[0][1], keys)
+            assert extract(content, keys) == expected, f"{name} disagrees on the {format_name} format"
+            best = min(timeit.repeat(lambda: extract(content, keys), repeat=args.repeat, number=args.number))
+            print(f"{name:<22}{format_name:>8}{best / args.number * 1000:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# bench_report.py
+# ERGA Sequencing and Assembly Committee
+#
+# End-to-end benchmark of make_report on the synthetic inputs of bench/make_fixtures.py, with the
+# local GoaT stand-in of bench/goat_stub.py, so the numbers do not depend on the network:
+#   python bench/bench_report.py --output bench_results.json
+#   python bench/bench_report.py --scenario diploid --scenario huge-images --runs 5 --compare bench_results.json
+# Each run is a fresh process (no warm caches, peak RSS of that report only) building the report
+# from scratch. The results (wall time, time per stage, peak RSS, PDF size) are written as JSON,
+# and --compare flags the scenarios slower, or heavier, than in a previous result file.
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.goat_stub import serve
+from bench.make_fixtures import SCENARIOS, SPECIES, make_fixture
+
+
+# Peak RSS of this process in MB (ru_maxrss is in kB on Linux, in bytes on macOS)
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / (1 << 10)
+
+
+# One report, in the child process: print its wall time, stages and peak RSS as JSON
+def run_one(yaml_file, output_dir, goat_url):
+    import make_EAR
+    from ear.taxonomy import GoatClient, GoatTaxonomy
+
+    start = time.perf_counter()
+    result = make_EAR.make_report(yaml_file, output_dir, taxonomy_provider=GoatTaxonomy(client=GoatClient(goat_url)), force=True)
+    seconds = time.perf_counter() - start
+    print(json.dumps({'seconds': seconds, 'stages': result['timings'], 'peak_rss_mb': peak_rss_mb(), 'pdf': os.path.abspath(result['pdf'])}))
+
+
+def run_scenario(name, yaml_file, work_dir, goat_url, runs):
+    output_dir = os.path.join(work_dir, name, 'out')
+    os.makedirs(output_dir, exist_ok=True)
+    env = dict(os.environ, XDG_CACHE_HOME=os.path.join(work_dir, name, 'cache'))
+    samples = []
+    for _ in range(runs):
+        # make_report logs to EAR.log in the working directory
+        process = subprocess.run([sys.executable, os.path.abspath(__file__), '--run-one', yaml_file, output_dir, goat_url],
+                                 cwd=output_dir, env=env, stdout=subprocess.PIPE, check=True, universal_newlines=True)
+        sample = json.loads(process.stdout.strip().splitlines()[-1])
+        sample['pdf_bytes'] = os.path.getsize(sample.pop('pdf'))
+        samples.append(sample)
+
+    seconds = [sample['seconds'] for sample in samples]
+    stages = {}
+    for sample in samples:
+        for record in sample['stages']:
+            stages.setdefault(record['stage'], []).append(record['seconds'])
+    return {
+        'runs': runs,
+        'seconds_min': min(seconds),
+        'seconds_median': statistics.median(seconds),
+        'peak_rss_mb': max(sample['peak_rss_mb'] for sample in samples),
+        'pdf_bytes': samples[-1]['pdf_bytes'],
+        'stages_median': {stage: statistics.median(seconds) for stage, seconds in stages.items()},
+    }
+
+
+# Scenarios slower (median seconds) or heavier (peak RSS, PDF size) than in the previous results,
+# beyond the relative threshold
+def compare(results, previous, threshold):
+    regressions = []
+    for name, current in results['scenarios'].items():
+        before = previous.get('scenarios', {}).get(name)
+        if before is None:
+            continue
+        for metric in ('seconds_median', 'peak_rss_mb', 'pdf_bytes'):
+            if before.get(metric) and current[metric] > before[metric] * (1 + threshold):
+                regressions.append(f"{name}: {metric} {before[metric]:.6g} -> {current[metric]:.6g} (+{100 * (current[metric] / before[metric] - 1):.1f}%)")
+    return regressions
+
+
+def main():
+    if len(sys.argv) == 5 and sys.argv[1] == '--run-one':
+        return run_one(*sys.argv[2:])
+
+    parser = argparse.ArgumentParser(description='End-to-end benchmark of make_report on synthetic inputs')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), default=None, help='Scenario to run, can be repeated (default: all)')
+    parser.add_argument('--runs', type=int, default=3, help='Reports built per scenario (default: %(default)s)')
+    parser.add_argument('--image-size', type=int, default=None, help='Size of the PNGs of the huge-images scenario (default: 8000)')
+    parser.add_argument('--work-dir', type=str, default=None, help='Directory for the inputs and reports (default: a temporary one)')
+    parser.add_argument('--output', type=str, default=None, help='Write the results to this JSON file')
+    parser.add_argument('--compare', type=str, default=None, help='Previous results to compare with, exit 1 on regressions')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Relative change counted as a regression (default: %(default)s)')
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='ear_bench_')
+    server = serve(port=0, species=SPECIES)
+    server.RequestHandlerClass.log_message = lambda *args: None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    goat_url = f"http://127.0.0.1:{server.server_address[1]}/api/v2"
+
+    results = {
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'scenarios': {},
+    }
+    try:
+        for name in args.scenario or list(SCENARIOS):
+            options = dict(SCENARIOS[name])
+            if name == 'huge-images' and args.image_size:
+                options['image_size'] = args.image_size
+            start = time.perf_counter()
+            yaml_file = make_fixture(os.path.join(work_dir, name, 'inputs'), **options)
+            print(f"{name}: inputs written in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+            results['scenarios'][name] = dict(options, **run_scenario(name, yaml_file, work_dir, goat_url, args.runs))
+            scenario = results['scenarios'][name]
+            print(f"{name}: {scenario['seconds_median']:.2f}s median, {scenario['peak_rss_mb']:.0f} MB peak RSS, {scenario['pdf_bytes']} bytes PDF", file=sys.stderr)
+    finally:
+        server.shutdown()
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, 'r') as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# goat_stub.py
+# ERGA Sequencing and Assembly Committee
+#
+# Local stand-in for the two GoaT API endpoints used by make_EAR.py (search by species name and
+# record by TxID, several comma-separated TxIDs included unless --single-record), to try the taxonomy client without
+# network access, or under slow or failing conditions:
+#   python bench/goat_stub.py --port 8089 --delay 0.2 --fail 2 &
+#   python make_EAR.py EAR.yaml --goat-url http://127.0.0.1:8089/api/v2 --no-taxonomy-cache
+# Species listed in --data (JSON: {"Species name": {"taxon_id": ..., "class": ..., "order": ...,
+# "ploidy": ..., "haploid_number": ...}}) are answered as given, any other name gets made-up but
+# stable values.
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+SPECIES = {
+    "Homo sapiens": {"taxon_id": "9606", "class": "Mammalia", "order": "Primates", "ploidy": 2, "haploid_number": 23},
+    "Drosophila melanogaster": {"taxon_id": "7227", "class": "Insecta", "order": "Diptera", "ploidy": 2, "haploid_number": 4},
+}
+
+
+class GoatStub:
+    def __init__(self, species, delay=0, fail=0, fail_rate=0, single_record=False):
+        self.species = dict(species)
+        self.taxa = {}
+        self.delay = delay
+        self.fail = fail
+        self.fail_rate = fail_rate
+        self.single_record = single_record
+        self.requests = 0
+        self.lock = threading.Lock()
+        for name in self.species:
+            self.taxon(name)
+
+    def taxon(self, name):
+        if name not in self.species:
+            taxon_id = str(zlib.crc32(name.lower().encode()) % 10_000_000 + 10_000_000)
+            self.species[name] = {"taxon_id": taxon_id, "class": "Stubclass", "order": "Stuborder", "ploidy": 2, "haploid_number": taxon_id[-1]}
+        data = self.species[name]
+        self.taxa[str(data["taxon_id"])] = data
+        return data
+
+    # the next answer fails: the first --fail requests, then at random with --fail-rate
+    def failing(self):
+        with self.lock:
+            self.requests += 1
+            if self.fail > 0:
+                self.fail -= 1
+                return True
+        return random.random() < self.fail_rate
+
+    def search(self, query):
+        name = query[len("tax_name("):-1] if query.startswith("tax_name(") and query.endswith(")") else query
+        data = self.taxon(name)
+        lineage = [
+            {"taxon_rank": "order", "scientific_name": data["order"]},
+            {"taxon_rank": "class", "scientific_name": data["class"]},
+        ]
+        return {"results": [{"result": {"taxon_id": str(data["taxon_id"]), "scientific_name": name, "lineage": lineage}}]}
+
+    def records(self, record_ids):
+        records = []
+        for taxon_id in record_ids:
+            data = self.taxa.get(taxon_id)
+            if data is None:
+                continue
+            attributes = {
+                "ploidy": {"value": data["ploidy"], "aggregation_source": "direct"},
+                "haploid_number": {"value": data["haploid_number"], "aggregation_source": "direct"},
+            }
+            records.append({"record": {"taxon_id": taxon_id, "attributes": attributes}, "recordId": taxon_id})
+        return {"records": records}
+
+
+class GoatStubHandler(BaseHTTPRequestHandler):
+    # keep-alive, as GoaT does
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        stub = self.server.stub
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        time.sleep(stub.delay)
+        if stub.failing():
+            return self.answer(503, {"error": "stub failure"})
+        if url.path.endswith("/search") and "query" in params:
+            return self.answer(200, stub.search(params["query"][0]))
+        if url.path.endswith("/record") and "recordId" in params:
+            record_ids = params["recordId"][0].split(",")
+            if stub.single_record and len(record_ids) > 1:
+                return self.answer(400, {"error": "one recordId per request"})
+            return self.answer(200, stub.records(record_ids))
+        return self.answer(404, {"error": f"unknown endpoint {url.path}"})
+
+    def answer(self, status, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        sys.stderr.write(f"[goat_stub #{self.server.stub.requests}] {format % args}\n")
+
+
+def serve(port=8089, species=SPECIES, delay=0, fail=0, fail_rate=0, single_record=False):
+    server = ThreadingHTTPServer(("127.0.0.1", port), GoatStubHandler)
+    server.stub = GoatStub(species, delay, fail, fail_rate, single_record)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the GoaT API endpoints used by make_EAR.py')
+    parser.add_argument('--port', type=int, default=8089, help='Port to listen on, on 127.0.0.1 (default: %(default)s)')
+    parser.add_argument('--data', type=str, default=None, help='JSON file with the species to answer')
+    parser.add_argument('--delay', type=float, default=0, help='Seconds to wait before each answer')
+    parser.add_argument('--fail', type=int, default=0, help='Answer 503 to the first N requests')
+    parser.add_argument('--fail-rate', type=float, default=0, help='Then answer 503 to this fraction of the requests')
+    parser.add_argument('--single-record', action='store_true', help='Answer 400 to record requests for several TxIDs')
+    args = parser.parse_args()
+
+    species = SPECIES
+    if args.data:
+        with open(args.data, "r") as file:
+            species = json.load(file)
+    server = serve(args.port, species, args.delay, args.fail, args.fail_rate, args.single_record)
+    print(f"GoaT stub listening on http://127.0.0.1:{args.port}/api/v2", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
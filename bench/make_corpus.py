@@ -0,0 +1,230 @@
+# make_corpus.py
+# ERGA Sequencing and Assembly Committee
+#
+# Synthetic Assembly_Reports/<Species>/<ToLID>/ tree, to test get_EARs_bp.py, EARpdf_to_yaml.py
+# and the bot on thousands of reports:
+#   python bench/make_corpus.py /tmp/ear_corpus --reports 10000 --jobs 8
+#   python bench/make_corpus.py /tmp/ear_corpus --reports 1000 --pdfs
+# The YAMLs are made by build_sidecar (ear/sidecar.py), so they have the layout of the reports
+# of make_EAR.py, with the classes, tags and haplotype layouts in about the proportions of the
+# real reports. --pdfs also writes a text-only PDF with the report data embedded (much smaller
+# than a real report, which has the plots). The same arguments always give the same tree.
+
+import argparse
+import datetime
+import json
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ear.report import format_number
+from ear.eardata import EAR_DATA_NAME, encode_ear_data, save_to_yaml
+from ear.sidecar import build_sidecar
+
+
+EAR_VERSION = "v24.10.15"
+
+# ToLID prefix, class, weight in the corpus, orders, haploid size range (Mbp), haploid number range
+CLASSES = [
+    ("i", "Insecta", 99, ["Coleoptera", "Lepidoptera", "Diptera", "Hymenoptera", "Orthoptera", "Hemiptera"], (150, 2500), (5, 40)),
+    ("q", "Arachnida", 29, ["Araneae", "Scorpiones", "Opiliones", "Pseudoscorpiones"], (700, 4000), (8, 30)),
+    ("d", "Magnoliopsida", 27, ["Lamiales", "Asterales", "Fabales", "Rosales", "Caryophyllales"], (300, 5000), (6, 40)),
+    ("x", "Gastropoda", 10, ["Stylommatophora", "Littorinimorpha", "Neogastropoda"], (800, 3500), (20, 45)),
+    ("m", "Mammalia", 9, ["Rodentia", "Chiroptera", "Eulipotyphla", "Carnivora"], (2000, 3500), (18, 40)),
+    ("k", "Ascidiacea", 9, ["Phlebobranchia", "Stolidobranchia"], (100, 500), (8, 16)),
+    ("f", "Actinopteri", 7, ["Perciformes", "Cypriniformes", "Salmoniformes"], (400, 2500), (20, 50)),
+    ("w", "Clitellata", 6, ["Crassiclitellata", "Rhynchobdellida"], (300, 1500), (10, 36)),
+    ("q", "Malacostraca", 5, ["Amphipoda", "Isopoda", "Decapoda"], (1000, 8000), (20, 60)),
+    ("r", "Lepidosauria", 5, ["Squamata"], (1500, 2500), (17, 24)),
+    ("b", "Aves", 3, ["Passeriformes", "Accipitriformes"], (1000, 1400), (38, 42)),
+]
+
+# Curated haplotypes of a report (Pre-curation has the same), with their weight in the corpus
+HAPLOTYPE_LAYOUTS = [(["collapsed"], 100), (["pri"], 99), (["hap1"], 23), (["hap1", "hap2"], 21)]
+
+TAGS = [("ERGA-BGE", 240), ("ERGA-Pilot", 7), ("ERGA-Community", 3)]
+
+AFFILIATIONS = ["Genoscope", "CNAG", "Wellcome Sanger Institute", "SciLifeLab", "University of Florence", "LIB Bonn", "NGS Competence Center Tubingen"]
+
+SYLLABLES = ["a", "ac", "al", "an", "ar", "bo", "ca", "ce", "chi", "cy", "da", "do", "el", "en", "er", "ga", "go", "hy", "la",
+             "le", "li", "lo", "ma", "me", "mi", "mo", "na", "ne", "no", "pa", "pe", "phi", "po", "ra", "re", "ri", "ro", "sa",
+             "se", "si", "ta", "te", "ti", "to", "tri", "u", "va", "xe", "za"]
+
+
+def weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def latin_word(rng, syllables):
+    return "".join(rng.choice(SYLLABLES) for _ in range(syllables))
+
+
+# Species names and ToLIDs of the corpus: about one species in twenty has two reports
+def make_entries(rng, reports):
+    entries = []
+    species_names = set()
+    tol_ids = set()
+    while len(entries) < reports:
+        prefix, class_name = weighted(rng, [((c[0], c[1]), c[2]) for c in CLASSES])
+        genus = latin_word(rng, rng.randint(2, 4)).capitalize()
+        species = f"{genus} {latin_word(rng, rng.randint(2, 4))}us"
+        if species in species_names:
+            continue
+        species_names.add(species)
+        epithet = species.split()[1]
+        base = prefix + genus[:3].capitalize() + epithet[:3].capitalize()
+        for _ in range(2 if rng.random() < 0.05 else 1):
+            number = 1
+            while f"{base}{number}" in tol_ids:
+                number += 1
+            tol_ids.add(f"{base}{number}")
+            entries.append((species, class_name, f"{base}{number}"))
+    return entries[:reports]
+
+
+# The values of one report, as make_EAR.py would have gathered them
+def report_data(rng, species, class_name, tol_id):
+    prefix, class_name, weight, orders, size_range, number_range = next(c for c in CLASSES if c[1] == class_name)
+    expected_size = int(rng.uniform(*size_range) * 1e6)
+    haploid_number = rng.randint(*number_range)
+    haplotypes = weighted(rng, HAPLOTYPE_LAYOUTS)
+
+    config = {
+        'tags': weighted(rng, TAGS),
+        'tol_id': tol_id,
+        'species': species,
+        'sex': rng.choice(["Unknown", "XX", "XY", "ZW", "ZZ"]),
+        'obs_haploid_num': haploid_number if rng.random() < 0.8 else haploid_number + rng.randint(1, 4),
+        'obs_sex': rng.choice(["Unknown", "XX", "XY"]),
+        'interventions_per_gb': rng.randint(0, 150),
+        'contamination_notes': rng.choice(["", "No contamination found", "Bacterial contigs removed"]),
+        'other_notes': rng.choice(["", "Some areas are ambiguous", "Sex chromosomes identified by coverage"]),
+        'data': [{'PACBIO Hifi': rng.randint(15, 60)}, {'Arima': rng.randint(10, 80)}],
+        'asm_pipeline': {'Hifiasm': f"0.19.{rng.randint(5, 9)}-r{rng.randint(580, 620)}", 'purge_dups': "1.2.5", 'YaHS': "1.2"},
+        'curation_pipeline': {'PretextMap': "0.1.9", 'PretextView': "0.2.5"},
+        'submitter': f"{latin_word(rng, 2).capitalize()} {latin_word(rng, 3).capitalize()}",
+        'affiliation': rng.choice(AFFILIATIONS),
+    }
+    taxonomy = {
+        'taxon_id': rng.randint(10_000, 3_000_000),
+        'class': class_name,
+        'order': rng.choice(orders),
+        'haploid_number': haploid_number,
+        'haploid_source': rng.choice(["direct", "ancestor", "descendant"]),
+        'ploidy': 2,
+        'ploidy_source': rng.choice(["direct", "ancestor"]),
+    }
+
+    columns = []
+    ebp_codes = {}
+    total_bp = []
+    for stage in ("Pre-curation", "Curated"):
+        for haplotype in haplotypes:
+            size = int(expected_size * rng.uniform(0.85, 1.15))
+            scaffolds = rng.randint(max(haploid_number, 10), 3000)
+            contigs = scaffolds + rng.randint(10, 2000)
+            scaffold_n50 = int(size / (haploid_number * rng.uniform(1.2, 2.5)))
+            contig_n50 = int(scaffold_n50 / rng.uniform(1.5, 40))
+            gaps = contigs - scaffolds
+            contig_l50 = rng.randint(5, 200)
+            qv = rng.uniform(45, 65)
+            busco_single = rng.uniform(75, 98)
+            busco_duplicated = rng.uniform(0.2, 6)
+            busco_fragmented = rng.uniform(0.1, 3)
+            busco_missing = max(100 - busco_single - busco_duplicated - busco_fragmented, 0)
+            columns.append([
+                format_number(size), f"{rng.uniform(30, 45):.2f}", f"{gaps / size * 1e9:.2f}", format_number(gaps * 200),
+                str(scaffolds), format_number(scaffold_n50), str(math.ceil(haploid_number / 2)), str(haploid_number),
+                str(contigs), format_number(contig_n50), str(contig_l50), str(contig_l50 * rng.randint(3, 6)),
+                f"{qv:.4f}", f"{rng.uniform(85, 99.5):.4f}", f"{busco_single:.1f}%", f"{busco_duplicated:.1f}%",
+                f"{busco_fragmented:.1f}%", f"{busco_missing:.1f}%",
+            ])
+            if stage == "Curated":
+                total_bp.append(size)
+                ebp_codes[haplotype] = f"{math.floor(math.log10(contig_n50))}.{math.floor(math.log10(scaffold_n50))}.Q{math.floor(qv)}"
+
+    metrics = ["Total bp", "GC %", "Gaps/Gbp", "Total gap bp", "Scaffolds", "Scaffold N50", "Scaffold L50", "Scaffold L90",
+               "Contigs", "Contig N50", "Contig L50", "Contig L90", "QV", "Kmer compl.", "BUSCO sing.", "BUSCO dupl.",
+               "BUSCO frag.", "BUSCO miss."]
+    asm_table_data = [["Metrics"] + [f"{stage} \n {haplotype}" for stage in ("Pre-curation", "Curated") for haplotype in haplotypes]]
+    asm_table_data += [[metric] + [column[row] for column in columns] for row, metric in enumerate(metrics)]
+
+    lineage = rng.choice(["insecta_odb10", "arachnida_odb10", "eudicots_odb10", "mollusca_odb10", "mammalia_odb10", "metazoa_odb10"])
+    artifacts = {
+        'genome_haploid_length': format_number(expected_size),
+        'max_total_bp': format_number(max(total_bp)),
+        'proposed_ploidy': 2,
+        'asm_table_data': asm_table_data,
+        'ebp_codes': ebp_codes,
+        'busco_info_list': [("5.4.3", (lineage, "24", "9226"), "euk_genome_met", "metaeuk")] * len(haplotypes),
+    }
+    created = datetime.datetime(2023, 1, 1) + datetime.timedelta(seconds=rng.randint(0, 3 * 365 * 86400))
+    return build_sidecar(config, taxonomy, artifacts, EAR_VERSION, created.strftime("%Y-%m-%d %H:%M:%S CET"))
+
+
+# Text-only PDF of a report, with its data embedded as make_EAR.py does
+def write_text_pdf(data, pdf_filename, yaml_filename):
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Preformatted
+    from ear.pdf import write_pdf
+
+    with open(yaml_filename, "r") as file:
+        text = file.read()
+    elements = [Preformatted(text, getSampleStyleSheet()["Code"])]
+    write_pdf(elements, pdf_filename, {EAR_DATA_NAME: (encode_ear_data(data), "ERGA Assembly Report data, read by EARpdf_to_yaml.py")})
+
+
+# Write the reports of a slice of the entries, each one from its own seed
+def write_reports(root, entries, seed, pdfs):
+    for index, species, class_name, tol_id in entries:
+        rng = random.Random(seed * 1_000_003 + index)
+        data = report_data(rng, species, class_name, tol_id)
+        folder = os.path.join(root, "Assembly_Reports", species.replace(" ", "_"), tol_id)
+        os.makedirs(folder, exist_ok=True)
+        yaml_filename = os.path.join(folder, f"{tol_id}_EAR.yaml")
+        save_to_yaml(data, yaml_filename)
+        if pdfs:
+            write_text_pdf(data, os.path.join(folder, f"{tol_id}_EAR.pdf"), yaml_filename)
+    return len(entries)
+
+
+# Write the corpus in root, and a corpus.json next to Assembly_Reports/ describing it
+def make_corpus(root, reports, seed=1, pdfs=False, jobs=1):
+    entries = [(index,) + entry for index, entry in enumerate(make_entries(random.Random(seed), reports))]
+    chunks = [entries[i:i + 500] for i in range(0, len(entries), 500)]
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            list(executor.map(write_reports, [root] * len(chunks), chunks, [seed] * len(chunks), [pdfs] * len(chunks)))
+    else:
+        for chunk in chunks:
+            write_reports(root, chunk, seed, pdfs)
+
+    description = {'reports': reports, 'species': len({entry[1] for entry in entries}), 'seed': seed, 'pdfs': pdfs}
+    with open(os.path.join(root, "corpus.json"), "w") as file:
+        json.dump(description, file, indent=1)
+    return description
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a synthetic Assembly_Reports/ tree')
+    parser.add_argument('root', type=str, help='Directory to write Assembly_Reports/ in')
+    parser.add_argument('--reports', type=int, default=1000, help='Number of reports (default: %(default)s)')
+    parser.add_argument('--pdfs', action='store_true', help='Also write a text-only PDF with the data embedded for each report')
+    parser.add_argument('--seed', type=int, default=1, help='Seed of the random values (default: %(default)s)')
+    parser.add_argument('--jobs', type=int, default=1, help='Worker processes (default: %(default)s)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    description = make_corpus(args.root, args.reports, args.seed, args.pdfs, args.jobs)
+    print(f"{description['reports']} reports of {description['species']} species written in "
+          f"{os.path.join(args.root, 'Assembly_Reports')} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+# make_fixtures.py
+# ERGA Sequencing and Assembly Committee
+#
+# Synthetic, but realistic, inputs of an EAR: gfastats --nstar-report, BUSCO short summaries,
+# merqury results (.qv, completeness.stats and spectra PNGs), GenomeScope and Smudgeplot
+# summaries, HiC and blobplot PNGs of the given resolution, and the EAR.yaml pointing to them:
+#   python bench/make_fixtures.py /tmp/ear_fixtures --scenario diploid
+#   python bench/make_fixtures.py /tmp/ear_fixtures --haplotypes 6 --image-size 4000
+# The same arguments (and --seed) always give the same files. No dependency besides PyYAML.
+
+import argparse
+import os
+import random
+import struct
+import zlib
+
+import yaml
+
+
+# Scenarios of bench/bench_report.py
+SCENARIOS = {
+    'haploid': {'haplotypes': 1},
+    'diploid': {'haplotypes': 2},
+    'many-haplotypes': {'haplotypes': 6},
+    'huge-images': {'haplotypes': 2, 'image_size': 8000},
+}
+
+GENOME_SIZE = 2_000_000_000
+HAPLOID_NUMBER = 28
+
+# Taxonomy of the species of the fixtures, as bench/goat_stub.py takes it
+SPECIES = {
+    "Elephas maximus": {"taxon_id": "9783", "class": "Mammalia", "order": "Proboscidea", "ploidy": 2, "haploid_number": HAPLOID_NUMBER},
+}
+GAP_SIZE = 200
+
+
+# GFASTATS ########################################################################################
+
+# Lengths (bp) of a chromosome-level assembly: the chromosomes, then unplaced scaffolds adding
+# up to the given fraction of the genome
+def scaffold_lengths(rng, genome_size, chromosomes, scaffolds, unplaced=0.04):
+    weights = [rng.uniform(0.3, 1.0) for _ in range(chromosomes)]
+    placed = genome_size * (1 - unplaced)
+    lengths = [int(placed * w / sum(weights)) for w in weights]
+    small = max(scaffolds - chromosomes, 0)
+    weights = [rng.paretovariate(1.2) for _ in range(small)]
+    lengths += [max(int(genome_size * unplaced * w / sum(weights)), 1000) for w in weights]
+    return sorted(lengths, reverse=True)
+
+
+# Contig lengths, each scaffold broken at random points by gaps of GAP_SIZE
+def contig_lengths(rng, scaffolds, contigs):
+    breaks = [0] * len(scaffolds)
+    for _ in range(max(contigs - len(scaffolds), 0)):
+        # longer scaffolds have more gaps
+        breaks[min(int(rng.random() ** 2 * len(scaffolds)), len(scaffolds) - 1)] += 1
+    lengths = []
+    for scaffold, gaps in zip(scaffolds, breaks):
+        sequence = scaffold - gaps * GAP_SIZE
+        cuts = sorted(rng.randint(1, max(sequence - 1, 1)) for _ in range(gaps))
+        lengths += [b - a for a, b in zip([0] + cuts, cuts + [sequence]) if b > a]
+    return sorted(lengths, reverse=True)
+
+
+# Nx and Lx for x in 1..100
+def nstar(lengths):
+    total = sum(lengths)
+    series = []
+    cumulative = 0
+    count = 0
+    for x in range(1, 101):
+        while cumulative < total * x / 100:
+            cumulative += lengths[count]
+            count += 1
+        series.append((x, lengths[count - 1], count))
+    return series
+
+
+def auN(lengths):
+    return sum(length * length for length in lengths) / sum(lengths)
+
+
+def write_gfastats(path, rng, genome_size, chromosomes, scaffolds, contigs):
+    scaffold_list = scaffold_lengths(rng, genome_size, chromosomes, scaffolds)
+    contig_list = contig_lengths(rng, scaffold_list, contigs)
+    gaps = len(contig_list) - len(scaffold_list)
+    total = sum(scaffold_list)
+    gc = rng.uniform(35, 45)
+    at = sum(contig_list) * (100 - gc) / 200
+    cg = sum(contig_list) * gc / 200
+    scaffold_series = nstar(scaffold_list)
+    contig_series = nstar(contig_list)
+
+    lines = [
+        "+++Assembly summary+++: ",
+        f"# scaffolds: {len(scaffold_list)}",
+        f"Total scaffold length: {total}",
+        f"Average scaffold length: {total / len(scaffold_list):.2f}",
+        f"Scaffold N50: {scaffold_series[49][1]}",
+        f"Scaffold auN: {auN(scaffold_list):.2f}",
+        f"Scaffold L50: {scaffold_series[49][2]}",
+        f"Scaffold L90: {scaffold_series[89][2]}",
+        f"Largest scaffold: {scaffold_list[0]}",
+        f"Smallest scaffold: {scaffold_list[-1]}",
+        f"# contigs: {len(contig_list)}",
+        f"Total contig length: {sum(contig_list)}",
+        f"Average contig length: {sum(contig_list) / len(contig_list):.2f}",
+        f"Contig N50: {contig_series[49][1]}",
+        f"Contig auN: {auN(contig_list):.2f}",
+        f"Contig L50: {contig_series[49][2]}",
+        f"Contig L90: {contig_series[89][2]}",
+        f"Largest contig: {contig_list[0]}",
+        f"Smallest contig: {contig_list[-1]}",
+        f"# gaps in scaffolds: {gaps}",
+        f"Total gap length in scaffolds: {gaps * GAP_SIZE}",
+        f"Average gap length in scaffolds: {GAP_SIZE:.2f}",
+        f"Base composition (A:C:G:T): {int(at)}:{int(cg)}:{int(cg)}:{int(at)}",
+        f"GC content %: {gc:.2f}",
+        "# soft-masked bases: 0",
+        f"# segments: {len(contig_list)}",
+        f"Total segment length: {sum(contig_list)}",
+        f"# gaps: {gaps}",
+        f"# paths: {len(scaffold_list)}",
+    ]
+    for name, series in (("Scaffold", scaffold_series), ("Contig", contig_series)):
+        lines += [f"{name} N{x}: {nx}" for x, nx, lx in series]
+        lines += [f"{name} L{x}: {lx}" for x, nx, lx in series]
+    with open(path, "w") as file:
+        file.write("\n".join(lines) + "\n")
+    return scaffold_list
+
+
+# BUSCO, GENOMESCOPE, SMUDGEPLOT ##################################################################
+
+def write_busco(path, rng, lineage="mammalia_odb10", buscos=9226):
+    single = rng.uniform(88, 97)
+    duplicated = rng.uniform(0.5, 6)
+    fragmented = rng.uniform(0.2, 1.5)
+    missing = max(100 - single - duplicated - fragmented, 0)
+    with open(path, "w") as file:
+        file.write(
+            "# BUSCO version is: 5.4.3 \n"
+            f"# The lineage dataset is: {lineage} (Creation date: 2021-02-19, number of genomes: 24, number of BUSCOs: {buscos})\n"
+            "# Summarized benchmarking in BUSCO notation for file assembly.fa\n"
+            "# BUSCO was run in mode: euk_genome_met\n"
+            "# Gene predictor used: metaeuk\n\n"
+            "\t***** Results: *****\n\n"
+            f"\tC:{single + duplicated:.1f}%[S:{single:.1f}%,D:{duplicated:.1f}%],F:{fragmented:.1f}%,M:{missing:.1f}%,n:{buscos}\t   \n"
+            f"\t{int(buscos * (single + duplicated) / 100)}\tComplete BUSCOs (C)\t\t\t   \n"
+            f"\t{int(buscos * single / 100)}\tComplete and single-copy BUSCOs (S)\t   \n"
+            f"\t{int(buscos * duplicated / 100)}\tComplete and duplicated BUSCOs (D)\t   \n"
+            f"\t{int(buscos * fragmented / 100)}\tFragmented BUSCOs (F)\t\t\t   \n"
+            f"\t{int(buscos * missing / 100)}\tMissing BUSCOs (M)\t\t\t   \n"
+            f"\t{buscos}\tTotal BUSCO groups searched\t\t   \n"
+        )
+
+
+def write_genomescope(path, genome_size, ploidy):
+    with open(path, "w") as file:
+        file.write(
+            "GenomeScope version 2.0\n"
+            "input file = reads.histo\n"
+            f"p = {ploidy}\n"
+            "k = 21\n\n"
+            "property                      min               max               \n"
+            "Homozygous (aa)               99.4%             99.5%             \n"
+            "Heterozygous (ab)             0.5%              0.6%              \n"
+            f"Genome Haploid Length         {int(genome_size * 0.97):,} bp  {int(genome_size * 0.98):,} bp  \n"
+            "Genome Repeat Length          900,000,000 bp    910,000,000 bp    \n"
+            "Genome Unique Length          1,050,000,000 bp  1,060,000,000 bp  \n"
+            "Model Fit                     92.1%             97.3%             \n"
+            "Read Error Rate               0.1%              0.1%              \n"
+        )
+
+
+def write_smudgeplot(path, ploidy):
+    with open(path, "w") as file:
+        file.write(
+            "##### Estimated ploidy\n"
+            f"* Proposed ploidy: {ploidy}\n"
+            "* 1n coverage estimate: 15.2\n"
+        )
+
+
+# PNG #############################################################################################
+
+def png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+
+# RGB image shaped like a HiC contact map: signal fading with the distance to the diagonal, red on
+# white. Each row is a slice of one precomputed profile, so even huge images are quick to make
+def write_png(path, width, height, color=(200, 30, 30), seed=0):
+    rng = random.Random(seed)
+    noise = bytes(rng.randrange(16) for _ in range(251))
+    profile = bytearray()
+    for distance in range(-width, width + 1):
+        signal = 1 / (1 + abs(distance) * 64 / width)
+        pixel = noise[distance % 251]
+        profile += bytes(min(255, int(255 - (255 - channel) * signal) + pixel) for channel in color)
+    raw = bytearray()
+    for y in range(height):
+        start = 3 * (width - y * width // height)
+        raw += b"\x00" + profile[start:start + 3 * width]
+    with open(path, "wb") as file:
+        file.write(b"\x89PNG\r\n\x1a\n")
+        file.write(png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        file.write(png_chunk(b"IDAT", zlib.compress(bytes(raw), 6)))
+        file.write(png_chunk(b"IEND", b""))
+
+
+# MERQURY #########################################################################################
+
+# A merqury run on one or two assemblies: the .qv and completeness.stats tables (one row per
+# assembly, plus "Both"), the per-scaffold .qv of each assembly and the spectra plots
+def write_merqury(folder, rng, scaffold_lists, plot_size):
+    os.makedirs(folder, exist_ok=True)
+    qv_rows = []
+    completeness_rows = []
+    for n, scaffold_list in enumerate(scaffold_lists, start=1):
+        qv = rng.uniform(50, 65)
+        qv_rows.append(f"asm{n}\t{rng.randint(10_000, 90_000)}\t{sum(scaffold_list)}\t{qv:.4f}\t{10 ** (-qv / 10):.4e}")
+        completeness_rows.append(f"asm{n}\tall\t{rng.randint(900_000_000, 990_000_000)}\t1000000000\t{rng.uniform(85, 99):.4f}")
+        with open(os.path.join(folder, f"out.asm{n}.qv"), "w") as file:
+            for s, length in enumerate(scaffold_list, start=1):
+                file.write(f"scaffold_{s}\t{rng.randint(0, 50)}\t{length}\t{rng.uniform(45, 70):.4f}\t{rng.random() * 1e-5:.4e}\n")
+        write_png(os.path.join(folder, f"out.asm{n}.spectra-cn.ln.png"), *plot_size, color=(30, 90, 200), seed=rng.random())
+    if len(scaffold_lists) == 2:
+        qv_rows.append(f"Both\t{rng.randint(20_000, 180_000)}\t{sum(map(sum, scaffold_lists))}\t{rng.uniform(50, 65):.4f}\t1.0e-06")
+        completeness_rows.append(f"both\tall\t{rng.randint(950_000_000, 999_000_000)}\t1000000000\t{rng.uniform(95, 99.9):.4f}")
+    with open(os.path.join(folder, "out.qv"), "w") as file:
+        file.write("\n".join(qv_rows) + "\n")
+    with open(os.path.join(folder, "out.completeness.stats"), "w") as file:
+        file.write("\n".join(completeness_rows) + "\n")
+    write_png(os.path.join(folder, "out.spectra-cn.ln.png"), *plot_size, color=(30, 160, 90), seed=rng.random())
+    write_png(os.path.join(folder, "out.spectra-asm.ln.png"), *plot_size, color=(150, 60, 180), seed=rng.random())
+
+
+# EAR.YAML ########################################################################################
+
+# Write the inputs of one report in directory, and return the path of its EAR.yaml. merqury
+# compares at most two assemblies, so with more haplotypes the others have no merqury results
+def make_fixture(directory, haplotypes=2, image_size=2000, scaffolds=400, contigs=1500, tol_id="mBenTes1", species="Elephas maximus", seed=1):
+    rng = random.Random(seed)
+    directory = os.path.abspath(directory)
+    os.makedirs(directory, exist_ok=True)
+    names = ["pri"] if haplotypes == 1 else [f"hap{n}" for n in range(1, haplotypes + 1)]
+    plot_size = (max(image_size * 3 // 4, 200), max(image_size * 5 // 8, 160))
+    ploidy = 2 if haplotypes <= 2 else haplotypes
+
+    profiling = os.path.join(directory, "profiling")
+    os.makedirs(profiling, exist_ok=True)
+    write_genomescope(os.path.join(profiling, "genomescope_summary.txt"), GENOME_SIZE, ploidy)
+    write_smudgeplot(os.path.join(profiling, "smudgeplot_verbose_summary.txt"), ploidy)
+
+    assemblies = {}
+    for stage, contig_factor in (("Pre-curation", 1.2), ("Curated", 1.0)):
+        stage_dir = os.path.join(directory, stage.lower())
+        os.makedirs(stage_dir, exist_ok=True)
+        assemblies[stage] = {}
+        scaffold_lists = []
+        for name in names:
+            # curation joins scaffolds and removes a bit of sequence
+            stage_scaffolds = scaffolds * 3 if stage == "Pre-curation" else scaffolds
+            genome_size = GENOME_SIZE if stage == "Pre-curation" else int(GENOME_SIZE * 0.99)
+            gfastats_path = os.path.join(stage_dir, f"{name}.gfastats.txt")
+            busco_path = os.path.join(stage_dir, f"short_summary.specific.mammalia_odb10.{name}.txt")
+            scaffold_lists.append(write_gfastats(gfastats_path, rng, genome_size, HAPLOID_NUMBER, stage_scaffolds, int(contigs * contig_factor)))
+            write_busco(busco_path, rng)
+            assemblies[stage][name] = {'gfastats--nstar-report_txt': gfastats_path, 'busco_short_summary_txt': busco_path}
+        merqury_folder = os.path.join(stage_dir, "merqury")
+        write_merqury(merqury_folder, rng, scaffold_lists[:2], plot_size)
+        for name in names[:2]:
+            assemblies[stage][name]['merqury_folder'] = merqury_folder
+
+    for n, name in enumerate(names):
+        properties = assemblies["Curated"][name]
+        properties['hic_FullMap_png'] = os.path.join(directory, "curated", f"{name}.FullMap.png")
+        properties['hic_FullMap_link'] = f"https://example.org/{tol_id}/{name}.pretext"
+        properties['blobplot_cont_png'] = os.path.join(directory, "curated", f"{name}.blobplot.png")
+        write_png(properties['hic_FullMap_png'], image_size, image_size, seed=seed * 100 + n)
+        write_png(properties['blobplot_cont_png'], image_size, image_size, color=(60, 60, 60), seed=seed * 100 + 50 + n)
+
+    ear = {
+        'ToLID': tol_id,
+        'Species': species,
+        'Sex': 'XY',
+        'Submitter': 'Benchmark',
+        'Affiliation': 'ERGA',
+        'Tags': 'ERGA-testing',
+        'DATA': [{'HiFi': '40x'}, {'HiC': '90x'}],
+        'PROFILING': {
+            'GenomeScope': {'genomescope_summary_txt': os.path.join(profiling, "genomescope_summary.txt")},
+            'Smudgeplot': {'smudgeplot_verbose_summary_txt': os.path.join(profiling, "smudgeplot_verbose_summary.txt")},
+        },
+        'ASSEMBLIES': assemblies,
+        'PIPELINES': {
+            'Assembly': {'Hifiasm': '0.19.8/HiC/l0', 'YaHS': '1.2a'},
+            'Curation': {'PretextView': '0.2.5', 'GRIT_Rapid': '2.0'},
+        },
+        'NOTES': {
+            'Obs_Haploid_num': HAPLOID_NUMBER,
+            'Obs_Sex': 'XY',
+            'Interventions_per_Gb': 12,
+            'Contamination_notes': 'Synthetic benchmark data, no contamination',
+            'Other_notes': 'Generated by bench/make_fixtures.py',
+        },
+    }
+    yaml_path = os.path.join(directory, "EAR.yaml")
+    with open(yaml_path, "w") as file:
+        yaml.safe_dump(ear, file, sort_keys=False)
+    return yaml_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write synthetic EAR inputs and their EAR.yaml')
+    parser.add_argument('directory', type=str, help='Directory to write the inputs in')
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default=None, help='Preset of the options below')
+    parser.add_argument('--haplotypes', type=int, default=2, help='Haplotypes per assembly stage (default: %(default)s)')
+    parser.add_argument('--image-size', type=int, default=2000, help='Width and height of the HiC and blobplot PNGs, in pixels (default: %(default)s)')
+    parser.add_argument('--scaffolds', type=int, default=400, help='Scaffolds of each curated assembly (default: %(default)s)')
+    parser.add_argument('--contigs', type=int, default=1500, help='Contigs of each curated assembly (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=1, help='Seed of the random values (default: %(default)s)')
+    args = parser.parse_args()
+
+    options = {'haplotypes': args.haplotypes, 'image_size': args.image_size}
+    options.update(SCENARIOS.get(args.scenario, {}))
+    yaml_path = make_fixture(args.directory, scaffolds=args.scaffolds, contigs=args.contigs, seed=args.seed, **options)
+    print(yaml_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# ERGA EARs Report Module
@@ -0,0 +1,203 @@
+# ERGA EARs Report Module
+# adapters.py
+# ERGA Sequencing and Assembly Committee
+#
+# Input adapters: how a report finds its merqury results, and how it copes with missing data.
+# make_EAR.py points each assembly to a merqury output folder, the Galaxy version
+# (glxy/make_EAR_glxy.py) to each merqury file. Both feed the same values to the report stages.
+
+import logging
+import os
+
+from ear import archives
+from ear.artifacts import GfastatsKeyError, load_gfastats, load_merqury, load_merqury_table
+
+
+# get unique part in file names
+def find_unique_parts(file1, file2):
+    # Split filenames into parts
+    parts1 = file1.split('.')
+    parts2 = file2.split('.')
+    # Find unique parts
+    unique_parts1 = [part for part in parts1 if part not in parts2]
+    unique_parts2 = [part for part in parts2 if part not in parts1]
+
+    return ' '.join(unique_parts1), ' '.join(unique_parts2)
+
+
+# Caption of a k-mer plot
+def kmer_plot_caption(png_file, spectra_cn_files, shortest_spectra_cn_file, haploid_name):
+    filename = os.path.basename(png_file)
+    if filename.endswith("spectra-asm.ln.png"):
+        return "Distribution of k-mer counts coloured by their presence in reads/assemblies"
+    elif filename.endswith("spectra-cn.ln.png"):
+        if len(spectra_cn_files) == 3:
+            # For 3 spectra-cn files use particular text
+            if png_file == shortest_spectra_cn_file:
+                return "Distribution of k-mer counts per copy numbers found in asm (dipl.)"
+            return f"Distribution of k-mer counts per copy numbers found in {haploid_name} (hapl.)"
+        # For 2 spectra-cn files use same text
+        return "Distribution of k-mer counts per copy numbers found in asm"
+    return filename
+
+
+class FolderInputs:
+    """make_EAR.py inputs: merqury results are found by scanning the merqury_folder of each
+    assembly. Missing or incomplete gfastats reports stop the report."""
+
+    # value shown for metrics that could not be read
+    missing = ''
+    # label of the HiC contact map links
+    link_label = '[LINK]'
+
+    def gfastats_values(self, file_path, keys):
+        return load_gfastats(file_path).extract(keys)
+
+    def total_bp(self, file_path):
+        return "{:,}".format(load_gfastats(file_path).int("Total scaffold length"))
+
+    def has_qv(self, properties):
+        return 'merqury_folder' in properties
+
+    def has_completeness(self, properties):
+        return 'merqury_folder' in properties
+
+    # extract qv values
+    def qv(self, properties, order, asm_stage, haplotype):
+        dir_path = properties['merqury_folder']
+        try:
+            qv_value = load_merqury(dir_path).qv(order)
+            if qv_value is not None:
+                return qv_value
+        except Exception as e:
+            logging.error(f"Error reading {dir_path}: {str(e)}")
+        return ''
+
+    # extract Kmer completeness values
+    def completeness(self, properties, order, asm_stage, haplotype):
+        dir_path = properties['merqury_folder']
+        try:
+            return load_merqury(dir_path).completeness(order)
+        except Exception as e:
+            logging.warning(f"Error reading {dir_path}: {str(e)}")
+            return ''
+
+    # Getting kmer plots for curated asm
+    def get_png_files(self, dir_path):
+        png_files = list(load_merqury(dir_path).png_files)
+        if len(png_files) < 4:
+            logging.warning(f"Warning: Less than 4 png files found in {dir_path}. If this is diploid, some images may be missing.")
+            # fill missing with None
+            while len(png_files) < 4:
+                png_files.append(None)
+        return png_files[:4]
+
+    # K-mer plots of the curated assembly, in groups of (png file, caption) laid out together,
+    # with the number of slots (of 4 per page) each group takes
+    def kmer_plots(self, curated_assemblies):
+        groups = []
+        processed_folders = set()
+        for haplotype, haplotype_properties in curated_assemblies.items():
+            if isinstance(haplotype_properties, dict) and 'merqury_folder' in haplotype_properties:
+                merqury_folder = haplotype_properties['merqury_folder']
+
+                # Check if folder has already been processed
+                if merqury_folder in processed_folders:
+                    continue
+                processed_folders.add(merqury_folder)
+                png_files = self.get_png_files(merqury_folder)
+
+                # Only .spectra-cn.ln.png files, find the shortest one
+                spectra_cn_files = [f for f in load_merqury(merqury_folder).spectra_cn_files if f in png_files]
+                shortest_spectra_cn_file = min(spectra_cn_files, key=lambda f: len(os.path.basename(f)), default=None)
+
+                # For 3 .spectra-cn.ln.png files, name each haploid one by its unique part
+                haploid_names = {}
+                similar_files = [f for f in spectra_cn_files if f != shortest_spectra_cn_file]
+                if len(spectra_cn_files) == 3 and similar_files:
+                    unique_name1, unique_name2 = find_unique_parts(similar_files[0], similar_files[1])
+                    haploid_names = {similar_files[0]: f"<b>{unique_name1}</b>", similar_files[1]: f"<b>{unique_name2}</b>"}
+
+                images = [(png_file, kmer_plot_caption(png_file, spectra_cn_files, shortest_spectra_cn_file, haploid_names.get(png_file)))
+                          for png_file in png_files if png_file]
+                groups.append({'images': images, 'slots': len(png_files)})
+        return groups
+
+
+class ExplicitPathInputs(FolderInputs):
+    """Galaxy inputs: each merqury file is given (merqury_qv, merqury_completeness_stats and the
+    merqury_*_png plots), as Galaxy datasets do not keep the merqury folder. Missing values are
+    reported as N/A and logged instead of stopping the report."""
+
+    missing = 'N/A'
+    link_label = '[non-permanent LINK]'
+
+    def gfastats_values(self, file_path, keys):
+        try:
+            return load_gfastats(file_path).extract(keys, default=self.missing)
+        except FileNotFoundError:
+            logging.error(f"Gfastats file not found: {file_path}")
+        except Exception as e:
+            logging.error(f"Error processing gfastats file {file_path}: {str(e)}")
+        return None
+
+    def total_bp(self, file_path):
+        try:
+            return super().total_bp(file_path)
+        except GfastatsKeyError:
+            logging.error(f"Could not find Total scaffold length in {file_path}")
+            return self.missing
+
+    def has_qv(self, properties):
+        return 'merqury_qv' in properties
+
+    def has_completeness(self, properties):
+        return 'merqury_completeness_stats' in properties
+
+    # extract qv values
+    def qv(self, properties, order, asm_stage, haplotype):
+        file_path = properties['merqury_qv']
+        try:
+            qv_value = load_merqury_table(file_path).qv(order)
+            if qv_value is not None:
+                return qv_value
+        except Exception as e:
+            logging.error(f"Error reading {file_path} for tool {asm_stage} and haplotype {haplotype}: {str(e)}")
+        return ''
+
+    # extract Kmer completeness values
+    def completeness(self, properties, order, asm_stage, haplotype):
+        file_path = properties['merqury_completeness_stats']
+        try:
+            return load_merqury_table(file_path).completeness(order)
+        except Exception as e:
+            logging.error(f"Error reading {file_path} for tool {asm_stage} and haplotype {haplotype}: {str(e)}")
+            return ''
+
+    # K-mer plots of the curated assembly: the plots common to the assemblies and the haploid
+    # spectra-cn of each one, all in one group
+    def kmer_plots(self, curated_assemblies):
+        spectra_files = {'common': {}}
+        for haplotype, haplotype_properties in curated_assemblies.items():
+            if 'merqury_hap_spectra_cn_png' in haplotype_properties:
+                spectra_files[haplotype] = {'spectra_cn_png': haplotype_properties['merqury_hap_spectra_cn_png']}
+            if 'merqury_spectra_cn_png' in haplotype_properties:
+                spectra_files['common']['spectra_cn_png'] = haplotype_properties['merqury_spectra_cn_png']
+            if 'merqury_spectra_asm_png' in haplotype_properties:
+                spectra_files['common']['spectra_asm_png'] = haplotype_properties['merqury_spectra_asm_png']
+
+        # Determine the number of spectra-cn files, without duplicates
+        spectra_cn_files = list({file_dict['spectra_cn_png'] for file_dict in spectra_files.values() if file_dict.get('spectra_cn_png')})
+        if len(spectra_cn_files) == 3:
+            shortest_spectra_cn_file = min(spectra_cn_files, key=lambda f: len(os.path.basename(f)), default=None)
+        else:
+            shortest_spectra_cn_file = spectra_cn_files[0] if spectra_cn_files else None
+
+        images = []
+        for label, file_dict in spectra_files.items():
+            for png_file in file_dict.values():
+                if png_file and archives.exists(png_file):
+                    images.append((png_file, kmer_plot_caption(png_file, spectra_cn_files, shortest_spectra_cn_file, label)))
+                elif png_file:
+                    logging.error(f"Error processing image {png_file}: file not found")
+        return [{'images': images, 'slots': len(images)}]
@@ -0,0 +1,233 @@
+# ERGA EARs Report Module
+# archives.py
+# ERGA Sequencing and Assembly Committee
+#
+# Report inputs read from a results bundle (.zip or .tar) without extracting it. A path of the form
+# "bundle.zip::path/in/bundle" names a member of the bundle; every other path is a plain file.
+# Zip members are found in the central directory, tar members in an index of the member headers
+# built once per bundle (seeking over the contents of plain .tar files), so a report reads only
+# the members it references.
+
+import io
+import logging
+import os
+import posixpath
+import stat
+import tarfile
+import zipfile
+from contextlib import contextmanager
+
+
+MEMBER_SEPARATOR = '::'
+
+
+# (bundle, member) of a member path, (None, path) for a plain path
+def split_member(path):
+    if isinstance(path, str) and MEMBER_SEPARATOR in path:
+        archive, member = path.split(MEMBER_SEPARATOR, 1)
+        member = posixpath.normpath(member).strip('/')
+        return archive, '' if member == '.' else member
+    return None, path
+
+
+def is_member(path):
+    return split_member(path)[0] is not None
+
+
+def member_path(archive, member):
+    return f"{archive}{MEMBER_SEPARATOR}{member}"
+
+
+def is_archive(path):
+    return os.path.isfile(path) and (zipfile.is_zipfile(path) or tarfile.is_tarfile(path))
+
+
+class ArchiveIndex:
+    """The members of a bundle (files with their size, and the folders holding them), as listed
+    by its zip central directory or tar headers. Folders are listed in the order of the bundle,
+    which is the order the files were listed when it was made."""
+
+    def __init__(self, path, sizes):
+        self.path = path
+        self.sizes = sizes
+        self.children = {'': []}
+        for name in sizes:
+            while name:
+                parent = posixpath.dirname(name)
+                self.children.setdefault(parent, [])
+                if name in self.children[parent]:
+                    break
+                self.children[parent].append(name)
+                name = parent
+
+    def isfile(self, member):
+        return member in self.sizes
+
+    def isdir(self, member):
+        return member in self.children
+
+    def listdir(self, member):
+        if member not in self.children:
+            raise FileNotFoundError(f"No folder {member} in {self.path}")
+        return [posixpath.basename(name) for name in self.children[member]]
+
+    def size(self, member):
+        if member in self.children:
+            return 0
+        if member not in self.sizes:
+            raise FileNotFoundError(f"No member {member} in {self.path}")
+        return self.sizes[member]
+
+
+class ZipArchive(ArchiveIndex):
+    def __init__(self, path):
+        self.zip = zipfile.ZipFile(path)
+        self.infos = {posixpath.normpath(info.filename).strip('/'): info for info in self.zip.infolist() if not info.is_dir()}
+        super().__init__(path, {name: info.file_size for name, info in self.infos.items()})
+
+    def open(self, member):
+        self.size(member)
+        return self.zip.open(self.infos[member])
+
+
+class TarArchive(ArchiveIndex):
+    def __init__(self, path):
+        # reading the headers of a compressed tar decompresses all of it, and so does every member
+        # read after one further in the stream
+        self.tar = tarfile.open(path, 'r:*')
+        if not isinstance(self.tar.fileobj, io.BufferedReader):
+            logging.warning(f"{path} is a compressed tar, without random access to its members. A .zip or plain .tar is read much faster")
+        self.infos = {posixpath.normpath(info.name).strip('/'): info for info in self.tar.getmembers() if info.isfile()}
+        super().__init__(path, {name: info.size for name, info in self.infos.items()})
+
+    def open(self, member):
+        self.size(member)
+        return self.tar.extractfile(self.infos[member])
+
+
+# Bundles opened by this process, by path and stat, each indexed once
+archive_cache = {}
+
+
+def open_archive(path):
+    file_stat = stat_file(path)
+    key = (os.path.abspath(path), file_stat.st_mtime_ns, file_stat.st_size)
+    if key not in archive_cache:
+        archive_cache[key] = ZipArchive(path) if zipfile.is_zipfile(path) else TarArchive(path)
+    return archive_cache[key]
+
+
+# FILE ACCESS ####################################################################################
+
+# Stats of the plain files taken while a report is made from its inputs (see stat_snapshot), each
+# file stat'ed once: on network filesystems every stat waits on the storage
+stat_cache = None
+
+
+@contextmanager
+def stat_snapshot():
+    global stat_cache
+    stat_cache = {}
+    try:
+        yield
+    finally:
+        stat_cache = None
+
+
+def stat_file(path):
+    cache = stat_cache
+    if cache is None:
+        return os.stat(path)
+    if path not in cache:
+        try:
+            cache[path] = os.stat(path)
+        except OSError as e:
+            cache[path] = e
+    result = cache[path]
+    if isinstance(result, OSError):
+        raise type(result)(result.errno, result.strerror, result.filename)
+    return result
+
+
+def stat_mode(path):
+    try:
+        return stat_file(path).st_mode
+    except (OSError, ValueError):
+        return 0
+
+
+# The functions below take plain and member paths alike
+
+def abspath(path):
+    archive, member = split_member(path)
+    if archive is None:
+        return os.path.abspath(path)
+    return member_path(os.path.abspath(archive), member)
+
+
+# (mtime_ns, size) of a file; members have the mtime of their bundle
+def path_stat(path):
+    archive, member = split_member(path)
+    if archive is None:
+        file_stat = stat_file(path)
+        return file_stat.st_mtime_ns, file_stat.st_size
+    return stat_file(archive).st_mtime_ns, open_archive(archive).size(member)
+
+
+def exists(path):
+    try:
+        path_stat(path)
+        return True
+    except OSError:
+        return False
+
+
+def isfile(path):
+    archive, member = split_member(path)
+    if archive is None:
+        return stat.S_ISREG(stat_mode(path))
+    return stat.S_ISREG(stat_mode(archive)) and open_archive(archive).isfile(member)
+
+
+def isdir(path):
+    archive, member = split_member(path)
+    if archive is None:
+        return stat.S_ISDIR(stat_mode(path))
+    return stat.S_ISREG(stat_mode(archive)) and open_archive(archive).isdir(member)
+
+
+def listdir(path):
+    archive, member = split_member(path)
+    if archive is None:
+        return os.listdir(path)
+    return open_archive(archive).listdir(member)
+
+
+def open_binary(path):
+    archive, member = split_member(path)
+    if archive is None:
+        return open(path, 'rb')
+    return open_archive(archive).open(member)
+
+
+# Whether several threads can read the file at once: plain files and zip members can, the members
+# of a tar bundle are read one at a time from the same file
+def thread_safe(path):
+    archive, member = split_member(path)
+    if archive is None:
+        return True
+    try:
+        # the bundle is indexed here, once, rather than by each thread
+        return isinstance(open_archive(archive), ZipArchive)
+    except OSError:
+        return False
+
+
+# The report YAML of a bundle: the one nearest to its root, those named like *EAR*.yaml first
+def find_yaml(archive):
+    index = open_archive(archive)
+    candidates = [name for name in index.sizes if name.lower().endswith(('.yaml', '.yml'))]
+    if not candidates:
+        raise FileNotFoundError(f"No YAML file in {archive}")
+    candidates.sort(key=lambda name: (name.count('/'), 'ear' not in posixpath.basename(name).lower(), name))
+    return member_path(archive, candidates[0])
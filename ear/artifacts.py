@@ -0,0 +1,774 @@
+# ERGA EARs Report Module
+# artifacts.py
+# ERGA Sequencing and Assembly Committee
+
+import bz2
+import fnmatch
+import gzip
+import io
+import itertools
+import json
+import logging
+import lzma
+import os
+import re
+from array import array
+
+from ear import archives
+from ear.timings import count_read
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Artifacts already read (or parsed) by this process, keyed by the kind of content, the path and
+# its stat, so every consumer in a report, and every report rendered by the same (batch) worker,
+# reads each file once
+artifact_cache = {}
+
+
+def cache_key(kind, file_path):
+    mtime_ns, size = archives.path_stat(file_path)
+    return (kind, archives.abspath(file_path), mtime_ns, size)
+
+
+# COMPRESSION ####################################################################################
+
+# Artifacts may be archived compressed (gzip, zstd, bzip2, xz), they are recognised by their magic
+# number and decompressed while read, whatever their name. zstd needs the zstandard package
+COMPRESSED_SUFFIXES = ('.gz', '.zst', '.bz2', '.xz')
+
+
+def zstd_open(source):
+    if zstandard is None:
+        raise ImportError(f"{source} is zstd compressed, reading it needs the zstandard package (pip install zstandard)")
+    return zstandard.ZstdDecompressor().stream_reader(open(source, 'rb') if isinstance(source, str) else source, closefd=True)
+
+
+decompressors = [
+    (b'\x1f\x8b', gzip.open),
+    (b'\x28\xb5\x2f\xfd', zstd_open),
+    (b'BZh', bz2.open),
+    (b'\xfd7zXZ\x00', lzma.open),
+]
+
+
+# Open a text artifact, compressed or not, from a file or a bundle member (see ear/archives.py)
+def open_artifact(file_path):
+    with archives.open_binary(file_path) as file:
+        magic = file.read(6)
+    member = archives.is_member(file_path)
+    for prefix, decompressor in decompressors:
+        if magic.startswith(prefix):
+            return io.TextIOWrapper(decompressor(archives.open_binary(file_path) if member else file_path))
+    return io.TextIOWrapper(archives.open_binary(file_path)) if member else open(file_path, 'r')
+
+
+# Name of an artifact without its compression suffix ("out.qv.gz" -> "out.qv")
+def strip_compression(file_name):
+    for suffix in COMPRESSED_SUFFIXES:
+        if file_name.endswith(suffix):
+            return file_name[:-len(suffix)]
+    return file_name
+
+
+# Read a text artifact
+def read_artifact(file_path):
+    key = cache_key('text', file_path)
+    if key not in artifact_cache:
+        with open_artifact(file_path) as file:
+            artifact_cache[key] = file.read()
+        count_read(file_path, key[3])
+    return artifact_cache[key]
+
+
+# Read a binary artifact (an image) as it is
+def read_binary(file_path):
+    key = cache_key('bytes', file_path)
+    if key not in artifact_cache:
+        with archives.open_binary(file_path) as file:
+            artifact_cache[key] = file.read()
+        count_read(file_path, key[3])
+    return artifact_cache[key]
+
+
+# Drop the artifacts of a kind once they are used (the images, once embedded in the report), so
+# they do not pile up in a batch worker
+def forget_artifacts(kind):
+    for key in [key for key in artifact_cache if key[0] == kind]:
+        del artifact_cache[key]
+
+
+# Parse an artifact with the given parser, once per file
+def load_artifact(file_path, parser):
+    key = cache_key(parser.__name__, file_path)
+    if key not in artifact_cache:
+        with open_artifact(file_path) as file:
+            artifact_cache[key] = parser(file, file_path)
+        count_read(file_path, key[3])
+    return artifact_cache[key]
+
+
+# GFASTATS #######################################################################################
+
+# The "key: value" (gfastats CLI) or "key<TAB>value" (Galaxy) lines of a report. A key ends at
+# the first ": " or tab, so "Base composition (A:C:G:T)" is one
+gfastats_line = re.compile(r"^[ \t]*([^\t\n:]*(?::(?! )[^\t\n:]*)*)(?:: |\t)(.*)$", re.MULTILINE)
+
+
+# Every key and value of a report, in one scan. With --nstar-report some keys may repeat, the
+# first value is kept
+def scan_gfastats(content):
+    values = {}
+    for key, value in gfastats_line.findall(content):
+        if key not in values:
+            values[key] = value.strip()
+    return values
+
+
+class GfastatsKeyError(KeyError):
+    def __init__(self, path, missing):
+        super().__init__(missing)
+        self.path = path
+        self.missing = missing
+
+    def __str__(self):
+        return f"{self.path} has no {', '.join(repr(key) for key in self.missing)} (is it a gfastats --nstar-report?)"
+
+
+class GfastatsReport:
+    """A gfastats report, in either format, parsed once into its keys and values. Values are kept
+    as written (that is what the quality metrics table shows); int() and float() give them as
+    numbers."""
+
+    def __init__(self, path, values):
+        self.path = path
+        self.values = values
+
+    # Values of the given keys. Missing keys are all reported at once, or given the default
+    def extract(self, keys, default=None):
+        missing = [key for key in keys if key not in self.values]
+        if missing and default is None:
+            raise GfastatsKeyError(self.path, missing)
+        return [self.values.get(key, default) for key in keys]
+
+    def __getitem__(self, key):
+        return self.extract([key])[0]
+
+    def __contains__(self, key):
+        return key in self.values
+
+    def int(self, key):
+        return int(self[key].replace(',', ''))
+
+    def float(self, key):
+        return float(self[key].replace(',', ''))
+
+    def to_record(self):
+        return {'values': self.values}
+
+    @classmethod
+    def from_record(cls, path, record):
+        return cls(path, dict(record['values']))
+
+
+def parse_gfastats(file, file_path):
+    return GfastatsReport(file_path, scan_gfastats(file.read()))
+
+
+# The gfastats report of an assembly, or its metrics computed from the FASTA file given instead
+# (see FASTA below), told apart by their first character
+def load_gfastats(file_path):
+    for parser in (parse_gfastats, parse_fasta):
+        key = cache_key(parser.__name__, file_path)
+        if key in artifact_cache:
+            return artifact_cache[key]
+    with open_artifact(file_path) as file:
+        fasta = file.read(1) == '>'
+    return load_artifact(file_path, parse_fasta if fasta else parse_gfastats)
+
+
+# MERQURY ########################################################################################
+
+# QV of the assembly in the given row, if the table has all the assemblies (not per scaffold)
+def qv_from_table(rows, order):
+    if len(rows) > order and (len(rows) == 1 or (len(rows) > 2 and rows[2][0].strip() == "Both")):
+        return rows[order][3]
+    return None
+
+
+# k-mer completeness of the assembly in the given row
+def completeness_from_table(rows, order):
+    if len(rows) > order:
+        return rows[order][4].strip()
+    return None
+
+
+# merqury compares one or two assemblies: its tables have a row for each, plus "Both" for two.
+# Later rows are those of the per-scaffold .qv tables, not needed by the report
+MERQURY_ROWS = 3
+
+
+class MerquryTable:
+    """QV and k-mer completeness of each assembly of a merqury .qv or completeness.stats table, in
+    row order (None where the table does not give them). Only these are kept, and recorded in the
+    build manifest, not the rows of the table."""
+
+    def __init__(self, path, values):
+        self.path = path
+        self.values = values
+
+    @classmethod
+    def from_rows(cls, path, rows):
+        values = []
+        for order in range(len(rows)):
+            value = []
+            for from_table in (qv_from_table, completeness_from_table):
+                try:
+                    value.append(from_table(rows, order))
+                except IndexError:
+                    # a row too short for the column
+                    value.append(None)
+            values.append(tuple(value))
+        return cls(path, values)
+
+    def qv(self, order):
+        return self.values[order][0] if order < len(self.values) else None
+
+    def completeness(self, order):
+        return self.values[order][1] if order < len(self.values) else None
+
+    def to_record(self):
+        return {'values': self.values}
+
+    @classmethod
+    def from_record(cls, path, record):
+        return cls(path, [tuple(value) for value in record['values']])
+
+
+# The first rows of a merqury table (see MERQURY_ROWS), as a MerquryTable
+def parse_merqury_table(file, file_path):
+    return MerquryTable.from_rows(file_path, [line.split('\t') for line in itertools.islice(file, MERQURY_ROWS)])
+
+
+def load_merqury_table(file_path):
+    return load_artifact(file_path, parse_merqury_table)
+
+
+class MerquryResults:
+    """Index of a merqury output folder. The folder is listed once, the .qv and completeness.stats
+    tables (compressed or not) are parsed the first time they are needed and the *.ln.png plots
+    are classified. Files are kept in listing order, as glob() returned them."""
+
+    def __init__(self, folder):
+        self.folder = folder
+        names = [name for name in archives.listdir(folder) if not name.startswith('.')]
+        self.qv_files = [os.path.join(folder, name) for name in names if fnmatch.fnmatch(strip_compression(name), '*.qv')]
+        self.completeness_files = [os.path.join(folder, name) for name in names if fnmatch.fnmatch(strip_compression(name), '*completeness.stats')]
+        self.png_files = [os.path.join(folder, name) for name in fnmatch.filter(names, '*.ln.png')]
+        self.spectra_asm_files = [f for f in self.png_files if f.endswith("spectra-asm.ln.png")]
+        self.spectra_cn_files = [f for f in self.png_files if f.endswith("spectra-cn.ln.png")]
+
+    # QV of the assembly in the given row, from the table with all the assemblies
+    # (the per-scaffold .qv tables are skipped)
+    def qv(self, order):
+        for file_path in self.qv_files:
+            qv_value = load_merqury_table(file_path).qv(order)
+            if qv_value is not None:
+                return qv_value
+        return None
+
+    # k-mer completeness of the assembly in the given row
+    def completeness(self, order):
+        for file_path in self.completeness_files:
+            completeness_value = load_merqury_table(file_path).completeness(order)
+            if completeness_value is not None:
+                return completeness_value
+        return None
+
+
+def load_merqury(folder):
+    key = cache_key('merqury', folder)
+    if key not in artifact_cache:
+        artifact_cache[key] = MerquryResults(folder)
+    return artifact_cache[key]
+
+
+# BUSCO ##########################################################################################
+
+# The one line summary, "C:93.5%[S:92.0%,D:1.5%],F:0.5%,M:2.4%,n:9226", with or without spaces,
+# decimals or the E: (erroneous) score of recent versions after n:
+busco_summary_pattern = re.compile(
+    r"C:\s*([\d.]+)%\s*\[\s*S:\s*([\d.]+)%\s*,\s*D:\s*([\d.]+)%\s*\]\s*,\s*F:\s*([\d.]+)%\s*,\s*M:\s*([\d.]+)%\s*,\s*n:\s*(\d+)")
+
+
+class BuscoSummary:
+    """A BUSCO short summary: the single copy, duplicated, fragmented and missing scores (as
+    written, '92.0%'), the number of BUSCOs and the run info (version, lineage, mode, predictor).
+    Values not found in the summary are None."""
+
+    fields = ('single', 'duplicated', 'fragmented', 'missing', 'n', 'version', 'lineage', 'genomes', 'buscos', 'mode', 'predictor')
+
+    def __init__(self, path, **values):
+        self.path = path
+        for field in self.fields:
+            setattr(self, field, values.get(field))
+
+    # S, D, F and M as the quality metrics table shows them, '' if the summary had none
+    def scores(self):
+        if self.single is None:
+            return '', '', '', ''
+        return self.single, self.duplicated, self.fragmented, self.missing
+
+    # (version, (lineage, genomes, buscos), mode, predictor) as the report footer shows it
+    def info(self):
+        lineage = (self.lineage, self.genomes, self.buscos) if self.lineage is not None else None
+        return self.version, lineage, self.mode, self.predictor
+
+    def to_record(self):
+        return {field: getattr(self, field) for field in self.fields}
+
+    @classmethod
+    def from_record(cls, path, record):
+        return cls(path, **record)
+
+
+# The genome mode BUSCO names after each gene predictor (euk_genome_met...)
+BUSCO_PREDICTOR_MODES = {'metaeuk': 'met', 'augustus': 'aug', 'miniprot': 'min', 'prodigal': 'prod'}
+BUSCO_MODES = {'genome': 'genome', 'geno': 'genome', 'transcriptome': 'tran', 'tran': 'tran', 'proteins': 'proteins', 'prot': 'proteins'}
+
+
+# The mode of a BUSCO run as the text summary of BUSCO 5 names it (euk_genome_met, prok_tran,
+# proteins). The JSON summary, and older versions, may give the mode asked for (genome) instead,
+# completed here with the domain (prokaryotes are the ones run with prodigal) and the predictor
+def busco_mode(mode, predictor, domain=None):
+    kind = BUSCO_MODES.get(mode)
+    if kind is None or kind == 'proteins':
+        return kind or mode
+    if domain is None:
+        domain = 'prokaryota' if predictor == 'prodigal' else 'eukaryota'
+    prefix = 'prok' if domain == 'prokaryota' else 'euk'
+    if kind == 'tran':
+        return f"{prefix}_tran"
+    return f"{prefix}_genome_{BUSCO_PREDICTOR_MODES[predictor]}" if predictor in BUSCO_PREDICTOR_MODES else f"{prefix}_genome"
+
+
+# A summary of the values found, logged once if it has no scores. Both parsers give the mode in
+# the same terms (see busco_mode)
+def busco_summary(file_path, values, domain=None):
+    if 'single' not in values:
+        logging.warning(f"Error reading {file_path}: no BUSCO one line summary (C:...,n:...) found")
+    if 'mode' in values:
+        values['mode'] = busco_mode(values['mode'], values.get('predictor'), domain)
+    return BuscoSummary(file_path, **values)
+
+
+def busco_scores(values, summary):
+    match = busco_summary_pattern.search(summary or '')
+    if match:
+        for field, value in zip(('single', 'duplicated', 'fragmented', 'missing'), match.groups()[1:5]):
+            values[field] = f"{value}%"
+        values['n'] = match.group(6)
+
+
+def parse_busco_text(file, file_path):
+    content = file.read()
+    values = {}
+    busco_scores(values, content)
+    version_match = re.search(r"# BUSCO version is: ([\d.]+)", content)
+    if version_match:
+        values['version'] = version_match.group(1)
+    lineage_match = re.search(r"The lineage dataset is: (.*?) \(Creation date:.*?, number of (genomes|species): (\d+), number of BUSCOs: (\d+)\)", content)
+    if lineage_match:
+        values.update(lineage=lineage_match.group(1), genomes=lineage_match.group(3), buscos=lineage_match.group(4))
+    mode_match = re.search(r"# BUSCO was run in mode: (\w+)", content)
+    if mode_match:
+        values['mode'] = mode_match.group(1)
+    pred_match = re.search(r"# Gene predictor used: (\w+)", content)
+    if pred_match:
+        values['predictor'] = pred_match.group(1)
+    return busco_summary(file_path, values)
+
+
+# short_summary.*.json of BUSCO >= 5. The scores come from its one line summary, as in the text
+# summary, or from the percentages when it has none
+def parse_busco_json(file, file_path):
+    data = json.load(file)
+    results = data.get('results', {})
+    parameters = data.get('parameters', {})
+    versions = data.get('versions', {})
+    dataset = data.get('lineage_dataset', {})
+
+    values = {}
+    busco_scores(values, results.get('one_line_summary'))
+    if 'single' not in values and 'Single copy percentage' in results:
+        for field, key in (('single', 'Single copy percentage'), ('duplicated', 'Multi copy percentage'),
+                           ('fragmented', 'Fragmented percentage'), ('missing', 'Missing percentage')):
+            values[field] = f"{float(results[key]):.1f}%"
+        values['n'] = str(results.get('n_markers', dataset.get('number_of_buscos')))
+    if 'busco' in versions:
+        values['version'] = str(versions['busco'])
+    if 'name' in dataset:
+        values.update(lineage=dataset['name'], genomes=str(dataset.get('number_of_species', dataset.get('number_of_genomes'))),
+                      buscos=str(dataset.get('number_of_buscos')))
+    if 'mode' in parameters:
+        values['mode'] = parameters['mode']
+    # older versions do not record the predictor, it is the one with a version
+    predictor = parameters.get('gene_predictor') or next((tool for tool in ('metaeuk', 'augustus', 'miniprot', 'prodigal') if tool in versions), None)
+    if predictor:
+        values['predictor'] = predictor
+    return busco_summary(file_path, values, parameters.get('domain'))
+
+
+# short_summary.*.json written by BUSCO next to the text summary, archived compressed or not
+def busco_json_paths(file_path):
+    json_path = f"{os.path.splitext(strip_compression(file_path))[0]}.json"
+    return [json_path] + [json_path + suffix for suffix in COMPRESSED_SUFFIXES]
+
+
+# The BUSCO summary of a run, from its JSON summary when there is one (or the path given is one),
+# from the text summary otherwise
+def load_busco(file_path):
+    for json_path in busco_json_paths(file_path):
+        if archives.isfile(json_path):
+            return load_artifact(json_path, parse_busco_json)
+    return load_artifact(file_path, parse_busco_text)
+
+
+# SEQUENCE LENGTHS ###############################################################################
+
+# Nx curves of an assembly, from the length of each of its sequences: a FASTA index (.fai, or any
+# "name<TAB>length" list such as gfastats --out-size) or a gfastats --seq-report. The lengths are
+# streamed into a packed array (8 bytes per sequence, whatever the size of the file) and the curve
+# computed with NumPy when it is installed, in pure Python otherwise
+NX_STEPS = 100
+
+
+class NxCurve:
+    """Nx and Lx of a set of sequences for x = 1..100 (nx[x - 1], lx[x - 1]), with their number,
+    total length and area under the Nx curve (auN, the length weighted mean length)."""
+
+    fields = ('count', 'total', 'nx', 'lx', 'aun')
+
+    def __init__(self, path, count, total, nx, lx, aun):
+        self.path = path
+        self.count = count
+        self.total = total
+        self.nx = nx
+        self.lx = lx
+        self.aun = aun
+
+    def n(self, x):
+        return self.nx[x - 1]
+
+    def l(self, x):
+        return self.lx[x - 1]
+
+    def to_record(self):
+        return {field: getattr(self, field) for field in self.fields}
+
+    @classmethod
+    def from_record(cls, path, record):
+        return cls(path, **record)
+
+
+def nx_curve(file_path, lengths):
+    if not lengths:
+        raise ValueError(f"No sequence lengths found in {file_path}")
+    # the sequences covering x% of the total, longest first, end at the first cumulative length
+    # reaching ceil(total * x / 100)
+    if numpy is not None:
+        values = numpy.sort(numpy.frombuffer(lengths, dtype=numpy.int64))[::-1]
+        cumulative = numpy.cumsum(values)
+        total = int(cumulative[-1])
+        thresholds = numpy.array([-(-total * x // NX_STEPS) for x in range(1, NX_STEPS + 1)], dtype=numpy.int64)
+        index = numpy.searchsorted(cumulative, thresholds, side='left')
+        weighted = numpy.dot(values.astype(numpy.float64), values.astype(numpy.float64))
+        return NxCurve(file_path, len(values), total, values[index].tolist(), (index + 1).tolist(), float(weighted) / total)
+
+    values = sorted(lengths, reverse=True)
+    total = sum(values)
+    nx, lx = [], []
+    cumulative = 0
+    x = 1
+    for rank, length in enumerate(values, 1):
+        cumulative += length
+        while x <= NX_STEPS and cumulative * NX_STEPS >= total * x:
+            nx.append(length)
+            lx.append(rank)
+            x += 1
+    return NxCurve(file_path, len(values), total, nx, lx, sum(float(length) * length for length in values) / total)
+
+
+# The second column of a .fai (name, length, offset, ...) or of a "name<TAB>length" list, read
+# about a MB of lines at a time
+def parse_fasta_index(file, file_path):
+    lengths = array('q')
+    while True:
+        lines = file.readlines(1 << 20)
+        if not lines:
+            break
+        lengths.extend([int(line.split('\t', 2)[1]) for line in lines if '\t' in line])
+    return nx_curve(file_path, lengths)
+
+
+# gfastats --seq-report, either as "key: value" blocks (one per sequence) or as a table with a
+# header row, of which the "Total segment length" (the length of the sequence) is kept
+def parse_seq_report(file, file_path):
+    lengths = array('q')
+    column = None
+    for line in file:
+        line = line.rstrip('\n')
+        if line.startswith('Total segment length:'):
+            lengths.append(int(line.split(':', 1)[1].strip().replace(',', '')))
+        elif column is not None:
+            fields = line.split('\t')
+            if len(fields) > column and fields[column].strip():
+                lengths.append(int(fields[column].replace(',', '')))
+        elif '\tTotal segment length' in line or line.startswith('Total segment length\t'):
+            column = line.split('\t').index('Total segment length')
+    return nx_curve(file_path, lengths)
+
+
+def load_fasta_index(file_path):
+    return load_artifact(file_path, parse_fasta_index)
+
+
+def load_seq_report(file_path):
+    return load_artifact(file_path, parse_seq_report)
+
+
+# FASTA ##########################################################################################
+
+# The gfastats metrics the report shows, computed from the FASTA file of an assembly when it has
+# no gfastats report. The file is read in large chunks of whole lines, and the bases of each
+# stretch of sequence counted with NumPy over a view of the chunk (copied without its line breaks
+# only when it has gaps, to find where they start and end). Contigs are the runs of bases between
+# gaps (runs of N). Without NumPy the counting is done with bytes methods, several times slower
+FASTA_CHUNK_SIZE = 1 << 24
+
+# Bases masked with 0xDB (clearing the lower case bit, and the bit telling C from G), so one
+# comparison counts either case: C, G -> 67, A -> 65, T -> 80, N -> 74. The letters masked alike
+# (E, J, P) are not IUPAC codes
+GC_MASKED, A_MASKED, T_MASKED, N_MASKED = 67, 65, 80, 74
+upper_case = bytes.maketrans(b'acgtn', b'ACGTN')
+
+
+# (length, G+C bases, A+T bases, starts with a gap, runs) of a stretch of sequence (whole lines),
+# the runs being the lengths of its gaps and runs of bases, alternating
+def scan_sequence(buffer, start, end):
+    gapped = buffer.find(b'N', start, end) >= 0 or buffer.find(b'n', start, end) >= 0
+    if numpy is None:
+        sequence = buffer[start:end].translate(upper_case, b'\r\n')
+        gc = sequence.count(b'G') + sequence.count(b'C')
+        at = sequence.count(b'A') + sequence.count(b'T')
+        if not gapped:
+            return len(sequence), gc, at, False, [len(sequence)]
+        runs, position = [], 0
+        for match in re.finditer(rb'N+', sequence):
+            runs += [match.start() - position, match.end() - match.start()]
+            position = match.end()
+        if position < len(sequence):
+            runs.append(len(sequence) - position)
+        return len(sequence), gc, at, runs[0] == 0, runs[1:] if runs[0] == 0 else runs
+
+    if gapped:
+        sequence = buffer[start:end].translate(None, b'\r\n')
+        length = len(sequence)
+        masked = numpy.frombuffer(sequence, dtype=numpy.uint8) & 0xDB
+    else:
+        length = end - start - buffer.count(b'\n', start, end) - buffer.count(b'\r', start, end)
+        masked = numpy.frombuffer(buffer, dtype=numpy.uint8, count=end - start, offset=start) & 0xDB
+    gc = int(numpy.count_nonzero(masked == GC_MASKED))
+    at = int(numpy.count_nonzero(masked == A_MASKED)) + int(numpy.count_nonzero(masked == T_MASKED))
+    if not gapped:
+        return length, gc, at, False, [length]
+    gaps = masked == N_MASKED
+    bounds = numpy.concatenate(([0], numpy.flatnonzero(gaps[1:] != gaps[:-1]) + 1, [length]))
+    return length, gc, at, bool(gaps[0]), numpy.diff(bounds).tolist()
+
+
+class FastaScanner:
+    """Lengths of the scaffolds (FASTA records), contigs and gaps of an assembly, and its G+C and
+    A+T bases, fed a chunk of whole lines at a time. A run of bases or gaps is carried over to the
+    next chunk until it ends."""
+
+    def __init__(self):
+        self.scaffolds = array('q')
+        self.contigs = array('q')
+        self.gaps = 0
+        self.gap_length = 0
+        self.gc = 0
+        self.at = 0
+        self.record = None
+        self.run = 0
+        self.run_gap = False
+
+    def end_run(self):
+        if self.run:
+            if self.run_gap:
+                self.gaps += 1
+                self.gap_length += self.run
+            else:
+                self.contigs.append(self.run)
+        self.run = 0
+
+    def end_record(self):
+        if self.record is not None:
+            self.end_run()
+            self.scaffolds.append(self.record)
+        self.record = None
+
+    def sequence(self, buffer, start, end):
+        if self.record is None:
+            return
+        length, gc, at, gap, runs = scan_sequence(buffer, start, end)
+        self.record += length
+        self.gc += gc
+        self.at += at
+        for run in runs:
+            if gap != self.run_gap:
+                self.end_run()
+                self.run_gap = gap
+            self.run += run
+            gap = not gap
+
+    def feed(self, buffer, end):
+        start = 0
+        while start < end:
+            header = buffer.find(b'>', start, end)
+            if header < 0:
+                self.sequence(buffer, start, end)
+                return
+            if header > start:
+                self.sequence(buffer, start, header)
+            self.end_record()
+            self.record = 0
+            self.run_gap = False
+            start = buffer.find(b'\n', header, end) + 1 or end
+
+
+def format_metric(value):
+    return f"{value:.2f}" if isinstance(value, float) else str(value)
+
+
+# gfastats metrics of the scanned assembly, named as in its reports
+def fasta_metrics(file_path, scanner):
+    scaffolds = nx_curve(file_path, scanner.scaffolds)
+    contigs = nx_curve(file_path, scanner.contigs)
+    metrics = {
+        "# contigs": contigs.count,
+        "Total contig length": contigs.total,
+        "Average contig length": contigs.total / contigs.count,
+        "Contig N50": contigs.n(50),
+        "Contig auN": contigs.aun,
+        "Contig L50": contigs.l(50),
+        "Contig N90": contigs.n(90),
+        "Contig L90": contigs.l(90),
+        "Largest contig": max(scanner.contigs),
+        "Smallest contig": min(scanner.contigs),
+        "# scaffolds": scaffolds.count,
+        "Total scaffold length": scaffolds.total,
+        "Average scaffold length": scaffolds.total / scaffolds.count,
+        "Scaffold N50": scaffolds.n(50),
+        "Scaffold auN": scaffolds.aun,
+        "Scaffold L50": scaffolds.l(50),
+        "Scaffold N90": scaffolds.n(90),
+        "Scaffold L90": scaffolds.l(90),
+        "Largest scaffold": max(scanner.scaffolds),
+        "Smallest scaffold": min(scanner.scaffolds),
+        "# gaps in scaffolds": scanner.gaps,
+        "Total gap length in scaffolds": scanner.gap_length,
+        "Average gap length in scaffolds": scanner.gap_length / scanner.gaps if scanner.gaps else 0.0,
+        "GC content %": 100 * scanner.gc / (scanner.gc + scanner.at) if scanner.gc + scanner.at else 0.0,
+    }
+    return {key: format_metric(value) for key, value in metrics.items()}, {'Scaffolds': scaffolds, 'Contigs': contigs}
+
+
+class FastaReport(GfastatsReport):
+    """The gfastats metrics of an assembly computed from its FASTA file, looked up as those of a
+    report, with the Nx curves of its scaffolds and contigs."""
+
+    def __init__(self, path, metrics, curves):
+        super().__init__(path, metrics)
+        self.curves = curves
+
+    def to_record(self):
+        return {'values': self.values, 'curves': {sequences: curve.to_record() for sequences, curve in self.curves.items()}}
+
+    @classmethod
+    def from_record(cls, path, record):
+        return cls(path, record['values'], {sequences: NxCurve.from_record(path, curve) for sequences, curve in record['curves'].items()})
+
+
+# The file is read into one buffer, reused for every chunk: the partial line at the end of a chunk
+# is moved to its start and the next chunk read after it. The buffer only grows for a line longer
+# than itself
+def parse_fasta(file, file_path):
+    scanner = FastaScanner()
+    source = file.buffer
+    buffer = bytearray(FASTA_CHUNK_SIZE)
+    filled = 0
+    while True:
+        if filled == len(buffer):
+            buffer.extend(bytes(len(buffer)))
+        with memoryview(buffer) as view:
+            read = source.readinto(view[filled:])
+        if not read:
+            # the last line, ended as the others
+            buffer[filled:filled + 1] = b'\n'
+            scanner.feed(buffer, filled + 1)
+            break
+        filled += read
+        end = buffer.rfind(b'\n', 0, filled) + 1
+        scanner.feed(buffer, end)
+        buffer[:filled - end] = buffer[end:filled]
+        filled -= end
+    scanner.end_record()
+    metrics, curves = fasta_metrics(file_path, scanner)
+    return FastaReport(file_path, metrics, curves)
+
+
+# RECORDS #########################################################################################
+
+# Artifacts kept between runs in the build manifest (see ear/manifest.py), by kind, with the
+# functions turning them into JSON records and back
+record_codecs = {
+    'text': (lambda value: value, lambda path, record: record),
+    'parse_gfastats': (GfastatsReport.to_record, GfastatsReport.from_record),
+    'parse_merqury_table': (MerquryTable.to_record, MerquryTable.from_record),
+    'parse_busco_text': (BuscoSummary.to_record, BuscoSummary.from_record),
+    'parse_busco_json': (BuscoSummary.to_record, BuscoSummary.from_record),
+    'parse_fasta_index': (NxCurve.to_record, NxCurve.from_record),
+    'parse_seq_report': (NxCurve.to_record, NxCurve.from_record),
+    'parse_fasta': (FastaReport.to_record, FastaReport.from_record),
+}
+
+
+# Records of the artifacts read by this process from the given files, {path: (mtime_ns, size)}.
+# Only those read from the files as they are now are kept
+def export_records(file_stats):
+    records = {}
+    for (kind, file_path, mtime_ns, size), value in artifact_cache.items():
+        if kind in record_codecs and file_stats.get(file_path) == (mtime_ns, size):
+            records.setdefault(kind, {})[file_path] = record_codecs[kind][0](value)
+    return records
+
+
+# Seed the artifacts with the records of a previous run, for files known to be unchanged
+def import_records(records):
+    for kind, by_path in records.items():
+        if kind not in record_codecs:
+            continue
+        for file_path, record in by_path.items():
+            try:
+                artifact_cache[cache_key(kind, file_path)] = record_codecs[kind][1](file_path, record)
+            except OSError:
+                continue
@@ -0,0 +1,84 @@
+# ERGA EARs Report Module
+# eardata.py
+# ERGA Sequencing and Assembly Committee
+#
+# Formats of the report data shared by make_EAR.py and EARpdf_to_yaml.py: the YAML layout of the
+# EAR files, and the EAR.json embedded in the PDF. Only yaml and json are needed here, so reading
+# a PDF back does not load the report engine.
+
+import json
+import logging
+from collections import OrderedDict
+
+import yaml
+
+
+# YAML layout of the EAR files: indented lists, multiline strings as blocks, keys as given
+class EARDumper(yaml.Dumper):
+    def increase_indent(self, flow=False, indentless=False):
+        return super(EARDumper, self).increase_indent(flow, False)
+
+
+def str_presenter(dumper, data):
+    if "\n" in data:  # check for multiline string
+        return dumper.represent_scalar("tag:yaml.org,2002:str", data, style="|")
+    return dumper.represent_scalar("tag:yaml.org,2002:str", data)
+
+
+EARDumper.add_representer(OrderedDict, lambda dumper, data: dumper.represent_dict(data.items()))
+EARDumper.add_representer(str, str_presenter)
+
+
+def save_to_yaml(data, output_path):
+    # Convert to YAML string
+    yaml_string = yaml.dump(data, Dumper=EARDumper, default_flow_style=False, sort_keys=False)
+
+    # Post-process the YAML string
+    lines = yaml_string.split("\n")
+    processed_lines = []
+    sections_to_add_space_before = [
+        "EBP metrics:",
+        "Metrics:",
+        "Curator notes:",
+        "BUSCO:",
+        "Data:",
+        "Assembly pipeline:",
+        "Curation pipeline:",
+        "Submitter:",
+        "Date and time:",
+    ]
+
+    for i, line in enumerate(lines):
+        if any(line.startswith(section) for section in sections_to_add_space_before):
+            processed_lines.append("")  # Add a blank line before these sections
+        processed_lines.append(line)
+        if line.startswith("Tags:") or line.startswith("Order:"):
+            processed_lines.append("")  # Add a blank line after Tags and Order
+
+    # Join lines back together
+    processed_yaml = "\n".join(processed_lines)
+
+    # Write to file
+    with open(output_path, "w") as yaml_file:
+        yaml_file.write(processed_yaml.strip() + "\n")
+
+
+# EMBEDDED DATA ##################################################################################
+
+# Name and schema version of the data embedded in the PDF. The schema changes when the structure
+# of the data does; readers ignore the versions they do not know
+EAR_DATA_NAME = "EAR.json"
+EAR_DATA_SCHEMA = 1
+
+
+def encode_ear_data(data):
+    return json.dumps({'schema': EAR_DATA_SCHEMA, 'data': data}, ensure_ascii=False).encode('utf-8')
+
+
+# The embedded data, in its original order, or None if it has another schema version
+def decode_ear_data(content):
+    payload = json.loads(content.decode('utf-8'), object_pairs_hook=OrderedDict)
+    if payload.get('schema') != EAR_DATA_SCHEMA:
+        logging.warning(f"Ignoring embedded {EAR_DATA_NAME} with schema {payload.get('schema')}, expected {EAR_DATA_SCHEMA}")
+        return None
+    return payload['data']
@@ -0,0 +1,113 @@
+# ERGA EARs Report Module
+# images.py
+# ERGA Sequencing and Assembly Committee
+
+import hashlib
+import io
+import logging
+import os
+import zlib
+
+from ear.artifacts import read_binary
+from ear.taxonomy import default_cache_dir
+
+try:
+    from PIL import Image as PILImage
+    # Image.Dither since Pillow 9.1
+    DITHER_NONE = getattr(PILImage, 'Dither', PILImage).NONE
+except ImportError:
+    PILImage = None
+
+
+CM_PER_INCH = 2.54
+
+
+def default_image_cache():
+    return os.path.join(default_cache_dir(), "images")
+
+
+class ImageOptimiser:
+    """Downsample the images embedded in the report to the size they are drawn at, for the given
+    DPI, and recompress them as JPEG (or palette PNG). Results are cached by content hash, so
+    re-rendering a report reuses them, and so is the decision to keep an original that would not
+    get smaller in the PDF. With enabled=False the original files are used."""
+
+    def __init__(self, dpi=200, image_format='jpeg', quality=85, cache_dir=None, enabled=True):
+        self.dpi = dpi
+        self.image_format = image_format
+        self.quality = quality
+        self.cache_dir = cache_dir or default_image_cache()
+        self.enabled = enabled
+        if enabled and PILImage is None:
+            logging.warning("Pillow is not available, images are embedded as they are")
+            self.enabled = False
+
+    def prepare(self, png_file, width_cm, height_cm):
+        if not self.enabled:
+            return png_file
+        try:
+            return self.optimise(png_file, width_cm, height_cm)
+        except Exception as e:
+            logging.warning(f"Could not optimise image {png_file}, embedding it as it is: {str(e)}")
+            return png_file
+
+    def optimise(self, png_file, width_cm, height_cm):
+        target_size = (round(width_cm / CM_PER_INCH * self.dpi), round(height_cm / CM_PER_INCH * self.dpi))
+
+        # the image read once, or prefetched with the other inputs of the report
+        content = read_binary(png_file)
+        digest = hashlib.sha256(content)
+        digest.update(f"{target_size}/{self.image_format}/{self.quality}".encode())
+        extension = 'jpg' if self.image_format == 'jpeg' else 'png'
+        cached_file = os.path.join(self.cache_dir, f"{digest.hexdigest()}.{extension}")
+        # left empty when the original is kept
+        keep_file = os.path.join(self.cache_dir, f"{digest.hexdigest()}.original")
+        if os.path.exists(cached_file):
+            return cached_file
+        if os.path.exists(keep_file):
+            return png_file
+
+        with PILImage.open(io.BytesIO(content)) as image:
+            image.load()
+            original_size = len(content) if image.format == 'JPEG' else embedded_size(image)
+            # the PDF page is white, flatten any transparency on it
+            if image.mode in ('RGBA', 'LA', 'P'):
+                image = image.convert('RGBA')
+                background = PILImage.new('RGB', image.size, (255, 255, 255))
+                background.paste(image, mask=image.split()[-1])
+                image = background
+            else:
+                image = image.convert('RGB')
+
+            # the image is stretched to the drawn size anyway, never upscale it
+            new_size = (min(image.width, target_size[0]), min(image.height, target_size[1]))
+            if new_size != image.size:
+                image = image.resize(new_size, PILImage.LANCZOS)
+
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_file = f"{cached_file}.{os.getpid()}.tmp"
+            if self.image_format == 'jpeg':
+                image.save(tmp_file, 'JPEG', quality=self.quality, optimize=True)
+                size = os.path.getsize(tmp_file)
+            else:
+                # dithering noise does not deflate, in the PNG or in the PDF
+                image = image.quantize(colors=256, dither=DITHER_NONE)
+                image.save(tmp_file, 'PNG', optimize=True)
+                size = embedded_size(image)
+
+        # keep the original when the downsampled image would not make the PDF smaller (resampling
+        # can break the long repeats that deflate smooth plots well)
+        if size >= original_size:
+            os.remove(tmp_file)
+            with open(keep_file, 'w'):
+                pass
+            return png_file
+        # batch workers may prepare the same image at once, keep whichever lands last
+        os.replace(tmp_file, cached_file)
+        return cached_file
+
+
+# Bytes an image that is not a JPEG takes in the PDF: reportlab embeds JPEG files as they are, and
+# any other image as its RGB pixels deflated (whatever the compression of its file)
+def embedded_size(image):
+    return len(zlib.compress(image.convert('RGB').tobytes()))
@@ -0,0 +1,202 @@
+# ERGA EARs Report Module
+# manifest.py
+# ERGA Sequencing and Assembly Committee
+#
+# Build manifest written next to each report ({ToLID}_EAR.manifest.json): the content hash of the
+# YAML and of every file it references, the parsed artifacts and the warnings of the report.
+# A rerun with the same inputs keeps the PDF, and after some files changed only those are parsed again.
+
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from ear import archives
+from ear.artifacts import busco_json_paths, export_records, import_records
+from ear.timings import count_read
+
+
+MANIFEST_VERSION = 4
+
+# YAML keys holding the paths of the artifacts
+PATH_KEY_SUFFIXES = ('_txt', '_png', '_folder', '_fai', '_fasta', 'merqury_qv', 'merqury_completeness_stats')
+
+
+def manifest_path(pdf_filename):
+    return f"{os.path.splitext(pdf_filename)[0]}.manifest.json"
+
+
+# Every file the report reads: the YAML, the artifacts it references (gfastats, BUSCO, GenomeScope
+# and Smudgeplot summaries, merqury results, FASTA files and indexes, PNGs) and the contents of
+# the merqury folders. Folders are listed too, so adding or removing a file in them counts as a
+# change, and so is the JSON summary BUSCO may write next to the text one, read instead of it when
+# it is there
+def referenced_paths(config):
+    paths = [config['yaml_file']]
+
+    def walk(data):
+        if isinstance(data, dict):
+            for key, value in data.items():
+                if isinstance(value, str) and str(key).endswith(PATH_KEY_SUFFIXES):
+                    paths.append(value)
+                    if key == 'busco_short_summary_txt':
+                        paths.extend(busco_json_paths(value))
+                    if archives.isdir(value):
+                        paths.extend(os.path.join(value, name) for name in sorted(archives.listdir(value)) if not name.startswith('.'))
+                else:
+                    walk(value)
+        elif isinstance(data, list):
+            for item in data:
+                walk(item)
+
+    walk(config['yaml_data'])
+    unique_paths = []
+    for path in map(archives.abspath, paths):
+        if path not in unique_paths:
+            unique_paths.append(path)
+    return unique_paths
+
+
+# State of a file (size, mtime and content hash) or of a folder (hash of its listing), bundle
+# members included. The hash of the previous state is reused when size and mtime did not change,
+# so checking an unchanged report does not read its files
+def file_state(path, previous=None):
+    try:
+        mtime_ns, size = archives.path_stat(path)
+    except FileNotFoundError:
+        return {'missing': True}
+
+    if archives.isdir(path):
+        listing = "\n".join(sorted(name for name in archives.listdir(path) if not name.startswith('.')))
+        return {'folder': True, 'sha256': hashlib.sha256(listing.encode()).hexdigest()}
+
+    state = {'size': size, 'mtime_ns': mtime_ns}
+    if previous and previous.get('size') == state['size'] and previous.get('mtime_ns') == state['mtime_ns']:
+        state['sha256'] = previous['sha256']
+        return state
+
+    digest = hashlib.sha256()
+    with archives.open_binary(path) as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    count_read(path, size)
+    state['sha256'] = digest.hexdigest()
+    return state
+
+
+def same_content(previous, current):
+    return previous is not None and all(previous.get(key) == current.get(key) for key in ('missing', 'folder', 'sha256'))
+
+
+# Cheap fingerprint of the given paths (mtime and size), to poll them for changes
+def stat_signature(paths):
+    signature = []
+    for path in paths:
+        try:
+            signature.append((path,) + archives.path_stat(path))
+        except OSError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+class BuildManifest:
+    """The manifest of a report, as left by the previous run (empty if there was none, or it is
+    from another manifest version), and the state of its inputs in this run, computed once."""
+
+    def __init__(self, path, io_threads=1):
+        self.path = path
+        self.io_threads = io_threads
+        self.data = {}
+        self.states = {}
+        try:
+            with open(path, 'r') as file:
+                data = json.load(file)
+            if data.get('manifest_version') == MANIFEST_VERSION:
+                self.data = data
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable build manifest {path}: {str(e)}")
+
+    @property
+    def inputs(self):
+        return self.data.get('inputs', {})
+
+    @property
+    def warnings(self):
+        return self.data.get('warnings', [])
+
+    def state(self, path):
+        if path not in self.states:
+            self.states[path] = file_state(path, self.inputs.get(path))
+        return self.states[path]
+
+    # State of the given files, io_threads at a time (each stat and read waits on the storage)
+    def compute_states(self, paths):
+        paths = [path for path in paths if path not in self.states]
+        concurrent = [path for path in paths if archives.thread_safe(path)]
+        if self.io_threads and self.io_threads > 1 and len(concurrent) > 1:
+            with ThreadPoolExecutor(max_workers=self.io_threads) as executor:
+                states = executor.map(lambda path: file_state(path, self.inputs.get(path)), concurrent)
+                self.states.update(zip(concurrent, states))
+        for path in paths:
+            self.state(path)
+
+    def changed_inputs(self):
+        self.compute_states(self.inputs)
+        return [path for path, previous in self.inputs.items() if not same_content(previous, self.state(path))]
+
+    # The report can be kept: built with the same options, from the same inputs, and its outputs
+    # (PDF, sidecar) left as they were written
+    def up_to_date(self, options):
+        if not self.data or self.data.get('options') != options:
+            return False
+        outputs = self.data.get('outputs', {})
+        if not outputs or not all(same_content(state, file_state(path, state)) for path, state in outputs.items()):
+            return False
+        changed = self.changed_inputs()
+        if changed:
+            logging.info(f"Rebuilding the report of {self.path}, changed: {', '.join(changed)}")
+            return False
+        # files touched without changing, record their new mtime so they are not hashed again
+        if any(self.states[path] != previous for path, previous in self.inputs.items()):
+            self.data['inputs'] = {path: self.states[path] for path in self.inputs}
+            self.save()
+        return True
+
+    # The file is an output of the previous run, left as it was written
+    def wrote(self, path):
+        path = os.path.abspath(path)
+        previous = self.data.get('outputs', {}).get(path)
+        return same_content(previous, file_state(path, previous))
+
+    # Parsed artifacts of the previous run for the files that did not change
+    def restore_records(self):
+        self.compute_states(self.inputs)
+        unchanged = {path for path, previous in self.inputs.items() if same_content(previous, self.state(path))}
+        records = {}
+        for kind, by_path in self.data.get('records', {}).items():
+            records[kind] = {path: record for path, record in by_path.items() if path in unchanged}
+        import_records(records)
+
+    def write(self, paths, outputs, options, warnings):
+        self.compute_states(paths)
+        inputs = {path: self.state(path) for path in paths}
+        file_stats = {path: (state['mtime_ns'], state['size']) for path, state in inputs.items() if 'mtime_ns' in state}
+        self.data = {
+            'manifest_version': MANIFEST_VERSION,
+            'options': options,
+            'outputs': {os.path.abspath(path): file_state(os.path.abspath(path)) for path in outputs},
+            'inputs': inputs,
+            'warnings': warnings,
+            'records': export_records(file_stats),
+        }
+        self.save()
+
+    def save(self):
+        # written aside and moved in place, a report interrupted while writing it is rebuilt next time
+        tmp_file = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w') as file:
+            json.dump(self.data, file, indent=1)
+        os.replace(tmp_file, self.path)
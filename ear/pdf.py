@@ -0,0 +1,639 @@
+# ERGA EARs Report Module
+# pdf.py
+# ERGA Sequencing and Assembly Committee
+#
+# The last stages of an EAR: build_flowables turns what ear/report.py gathered into reportlab
+# flowables, write_pdf lays them out in the PDF file.
+
+import io
+import logging
+import math
+import os
+
+from reportlab.graphics.charts.axes import LogYValueAxis
+from reportlab.graphics.charts.legends import Legend
+from reportlab.graphics.charts.lineplots import LinePlot
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import cm
+from reportlab.pdfbase.pdfdoc import PDFArray, PDFDictionary, PDFName, PDFStream, PDFString, PDFZCompress
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image, PageBreak
+
+from ear.artifacts import read_binary
+from ear.images import ImageOptimiser
+from ear.report import pipeline_steps, report_datetime
+from ear.timings import count_read
+
+
+# FUNCTIONS #######################################################################################
+
+# Parse pipeline and generate "tree"
+def generate_pipeline_tree(pipeline_data):
+    tree_lines = []
+    indent = "&nbsp;" * 2  # Adjust indent spacing
+
+    if isinstance(pipeline_data, dict):
+        for tool, version, params in pipeline_steps(pipeline_data):
+            # Tool line
+            tool_line = f"- <b>{tool}</b>"
+            tree_lines.append(tool_line)
+
+            # Version line
+            version_line = f"{indent*2}|_ <i>ver:</i> {version}"
+            tree_lines.append(version_line)
+
+            # Param line(s)
+            if params:
+                for param in params:
+                    param_line = f"{indent*2}|_ <i>key param:</i> {param}"
+                    tree_lines.append(param_line)
+            else:
+                param_line = f"{indent*2}|_ <i>key param:</i> NA"
+                tree_lines.append(param_line)
+    else:
+        tree_lines.append("Invalid pipeline data format")
+
+    # Join lines with HTML break for paragraph
+    tree_diagram = "<br/>".join(tree_lines)
+    return tree_diagram
+
+
+# Function to format BUSCO information
+def format_busco_info(info):
+    version, (lineage, genomes, buscos), mode, predictor = info
+    return f"BUSCO: {version} ({mode}, {predictor}) / Lineage: {lineage} (genomes:{genomes}, BUSCOs:{buscos})"
+
+
+# Metric columns of the quality metrics table that fit across the page, next to the metric names
+MAX_TABLE_COLUMNS = 4
+
+
+# Split a table too wide for the page in chunks of columns of similar width, each with the first
+# column (the metric names)
+def column_chunks(table_data, max_columns=MAX_TABLE_COLUMNS):
+    data_columns = len(table_data[0]) - 1
+    chunk_size = math.ceil(data_columns / math.ceil(data_columns / max_columns)) if data_columns else 1
+    return [[[row[0]] + row[1 + start:1 + start + chunk_size] for row in table_data] for start in range(0, max(data_columns, 1), chunk_size)]
+
+
+# Image drawn at the given size (cm), downsampled to it first. reportlab reads the downsampled
+# file here, the original image from memory (where the report inputs were prefetched)
+def embed_image(image_optimiser, png_file, width, height):
+    image_file = image_optimiser.prepare(png_file, width, height)
+    if image_file == png_file:
+        return Image(io.BytesIO(read_binary(png_file)), width=width * cm, height=height * cm)
+    count_read(image_file)
+    return Image(image_file, width=width * cm, height=height * cm)
+
+
+# Colours of the assembly stages in the Nx plots, in the order of the YAML
+NX_STAGE_COLOURS = ['#1f77b4', '#d62728', '#2ca02c', '#9467bd', '#8c564b']
+
+
+# A sequence length in bp, kbp, Mbp or Gbp, with the given decimals (all significant ones if None)
+def format_length(value, decimals=2):
+    for unit, scale in (('Gbp', 1e9), ('Mbp', 1e6), ('kbp', 1e3), ('bp', 1)):
+        if value >= scale or unit == 'bp':
+            return f"{value / scale:g} {unit}" if decimals is None else f"{value / scale:.{decimals}f} {unit}"
+
+
+# Nx plot of a haplotype, the scaffolds (solid) and contigs (dashed) of each assembly stage (in the
+# colour of the stage, by its position in stages), on a log scale, with their auN in the legend
+def nx_plot(haplotype, stage_curves, stages, width=17, height=10):
+    drawing = Drawing(width * cm, height * cm)
+    plot = LinePlot()
+    plot.x, plot.y = 2.2 * cm, 1.4 * cm
+    plot.width, plot.height = (width - 2.7) * cm, (height - 4.2) * cm
+    plot.yValueAxis = LogYValueAxis()
+    plot.xValueAxis.valueMin, plot.xValueAxis.valueMax, plot.xValueAxis.valueStep = 0, 100, 10
+    plot.xValueAxis.labels.fontName = plot.yValueAxis.labels.fontName = 'Courier'
+    plot.yValueAxis.labelTextFormat = lambda value: format_length(value, None)
+
+    data, legend = [], []
+    for asm_stage, curves in stage_curves:
+        colour = colors.HexColor(NX_STAGE_COLOURS[stages.index(asm_stage) % len(NX_STAGE_COLOURS)])
+        for sequences in ('Scaffolds', 'Contigs'):
+            curve = curves.get(sequences)
+            if curve is None:
+                continue
+            plot.lines[len(data)].strokeColor = colour
+            plot.lines[len(data)].strokeWidth = 1.5
+            if sequences == 'Contigs':
+                plot.lines[len(data)].strokeDashArray = (4, 2)
+            data.append([(x, max(curve.n(x), 1)) for x in range(1, len(curve.nx) + 1)])
+            legend.append((colour, f"{asm_stage} {sequences.lower()} ({curve.count:,}, auN {format_length(curve.aun)})"))
+    plot.data = data
+    drawing.add(plot)
+
+    drawing.add(String(0, height * cm - 0.4 * cm, f"{haplotype}", fontName='Courier-Bold', fontSize=11))
+    drawing.add(String(plot.x + plot.width / 2, 0.4 * cm, "x (%)", fontName='Courier', fontSize=9, textAnchor='middle'))
+
+    labels = Legend()
+    labels.x, labels.y = plot.x, height * cm - 1 * cm
+    labels.alignment = 'right'
+    labels.fontName, labels.fontSize = 'Courier', 8
+    labels.columnMaximum = 2
+    labels.colorNamePairs = legend
+    drawing.add(labels)
+    return drawing
+
+
+# STAGE 5: BUILD FLOWABLES ########################################################################
+
+def build_flowables(config, taxonomy, artifacts, checks, image_optimiser=None, version='', created=None):
+    # Images are downsampled to the size they are drawn at
+    if image_optimiser is None:
+        image_optimiser = ImageOptimiser()
+
+    inputs = config['inputs']
+    asm_data = config['asm_data']
+    elements = []
+
+    # Set all the styles
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(name='TitleStyle', fontName='Courier', fontSize=20))
+    styles.add(ParagraphStyle(name='subTitleStyle', fontName='Courier', fontSize=16))
+    styles.add(ParagraphStyle(name='normalStyle', fontName='Courier', fontSize=12))
+    styles.add(ParagraphStyle(name='midiStyle', fontName='Courier', fontSize=10))
+    #styles.add(ParagraphStyle(name='LinkStyle', fontName='Courier', fontSize=10, textColor='blue', underline=True))
+    styles.add(ParagraphStyle(name='treeStyle', fontName='Courier', fontSize=10, leftIndent=12))
+    styles.add(ParagraphStyle(name='miniStyle', fontName='Courier', fontSize=8))
+    styles.add(ParagraphStyle(name='FileNameStyle', fontName='Courier', fontSize=6))
+
+
+    # PDF SECTION 1 -------------------------------------------------------------------------------
+
+    # Add the title
+    title = Paragraph("ERGA Assembly Report", styles['TitleStyle'])
+    elements.append(title)
+
+    # Spacer
+    elements.append(Spacer(1, 12))
+
+    # Add version
+    ver_paragraph = Paragraph(version, styles['normalStyle'])
+    elements.append(ver_paragraph)
+
+    # Spacer
+    elements.append(Spacer(1, 12))
+
+    # Add tags
+    tags_paragraph = Paragraph(f"Tags: {config['tags']}", styles['normalStyle'])
+    elements.append(tags_paragraph)
+
+    # Spacer
+    elements.append(Spacer(1, 24))
+
+    sp_data = [
+        ["TxID", "ToLID", "Species", "Class", "Order"],
+        [taxonomy['taxon_id'], config['tol_id'], config['species'], taxonomy['class'], taxonomy['order']]
+    ]
+
+    # Transpose the data
+    transposed_sp_data = list(map(list, zip(*sp_data)))
+
+    # Create the SPECIES DATA table with the transposed data
+    sp_data_table = Table(transposed_sp_data)
+
+    # Style the table
+    sp_data_table.setStyle(TableStyle([
+        ("BACKGROUND", (0, 0), (0, -1), '#e7e7e7'),  # Grey background for column 1
+        ("BACKGROUND", (1, 0), (1, -1), colors.white),  # White background for column 2
+        ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+        ('FONTNAME', (0, 0), (0, 0), 'Courier'),  # Regular font for row1, col1
+        ('FONTNAME', (1, 0), (1, 0), 'Courier'),
+        ('FONTNAME', (0, 1), (-1, -1), 'Courier'),  # Regular font for the rest of the table
+        ('FONTNAME', (1, 1), (1, 1), 'Courier-Bold'),  # Bold font for row1, col2
+        ("FONTSIZE", (0, 0), (-1, -1), 14),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.black)
+    ]))
+
+    # Add SPECIES DATA table
+    elements.append(sp_data_table)
+
+    # Spacer
+    elements.append(Spacer(1, 32))
+
+    # Create table data
+    genome_traits_table_data = [
+        ["Genome Traits", "Expected", "Observed"],
+        ["Haploid size (bp)", artifacts['genome_haploid_length'], f"{artifacts['max_total_bp']}"],
+        ["Haploid Number", f"{taxonomy['haploid_number']} (source: {taxonomy['haploid_source']})", config['obs_haploid_num']],
+        ["Ploidy", f"{taxonomy['ploidy']} (source: {taxonomy['ploidy_source']})", artifacts['proposed_ploidy']],
+        ["Sample Sex", config['sex'], config['obs_sex']]
+    ]
+
+    # Create the GENOME TRAITS table
+    genome_traits_table = Table(genome_traits_table_data)
+
+    # Style the table
+    genome_traits_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), '#e7e7e7'),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, -1), 'Courier'),
+        ('FONTSIZE', (0, 0), (-1, -1), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.black)
+    ]))
+
+    # Add GENOME TRAITS table
+    elements.append(genome_traits_table)
+
+    # Spacer
+    elements.append(Spacer(1, 28))
+
+    # Add EBP METRICS SECTION subtitle
+    subtitle = Paragraph("EBP metrics summary and curation notes", styles['subTitleStyle'])
+    elements.append(subtitle)
+
+    # Spacer
+    elements.append(Spacer(1, 24))
+
+    # Add the EBP quality metric paragraphs to elements
+    elements += [Paragraph(ebp_quality_metric, styles["midiStyle"]) for ebp_quality_metric in artifacts['ebp_metrics']]
+
+    # Spacer
+    elements.append(Spacer(1, 8))
+
+    # Add sentence
+    Textline = Paragraph("The following metrics were automatically flagged as below EBP recommended standards or different from expected:", styles['midiStyle'])
+    elements.append(Textline)
+
+    # Spacer
+    elements.append(Spacer(1, 4))
+
+    # Add warning paragraphs to elements
+    elements += [Paragraph(message, styles["midiStyle"]) for message in checks['traits']]
+
+    # Spacer
+    elements.append(Spacer(1, 4))
+
+    elements += [Paragraph(message, styles["midiStyle"]) for message in checks['curated']]
+
+    # Spacer
+    elements.append(Spacer(1, 24))
+
+    # Add small subtitle for Curator notes
+    subtitle = Paragraph("Curator notes", styles['normalStyle'])
+    elements.append(subtitle)
+
+    # Spacer
+    elements.append(Spacer(1, 8))
+
+    # Get curator notes
+    curator_notes_text = (
+        f". Interventions/Gb: {config['interventions_per_gb']}<br/>"
+        f". Contamination notes: &quot;{config['contamination_notes']}&quot;<br/>"
+        f". Other observations: &quot;{config['other_notes']}&quot;"
+    )
+
+    # Curator notes
+    curator_notes_paragraph = Paragraph(curator_notes_text, styles["midiStyle"])
+    elements.append(curator_notes_paragraph)
+
+    # Page break
+    elements.append(PageBreak())
+
+
+    # PDF SECTION 2 -------------------------------------------------------------------------------
+
+    # Add quality metrics section subtitle
+    subtitle = Paragraph("Quality metrics table", styles['TitleStyle'])
+    elements.append(subtitle)
+
+    # Spacer
+    elements.append(Spacer(1, 48))
+
+    # create QUALITY METRICS table, one per page with up to MAX_TABLE_COLUMNS assemblies when they do not fit in one
+    for chunk_number, asm_table_chunk in enumerate(column_chunks(artifacts['asm_table_data'])):
+        if chunk_number > 0:
+            elements.append(PageBreak())
+        asm_table = Table(asm_table_chunk)
+
+        # Style the table
+        asm_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), '#e7e7e7'),  # grey background for the header
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),       # center alignment
+            ('FONTNAME', (0, 0), (-1, -1), 'Courier'),  # bold font for the header
+            ('FONTSIZE', (0, 0), (-1, -1), 11),           # font size
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ("GRID", (0, 0), (-1, -1), 0.5, colors.black)
+        ]))
+
+        # Add QUALITY METRICS table
+        elements.append(asm_table)
+
+    # Spacer
+    elements.append(Spacer(1, 5))
+
+    # Checking if all elements in the list are identical
+    busco_info_list = artifacts['busco_info_list']
+    if busco_info_list and all(info == busco_info_list[0] for info in busco_info_list):
+        busco_text = format_busco_info(busco_info_list[0])
+        elements.append(Paragraph(busco_text, styles['miniStyle']))
+    else:
+        elements.append(Paragraph("Warning! BUSCO versions or lineage datasets are not the same across results:", styles['miniStyle']))
+        logging.warning("WARNING: BUSCO versions or lineage datasets are not the same across results")
+        for info in busco_info_list:
+            busco_text = format_busco_info(info)
+            elements.append(Paragraph(busco_text, styles['miniStyle']))
+
+    # Page break
+    elements.append(PageBreak())
+
+    # Nx plots, Pre-curation vs Curated, of the haplotypes with sequence lengths, two per page
+    nx_curves = artifacts.get('nx_curves', {})
+    nx_haplotypes = [haplotype for haplotype in config['asm_stages'] if any((asm_stage, haplotype) in nx_curves for asm_stage in asm_data)]
+    if nx_haplotypes:
+        subtitle = Paragraph("Contiguity (Nx) of the assemblies", styles['TitleStyle'])
+        elements.append(subtitle)
+
+        # Spacer
+        elements.append(Spacer(1, 36))
+
+        for number, haplotype in enumerate(nx_haplotypes):
+            if number and number % 2 == 0:
+                elements.append(PageBreak())
+            stage_curves = [(asm_stage, nx_curves[(asm_stage, haplotype)]) for asm_stage in asm_data if (asm_stage, haplotype) in nx_curves]
+            elements.append(nx_plot(haplotype, stage_curves, list(asm_data)))
+            elements.append(Spacer(1, 24))
+
+        elements.append(Paragraph("Nx: length of the shortest sequence among the longest ones covering x% of the assembly. "
+                                  "Legend: number of sequences and auN (area under the Nx curve). Contigs dashed.", styles['miniStyle']))
+
+        # Page break
+        elements.append(PageBreak())
+
+
+    # PDF SECTION 3 -------------------------------------------------------------------------------
+
+    # Add hic maps section subtitle
+    subtitle = Paragraph("HiC contact map of curated assembly", styles['TitleStyle'])
+    elements.append(subtitle)
+
+    # Spacer
+    elements.append(Spacer(1, 36))
+
+    # Add the map and link of each curated haplotype, two haplotypes per page
+    curated_haplotypes = list(asm_data.get('Curated', {}).items())
+    for first in range(0, len(curated_haplotypes), 2):
+        images_with_names = []
+
+        for haplotype, haplotype_properties in curated_haplotypes[first:first + 2]:
+            # Append a spacer between the two haplotypes
+            if images_with_names:
+                images_with_names.append([Spacer(1, 12)])
+
+            # Check if there is an image and/or a link
+            png_file = haplotype_properties.get('hic_FullMap_png', '')
+            link = haplotype_properties.get('hic_FullMap_link', '')
+
+            # Prepare paragraphs for the image and link
+            if png_file:
+                # Create image object
+                img = embed_image(image_optimiser, png_file, 11, 11)
+                images_with_names.append([img])
+            else:
+                # Add paragraph for missing image
+                missing_png_paragraph = Paragraph(f"<b>{haplotype}</b> HiC PNG is missing!", styles["midiStyle"])
+                images_with_names.append([missing_png_paragraph])
+
+            # Add paragraph for the link
+            if link:
+                link_html = f'<b>{haplotype}</b> <link href="{link}" color="blue">{inputs.link_label}</link>'
+            else:
+                link_html = f'<b>{haplotype}</b> File link is missing!'
+
+            link_paragraph = Paragraph(link_html, styles["midiStyle"])
+            images_with_names.append([link_paragraph])
+
+        # Create table for the images and names
+        table = Table(images_with_names)
+        table.hAlign = 'CENTER'
+        elements.append(table)
+
+        # The next two haplotypes on a new page
+        if first + 2 < len(curated_haplotypes):
+            elements.append(PageBreak())
+
+    elements.append(PageBreak())
+
+
+    # PDF SECTION 4 -------------------------------------------------------------------------------
+
+    # Add kmer spectra section subtitle
+    subtitle = Paragraph("K-mer spectra of curated assembly", styles['TitleStyle'])
+    elements.append(subtitle)
+
+    # Spacer
+    elements.append(Spacer(1, 48))
+
+    # Initialize counter
+    counter = 0
+
+    # Add the k-mer plots, a group (per merqury run) at a time
+    for group in artifacts['kmer_plots']:
+        # Create image objects with their caption below
+        images = [[embed_image(image_optimiser, png_file, 8.4, 7), Paragraph(text, styles["midiStyle"])] for png_file, text in group['images']]
+
+        if images:
+            # get number of rows and columns for the table
+            num_rows = (len(images) + 1) // 2  # +1 to handle odd numbers of images
+            num_columns = 2
+
+            # Create the table with dynamic size
+            image_table_data = [[images[i * num_columns + j] if i * num_columns + j < len(images) else [] for j in range(num_columns)] for i in range(num_rows)]
+            image_table = Table(image_table_data)
+
+            # Style the "table"
+            table_style = TableStyle([
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+                ('BOTTOMPADDING', (0, 0), (-1, -1), 20),  #20 here is a spacer between rows
+            ])
+
+            # Set the style
+            image_table.setStyle(table_style)
+
+            # Add image table to elements
+            elements.append(image_table)
+        else:
+            elements.append(Paragraph("No K-mer spectra images available.", styles["midiStyle"]))
+
+        # Increase counter by the number of PNGs added
+        counter += group['slots']
+
+        # If counter is a multiple of 4, insert a page break and reset counter
+        if counter % 4 == 0:
+            elements.append(PageBreak())
+            counter = 0
+
+        # Add spacer
+        elements.append(Spacer(1, 12))
+
+    # If we have processed all haps and the last page does not contain exactly 4 images, insert a page break
+    if counter % 4 != 0:
+        elements.append(PageBreak())
+
+
+    # PDF SECTION 5 -------------------------------------------------------------------------------
+
+    # Add contamination section subtitle
+    subtitle = Paragraph("Post-curation contamination screening", styles['TitleStyle'])
+    elements.append(subtitle)
+
+    # Spacer
+    elements.append(Spacer(1, 36))
+
+    # Initialize counter
+    tool_count = 0
+
+    # Add title and images for each step
+    for asm_stages, stage_properties in asm_data.items():
+        if asm_stages == 'Curated':  # Check if the current stage is 'Curated'
+            tool_elements = list(stage_properties.keys())
+
+            for haplotype in tool_elements:
+                haplotype_properties = stage_properties[haplotype]
+                if isinstance(haplotype_properties, dict) and 'blobplot_cont_png' in haplotype_properties:
+                    # Get image path
+                    png_file = haplotype_properties['blobplot_cont_png']
+
+                    # If png_file is not empty, display it
+                    if png_file:
+                        # Create image object
+                        img = embed_image(image_optimiser, png_file, 20, 20)
+                        elements.append(img)
+
+                        # Create paragraph for filename with haplotype name
+                        blob_text = f"<b>{haplotype}.</b> Bubble plot circles are scaled by sequence length, positioned by coverage and GC proportion, and coloured by taxonomy. Histograms show total assembly length distribution on each axis."
+                        blob_paragraph = Paragraph(blob_text, styles["midiStyle"])
+                        elements.append(blob_paragraph)
+                    else:
+                        # Add paragraph for missing image
+                        missing_png_paragraph = Paragraph(f"<b>{haplotype}</b> PNG is missing!", styles["midiStyle"])
+                        elements.append(missing_png_paragraph)
+
+                    # Add a page break after each image and its description
+                    elements.append(PageBreak())
+
+            tool_count += 1
+
+
+    # SECTION 6 -----------------------------------------------------------------------------------
+
+    # Add data profile section subtitle
+    subtitle = Paragraph("Data profile", styles['TitleStyle'])
+    elements.append(subtitle)
+
+    # Spacer
+    elements.append(Spacer(1, 24))
+
+    # Prepare headers
+    headers = ['Data']
+    data_values = ['Coverage']
+
+    # Extract data from YAML and format it for the table
+    for item in config['data']:
+        for technology, coverage in item.items():
+            headers.append(technology)
+            data_values.append('NA' if not coverage else coverage)
+
+    # Create the DATA PROFILE table
+    data_table = Table([headers, data_values])
+
+    # Style the table
+    data_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), '#e7e7e7'),  # grey background for the first column
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),         # center alignment
+        ('FONTNAME', (0, 0), (-1, -1), 'Courier'),      # remove bold font
+        ('FONTSIZE', (0, 0), (-1, -1), 12),             # font size for the header
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.black)
+    ]))
+
+    # Add DATA PROFILE table
+    elements.append(data_table)
+
+    # Spacer
+    elements.append(Spacer(1, 32))
+
+    # Add assembly pipeline section subtitle
+    subtitle = Paragraph("Assembly pipeline", styles['TitleStyle'])
+    elements.append(subtitle)
+
+    # Spacer
+    elements.append(Spacer(1, 24))
+
+    # Add ASM PIPELINE tree
+    elements.append(Paragraph(generate_pipeline_tree(config['asm_pipeline']), styles['treeStyle']))
+
+    # Spacer
+    elements.append(Spacer(1, 32))
+
+    # Add curation pipeline section subtitle
+    subtitle = Paragraph("Curation pipeline", styles['TitleStyle'])
+    elements.append(subtitle)
+
+    # Spacer
+    elements.append(Spacer(1, 24))
+
+    # Add CURATION PIPELINE tree
+    elements.append(Paragraph(generate_pipeline_tree(config['curation_pipeline']), styles['treeStyle']))
+
+    # Spacer
+    elements.append(Spacer(1, 48))
+
+    # Add submitter, affiliation
+    submitter_paragraph_style = ParagraphStyle(name='SubmitterStyle', fontName='Courier', fontSize=10)
+    elements.append(Paragraph(f"Submitter: {config['submitter']}", submitter_paragraph_style))
+    elements.append(Paragraph(f"Affiliation: {config['affiliation']}", submitter_paragraph_style))
+
+    # Spacer
+    elements.append(Spacer(1, 8))
+
+    # Add the date and time (CET) of the document creation
+    elements.append(Paragraph(f"Date and time: {created or report_datetime()}", submitter_paragraph_style))
+
+    return elements
+
+
+# STAGE 6: WRITE PDF ##############################################################################
+
+# Attach files to the PDF ({name: (content, description)}), in the EmbeddedFiles of the document
+# catalog, which PDF viewers show as attachments
+def attach_files(canvas, attachments):
+    names = []
+    for name, (content, description) in sorted(attachments.items()):
+        stream = PDFStream(PDFDictionary({'Type': PDFName('EmbeddedFile')}), content, filters=[PDFZCompress])
+        filespec = PDFDictionary({
+            'Type': PDFName('Filespec'),
+            'F': PDFString(name),
+            'UF': PDFString(name),
+            'Desc': PDFString(description),
+            'EF': PDFDictionary({'F': canvas._doc.Reference(stream)}),
+        })
+        names += [PDFString(name), canvas._doc.Reference(filespec)]
+    canvas.setCatalogEntry('Names', PDFDictionary({'EmbeddedFiles': PDFDictionary({'Names': PDFArray(names)})}))
+
+
+def write_pdf(elements, pdf_filename, attachments=None):
+    # Set up the PDF file
+    margin = 0.5 * 72  # 0.5 inch in points (normal margin is 1 inch)
+    pdf = SimpleDocTemplate(pdf_filename,
+                            pagesize=A4,
+                            leftMargin=margin,
+                            rightMargin=margin,
+                            topMargin=margin,
+                            bottomMargin=margin)
+
+    # attached while drawing the first page, the catalog is written at the end
+    def first_page(canvas, document):
+        if attachments:
+            attach_files(canvas, attachments)
+
+    # Build the PDF
+    pdf.build(elements, onFirstPage=first_page)
+    return pdf_filename
@@ -0,0 +1,583 @@
+# ERGA EARs Report Module
+# report.py
+# ERGA Sequencing and Assembly Committee
+#
+# The stages of an EAR, each callable on its own:
+#   load_config -> fetch_taxonomy -> parse_artifacts -> evaluate_checks
+# followed by build_flowables -> write_pdf in ear/pdf.py. make_EAR.py runs fetch_taxonomy in the
+# background while the artifacts are parsed. Nothing here imports reportlab.
+
+import functools
+import logging
+import math
+import os
+import posixpath
+import re
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime
+
+import pytz
+import yaml
+
+from ear.adapters import FolderInputs
+from ear.archives import is_member, member_path, split_member, thread_safe
+from ear.artifacts import (load_busco, load_fasta_index, load_gfastats, load_merqury, load_merqury_table, load_seq_report,
+                           open_artifact, read_artifact, read_binary)
+from ear.manifest import PATH_KEY_SUFFIXES
+from ear.rules import check_reports
+from ear.taxonomy import GoatTaxonomy, default_taxonomy_cache
+from ear.timings import count_read, counted_apart, io_counters
+
+
+# FUNCTIONS #######################################################################################
+
+def format_number(value):
+    try:
+        value_float = float(value)
+        if value_float.is_integer():
+            # format as an integer if no decimal part
+            return f'{int(value_float):,}'
+        else:
+            # format as a float
+            return f'{value_float:,}'
+    except ValueError:
+        # return the original value if it can't be converted to a float
+        return value
+
+
+# gfastats values shown in the quality metrics table
+keys = [
+    "Total scaffold length",
+    "GC content %",
+    "# gaps in scaffolds",
+    "Total gap length in scaffolds",
+    "# scaffolds",
+    "Scaffold N50",
+    "Scaffold L50",
+    "Scaffold L90",
+    "# contigs",
+    "Contig N50",
+    "Contig L50",
+    "Contig L90",
+]
+
+display_names = keys.copy()
+display_names[display_names.index("Total scaffold length")] = "Total bp"
+total_length_index = keys.index("Total scaffold length")
+display_names[display_names.index("GC content %")] = "GC %"
+display_names[display_names.index("Total gap length in scaffolds")] = "Total gap bp"
+display_names[display_names.index("# scaffolds")] = "Scaffolds"
+display_names[display_names.index("# contigs")] = "Contigs"
+
+gaps_index = keys.index("# gaps in scaffolds")
+exclusion_list = ["# gaps in scaffolds"]
+
+
+# Tools of a pipeline, with the version and key parameters given as "version/param1/param2"
+def pipeline_steps(pipeline_data):
+    steps = []
+    for tool, version_param in pipeline_data.items():
+        parts = str(version_param).split('/')
+        params = [p for p in parts[1:] if p]  # This will remove empty strings
+        steps.append((tool, parts[0], params))
+    return steps
+
+
+# Date and time (CET) of the report creation
+def report_datetime():
+    return datetime.now(pytz.timezone("CET")).strftime("%Y-%m-%d %H:%M:%S %Z")
+
+
+# compute EBP quality code
+def compute_ebp_code(gfastats_path, qv_value):
+    report = load_gfastats(gfastats_path)
+    contig_n50_log = math.floor(math.log10(report.int("Contig N50")))
+    scaffold_n50_log = math.floor(math.log10(report.int("Scaffold N50")))
+
+    return f"{contig_n50_log}.{scaffold_n50_log}.Q{math.floor(float(qv_value))}"
+
+
+# BUSCO summary of a run (see ear/artifacts.py), None if it cannot be read
+def read_busco(file_path):
+    try:
+        return load_busco(file_path)
+    except Exception as e:
+        logging.warning(f"Error reading {file_path}: {str(e)}")
+        return None
+
+
+# The gfastats report of an assembly, or its FASTA file when it has none (its metrics are then
+# computed by ear/artifacts.py), None if it has neither
+def gfastats_path(properties):
+    return properties.get('gfastats--nstar-report_txt') or properties.get('assembly_fasta')
+
+
+# Nx curves (see ear/artifacts.py) of the scaffolds of an assembly, from its FASTA index or its
+# gfastats --seq-report, and of its contigs, from the FASTA index of the contigs, or else both from
+# its FASTA file. Those that cannot be read are left out
+def read_nx_curves(properties):
+    sources = [
+        ('Scaffolds', 'fasta_fai', load_fasta_index),
+        ('Scaffolds', 'gfastats--seq-report_txt', load_seq_report),
+        ('Contigs', 'contigs_fai', load_fasta_index),
+        ('Scaffolds', 'assembly_fasta', lambda file_path: load_gfastats(file_path).curves['Scaffolds']),
+        ('Contigs', 'assembly_fasta', lambda file_path: load_gfastats(file_path).curves['Contigs']),
+    ]
+    curves = {}
+    for sequences, key, loader in sources:
+        if sequences not in curves and properties.get(key):
+            try:
+                curves[sequences] = loader(properties[key])
+            except Exception as e:
+                logging.warning(f"Error reading {properties[key]}: {str(e)}")
+    return curves
+
+
+# STAGE 1: LOAD CONFIG ############################################################################
+
+# Relative artifact paths of a YAML read from a results bundle, or naming one as ARCHIVE, are
+# members of that bundle (relative to the folder of the YAML in it), see ear/archives.py
+def resolve_bundle_paths(yaml_file, yaml_data):
+    archive, member = split_member(yaml_file)
+    folder = posixpath.dirname(member) if archive else ''
+    if yaml_data.get('ARCHIVE'):
+        archive, folder = yaml_data['ARCHIVE'], ''
+    if archive is None:
+        return
+
+    def walk(data):
+        if isinstance(data, dict):
+            for key, value in data.items():
+                if isinstance(value, str) and str(key).endswith(PATH_KEY_SUFFIXES):
+                    if value and not os.path.isabs(value) and not is_member(value):
+                        data[key] = member_path(archive, posixpath.join(folder, value))
+                else:
+                    walk(value)
+        elif isinstance(data, list):
+            for item in data:
+                walk(item)
+
+    walk(yaml_data)
+
+
+# Read the EAR.yaml file, check the mandatory fields and gather what the other stages need.
+# The input adapter (ear/adapters.py) tells how the merqury results are given
+def load_config(yaml_file, inputs=None):
+    # Read the content from EAR.yaml file
+    with open_artifact(yaml_file) as file:
+        yaml_data = yaml.safe_load(file)
+    count_read(yaml_file)
+    if isinstance(yaml_data, dict):
+        resolve_bundle_paths(yaml_file, yaml_data)
+
+    # Reading SAMPLE INFORMATION section from yaml
+
+    # Check for required fields
+    required_fields = ["ToLID", "Species", "Sex", "Submitter", "Affiliation", "Tags"]
+    missing_fields = [field for field in required_fields if field not in yaml_data or not yaml_data[field]]
+
+    if missing_fields:
+        logging.error(f"# GENERAL INFORMATION section in the yaml file is missing or empty for the following information: {', '.join(missing_fields)}")
+        sys.exit(1)
+
+    # Check that "Species" field is a string
+    if not isinstance(yaml_data["Species"], str):
+        logging.error(f"# GENERAL INFORMATION section in the yaml file contains incorrect data type for 'Species'. Expected 'str' but got '{type(yaml_data['Species']).__name__}'.")
+        sys.exit(1)
+
+    # Check if tag is valid
+    tags = yaml_data["Tags"]
+    valid_tags = ["ERGA-BGE", "ERGA-Pilot", "ERGA-Community", "ERGA-testing"]
+    if tags not in valid_tags:
+        tags += "[INVALID TAG]"
+        logging.warning(f"# SAMPLE INFORMATION section in the yaml file contains an invalid tag. Valid tags are ERGA-BGE, ERGA-Pilot and ERGA-Community.")
+
+    # Reading GENOME PROFILING DATA section from yaml
+    profiling_data = yaml_data.get('PROFILING')
+
+    # Check if profiling_data is available
+    if not profiling_data:
+        logging.error('Error: No profiling data found in the YAML file.')
+        sys.exit(1)
+
+    # Check for GenomeScope data (mandatory)
+    genomescope_data = profiling_data.get('GenomeScope')
+    if not genomescope_data:
+        logging.error("Error: GenomeScope data is missing in the YAML file. This is mandatory.")
+        sys.exit(1)
+
+    genomescope_summary = genomescope_data.get('genomescope_summary_txt')
+    if not genomescope_summary:
+        logging.error("Error: GenomeScope summary file path is missing in the YAML file.")
+        sys.exit(1)
+
+    # Reading ASSEMBLY DATA section from yaml
+    asm_data = yaml_data.get('ASSEMBLIES', {})
+
+    # make a list from the assemblies available in asm_data
+    asm_stages = []
+    for asm_stage, stage_properties in asm_data.items():
+        for haplotypes in stage_properties.keys():
+            if haplotypes not in asm_stages:
+                asm_stages.append(haplotypes)
+
+    # Reading CURATION NOTES section from yaml
+    notes = yaml_data.get("NOTES", {})
+
+    return {
+        'yaml_file': yaml_file,
+        'inputs': inputs or FolderInputs(),
+        'yaml_data': yaml_data,
+        'tol_id': yaml_data["ToLID"],
+        'species': yaml_data["Species"],
+        'sex': yaml_data["Sex"],
+        'submitter': yaml_data["Submitter"],
+        'affiliation': yaml_data["Affiliation"],
+        'tags': tags,
+        'data': yaml_data.get('DATA', []),
+        'asm_pipeline': yaml_data.get('PIPELINES', {}).get('Assembly', {}),
+        'curation_pipeline': yaml_data.get('PIPELINES', {}).get('Curation', {}),
+        'genomescope_summary': genomescope_summary,
+        'smudgeplot_data': profiling_data.get('Smudgeplot'),
+        'asm_data': asm_data,
+        'asm_stages': asm_stages,
+        'obs_haploid_num': notes.get("Obs_Haploid_num", "NA"),
+        'obs_sex': notes.get("Obs_Sex", "NA"),
+        'interventions_per_gb': notes.get("Interventions_per_Gb", "NA"),
+        'contamination_notes': notes.get("Contamination_notes", "NA"),
+        'other_notes': notes.get("Other_notes", "NA"),
+    }
+
+
+# STAGE 2: FETCH TAXONOMY #########################################################################
+
+# Get data from GoaT (or the given provider) based on species name
+def fetch_taxonomy(config, taxonomy_provider=None):
+    if taxonomy_provider is None:
+        taxonomy_provider = GoatTaxonomy(default_taxonomy_cache())
+    return taxonomy_provider.resolve(config['species'])
+
+
+# fetch_taxonomy in a background thread, while the artifacts of the report are parsed: GoaT may
+# take seconds to answer, and nothing else needs the taxonomy before the checks. The future gives
+# the taxonomy, or raises what stopped the lookup, when the report needs it, and its io_counters
+# the I/O of the lookup, for the stage joining it.
+# The thread is a daemon: a report stopped before joining it leaves the future behind, and the
+# process exits without waiting for GoaT (and its retries). The taxonomy cache skips a line left
+# half written
+def fetch_taxonomy_background(config, taxonomy_provider=None):
+    counters = dict.fromkeys(io_counters, 0)
+    future = Future()
+    future.io_counters = counters
+
+    def lookup():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(counted_apart(counters, fetch_taxonomy, config, taxonomy_provider))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=lookup, name='taxonomy', daemon=True).start()
+    return future
+
+
+# STAGE 3: PARSE ARTIFACTS ########################################################################
+
+# Threads reading the inputs of a report at once. On network filesystems (NFS, Lustre) most of the
+# time reading them is spent waiting on each open and stat, which the threads overlap
+DEFAULT_IO_THREADS = 8
+
+# How each artifact of an assembly is read, by its key in the YAML
+PREFETCH_LOADERS = {
+    'gfastats--nstar-report_txt': load_gfastats,
+    'assembly_fasta': load_gfastats,
+    'busco_short_summary_txt': load_busco,
+    'merqury_qv': load_merqury_table,
+    'merqury_completeness_stats': load_merqury_table,
+    'fasta_fai': load_fasta_index,
+    'contigs_fai': load_fasta_index,
+    'gfastats--seq-report_txt': load_seq_report,
+}
+
+
+# Read a file into the artifact cache, with nothing more to read after it
+def prefetch_file(loader, file_path):
+    loader(file_path)
+    return []
+
+
+# List a merqury folder, then read the tables the report takes its values from (in listing order
+# up to the one with all the assemblies, as MerquryResults does, not the per-scaffold tables after
+# it) and, for the k-mer plots of the curated assembly, its plots
+def prefetch_merqury(images, folder):
+    results = load_merqury(folder)
+    results.qv(0)
+    results.completeness(0)
+    if images:
+        return [(functools.partial(prefetch_file, read_binary), file_path) for file_path in results.png_files[:4]]
+    return []
+
+
+# The files of the report, as (function reading one, path) tasks
+def prefetch_tasks(config, images):
+    tasks = [(functools.partial(prefetch_file, read_artifact), config['genomescope_summary'])]
+    smudgeplot_summary = (config['smudgeplot_data'] or {}).get('smudgeplot_verbose_summary_txt')
+    if smudgeplot_summary:
+        tasks.append((functools.partial(prefetch_file, read_artifact), smudgeplot_summary))
+    for asm_stage, stage_properties in config['asm_data'].items():
+        for haplotypes, haplotype_properties in stage_properties.items():
+            if not isinstance(haplotype_properties, dict):
+                continue
+            for key, file_path in haplotype_properties.items():
+                if not isinstance(file_path, str):
+                    continue
+                if key in PREFETCH_LOADERS:
+                    tasks.append((functools.partial(prefetch_file, PREFETCH_LOADERS[key]), file_path))
+                elif key == 'merqury_folder':
+                    tasks.append((functools.partial(prefetch_merqury, images and asm_stage == 'Curated'), file_path))
+                elif images and key.endswith('_png'):
+                    tasks.append((functools.partial(prefetch_file, read_binary), file_path))
+    return tasks
+
+
+# Read every file of the report into the artifact cache at once, on io_threads threads, so the
+# report stages that follow work from memory (the images too, unless images is False). A file
+# that cannot be read is left to the report stage reading it, which reports why as usual
+def prefetch_artifacts(config, io_threads=DEFAULT_IO_THREADS, images=True):
+    if not io_threads or io_threads < 2:
+        return
+    # each file once, whatever the number of assemblies referencing it
+    submitted = set()
+
+    def submit(executor, tasks):
+        futures = set()
+        for function, file_path in tasks:
+            key = (function.func, function.args, file_path)
+            if key not in submitted and thread_safe(file_path):
+                submitted.add(key)
+                futures.add(executor.submit(function, file_path))
+        return futures
+
+    with ThreadPoolExecutor(max_workers=io_threads) as executor:
+        pending = submit(executor, prefetch_tasks(config, images))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    pending |= submit(executor, future.result())
+                except Exception:
+                    continue
+
+
+def parse_artifacts(config):
+    inputs = config['inputs']
+    asm_data = config['asm_data']
+    asm_stages = config['asm_stages']
+
+    # Read the content of the GenomeScope summary file
+    try:
+        summary_txt = read_artifact(config['genomescope_summary'])
+        # Extract values from summary.txt
+        genome_haploid_length_match = re.search(r"Genome Haploid Length\s+([\d,]+|NA)\s*bp", summary_txt)
+        proposed_ploidy = re.search(r"p = (\d+)", summary_txt).group(1)
+        if genome_haploid_length_match:
+            genome_haploid_length = genome_haploid_length_match.group(1)
+            if genome_haploid_length == "NA":
+                logging.warning("Genome Haploid Length is NA. Using max value if available.")
+                max_length_match = re.search(r"Genome Haploid Length\s+(?:NA|[\d,]+)\s*bp\s+([\d,]+)\s*bp", summary_txt)
+                if max_length_match:
+                    genome_haploid_length = max_length_match.group(1)
+                else:
+                    logging.error("Unable to find a valid Genome Haploid Length.")
+                    sys.exit(1)
+        else:
+            logging.error("Unable to find Genome Haploid Length in the summary file.")
+            sys.exit(1)
+    except Exception as e:
+        logging.error(f"Error reading GenomeScope summary file: {str(e)}")
+        sys.exit(1)
+
+    # Check for Smudgeplot data (optional)
+    smudgeplot_data = config['smudgeplot_data']
+    if smudgeplot_data:
+        smudgeplot_summary = smudgeplot_data.get('smudgeplot_verbose_summary_txt')
+        if smudgeplot_summary:
+            try:
+                smud_summary_txt = read_artifact(smudgeplot_summary).splitlines(True)
+                for line in smud_summary_txt:
+                    if line.startswith("* Proposed ploidy"):
+                        proposed_ploidy = line.split(":")[1].strip()
+                        break
+            except Exception as e:
+                logging.warning(f"Error reading Smudgeplot summary file: {str(e)}. Using GenomeScope ploidy.")
+        else:
+            logging.warning("Smudgeplot summary file path is missing. Using GenomeScope ploidy.")
+    else:
+        logging.info("Smudgeplot data not provided. Using GenomeScope ploidy.")
+
+    # get gfastats-based data
+    gfastats_data = {}
+    for asm_stage, stage_properties in asm_data.items():
+        for haplotypes, haplotype_properties in stage_properties.items():
+            if isinstance(haplotype_properties, dict):
+                if gfastats_path(haplotype_properties):
+                    values = inputs.gfastats_values(gfastats_path(haplotype_properties), keys)
+                    if values is not None:
+                        gfastats_data[(asm_stage, haplotypes)] = values
+
+    gaps_per_gbp_data = {}
+    for (asm_stage, haplotypes), values in gfastats_data.items():
+        try:
+            gaps = float(values[gaps_index].replace(',', ''))
+            total_length = float(values[total_length_index].replace(',', ''))
+            gaps_per_gbp = round((gaps / total_length * 1_000_000_000), 2)
+            gaps_per_gbp_data[(asm_stage, haplotypes)] = gaps_per_gbp
+        except (ValueError, ZeroDivisionError):
+            logging.warning(f"Could not calculate gaps per Gbp for {asm_stage} {haplotypes}")
+            gaps_per_gbp_data[(asm_stage, haplotypes)] = inputs.missing
+
+    # Columns of the quality metrics table, (asm_stage, haplotype) in the order of the stages, once for all rows
+    columns = [(asm_stage, haplotypes) for asm_stage in asm_data for haplotypes in asm_stages if haplotypes in asm_data[asm_stage]]
+
+    # Define the contigging table (column names)
+    asm_table_data = [["Metrics"] + [f'{asm_stage} \n {haplotypes}' for asm_stage, haplotypes in columns]]
+
+    # Fill the table with the gfastats data
+    for i in range(len(display_names)):
+        metric = display_names[i]
+        if metric not in exclusion_list:
+            asm_table_data.append([metric] + [format_number(gfastats_data[column][i]) if column in gfastats_data else inputs.missing for column in columns])
+
+    # Add the gaps/gbp in between
+    asm_table_data.insert(gaps_index + 1, ['Gaps/Gbp'] + [format_number(gaps_per_gbp_data.get(column, inputs.missing)) for column in columns])
+
+    # get QV, Kmer completeness and BUSCO data
+    qv_data = {}
+    completeness_data = {}
+    busco_data = {metric: {} for metric in ['BUSCO sing.', 'BUSCO dupl.', 'BUSCO frag.', 'BUSCO miss.']}
+    for asm_stage, stage_properties in asm_data.items():
+        asm_stage_elements = list(stage_properties.keys())
+        for i, haplotypes in enumerate(asm_stage_elements):
+            haplotype_properties = stage_properties[haplotypes]
+            if isinstance(haplotype_properties, dict):
+                if inputs.has_qv(haplotype_properties):
+                    qv_data[(asm_stage, haplotypes)] = inputs.qv(haplotype_properties, i, asm_stage, haplotypes)
+                if inputs.has_completeness(haplotype_properties):
+                    completeness_data[(asm_stage, haplotypes)] = inputs.completeness(haplotype_properties, i, asm_stage, haplotypes)
+                if 'busco_short_summary_txt' in haplotype_properties:
+                    busco = read_busco(haplotype_properties['busco_short_summary_txt'])
+                    s_value, d_value, f_value, m_value = busco.scores() if busco else ('', '', '', '')
+                    busco_data['BUSCO sing.'].update({(asm_stage, haplotypes): s_value})
+                    busco_data['BUSCO dupl.'].update({(asm_stage, haplotypes): d_value})
+                    busco_data['BUSCO frag.'].update({(asm_stage, haplotypes): f_value})
+                    busco_data['BUSCO miss.'].update({(asm_stage, haplotypes): m_value})
+
+    # Fill the table with the QV data
+    asm_table_data.append(['QV'] + [qv_data.get(column, '') for column in columns])
+
+    # Fill the table with the Kmer completeness data
+    asm_table_data.append(['Kmer compl.'] + [completeness_data.get(column, '') for column in columns])
+
+    # Fill the table with the BUSCO data
+    for metric in ['BUSCO sing.', 'BUSCO dupl.', 'BUSCO frag.', 'BUSCO miss.']:
+        asm_table_data.append([metric] + [busco_data[metric].get(column, '') for column in columns])
+
+    # Extract Total bp for each haplotype and find the maximum
+    curated_assemblies = asm_data.get('Curated', {})
+    total_bp_values = []
+    for haplotype, properties in curated_assemblies.items():
+        if gfastats_path(properties):
+            total_bp = inputs.total_bp(gfastats_path(properties))
+            total_bp_values.append(total_bp)
+
+    max_total_bp = max(total_bp_values, default='NA')
+
+    # Iterate over haplotypes in the Curated category to get data for EBP metrics
+    haplotype_names = list(curated_assemblies.keys())
+    ebp_codes = {}
+    for order, haplotype in enumerate(haplotype_names):  # the order is the position of the haplotype in the list
+        properties = curated_assemblies[haplotype]
+        if gfastats_path(properties) and inputs.has_qv(properties):
+            qv_value = inputs.qv(properties, order, 'Curated', haplotype)
+            ebp_codes[haplotype] = compute_ebp_code(gfastats_path(properties), qv_value)
+    ebp_metrics = [f"Obtained EBP quality metric for {haplotype}: {code}" for haplotype, code in ebp_codes.items()]
+
+    # Store BUSCO information from each file in a list
+    busco_info_list = []
+    for asm_stage, stage_properties in asm_data.items():
+        for haplotypes, haplotype_properties in stage_properties.items():
+            if isinstance(haplotype_properties, dict):
+                if 'busco_short_summary_txt' in haplotype_properties:
+                    busco = read_busco(haplotype_properties['busco_short_summary_txt'])
+                    if busco and all(busco.info()):
+                        busco_info_list.append(busco.info())
+
+    # Kmer plots of the curated assembly
+    kmer_plots = inputs.kmer_plots(curated_assemblies)
+
+    # Nx curves of the assemblies that have sequence lengths (FASTA index or gfastats --seq-report)
+    nx_curves = {}
+    for asm_stage, stage_properties in asm_data.items():
+        for haplotypes, haplotype_properties in stage_properties.items():
+            if isinstance(haplotype_properties, dict):
+                curves = read_nx_curves(haplotype_properties)
+                if curves:
+                    nx_curves[(asm_stage, haplotypes)] = curves
+
+    return {
+        'genome_haploid_length': genome_haploid_length,
+        'proposed_ploidy': proposed_ploidy,
+        'gfastats_data': gfastats_data,
+        'gaps_per_gbp_data': gaps_per_gbp_data,
+        'qv_data': qv_data,
+        'completeness_data': completeness_data,
+        'busco_data': busco_data,
+        'asm_table_data': asm_table_data,
+        'max_total_bp': max_total_bp,
+        'ebp_codes': ebp_codes,
+        'ebp_metrics': ebp_metrics,
+        'busco_info_list': busco_info_list,
+        'kmer_plots': kmer_plots,
+        'nx_curves': nx_curves,
+    }
+
+
+# STAGE 4: EVALUATE CHECKS ########################################################################
+
+# Expected and observed genome traits, as the report shows them
+def genome_traits(config, taxonomy, artifacts):
+    return OrderedDict([
+        ("Expected", OrderedDict([
+            ("Haploid size (bp)", str(artifacts['genome_haploid_length'])),
+            ("Haploid Number", f"{taxonomy['haploid_number']} (source: {taxonomy['haploid_source']})"),
+            ("Ploidy", f"{taxonomy['ploidy']} (source: {taxonomy['ploidy_source']})"),
+            ("Sample Sex", str(config['sex'])),
+        ])),
+        ("Observed", OrderedDict([
+            ("Haploid size (bp)", str(artifacts['max_total_bp'])),
+            ("Haploid Number", str(config['obs_haploid_num'])),
+            ("Ploidy", str(artifacts['proposed_ploidy'])),
+            ("Sample Sex", str(config['obs_sex'])),
+        ])),
+    ])
+
+
+# Quality metrics table, by column ("Pre-curation hap1", ...)
+def quality_metrics(artifacts):
+    asm_table_data = artifacts['asm_table_data']
+    metrics = OrderedDict()
+    for column, header in enumerate(asm_table_data[0][1:], start=1):
+        metrics[" ".join(header.split())] = OrderedDict((row[0], str(row[column])) for row in asm_table_data[1:])
+    return metrics
+
+
+# Flag the metrics below the EBP standards (ear/ebp_standards.yaml unless others are given) or
+# different from expected, as plain messages
+def evaluate_checks(config, taxonomy, artifacts, standards=None):
+    report = {'ToLID': config['tol_id'], 'Genome Traits': genome_traits(config, taxonomy, artifacts), 'Metrics': quality_metrics(artifacts)}
+    flags = check_reports([report], standards)[0]
+    return {'traits': [f". {message}" for message in flags.get('traits', [])], 'curated': [f". {message}" for message in flags.get('curated', [])]}
@@ -0,0 +1,372 @@
+# ERGA EARs Report Module
+# rules.py
+# ERGA Sequencing and Assembly Committee
+#
+# The checks of the EARs, as declarative rules read from a versioned EBP standards file
+# (ear/ebp_standards.yaml unless another one is given). Each rule compares a metric with a
+# threshold in a scope, the sample or the assemblies of a stage, and the rules are applied a
+# column at a time to the table of the metrics of any number of reports: those of the report being
+# made, or those of every EAR in Assembly_Reports/, checked again against other standards with:
+#   python -m ear.rules Assembly_Reports --standards new_standards.yaml
+# The metrics of the EARs are cached by path and stat, so checking them again only reads the YAML
+# files that changed.
+
+import argparse
+import functools
+import glob
+import hashlib
+import itertools
+import json
+import logging
+import operator
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import yaml
+
+from ear.taxonomy import default_cache_dir
+
+
+DEFAULT_STANDARDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ebp_standards.yaml")
+
+COMPARISONS = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge, '==': operator.eq, '!=': operator.ne}
+KINDS = ('number', 'text')
+
+# Values of the reports standing for a missing number
+MISSING_VALUES = ('', 'NA', 'N/A', 'None')
+
+# Leading number of a value as the reports write them: "1,234", "96.6%", "11 (source: ancestor)"
+number_pattern = re.compile(r"^\s*(-?(?:\d[\d,]*)?\.?\d+(?:[eE]-?\d+)?)")
+
+
+# STANDARDS #######################################################################################
+
+class Rule:
+    """A check of the standards file: rows of the scope where "metric comparison threshold" holds
+    are flagged with the message, in the section (of the report) and group (ordering the
+    messages) of the rule."""
+
+    def __init__(self, name, section, scope, metric, comparison, threshold, message, group=None, kind='number'):
+        if comparison not in COMPARISONS:
+            raise ValueError(f"Rule {name}: unknown comparison {comparison!r}, expected one of {', '.join(COMPARISONS)}")
+        if kind not in KINDS:
+            raise ValueError(f"Rule {name}: unknown kind {kind!r}, expected one of {', '.join(KINDS)}")
+        self.name = name
+        self.section = section
+        self.scope = scope
+        self.metric = metric
+        self.comparison = comparison
+        self.threshold = threshold
+        self.message = message
+        self.group = group or name
+        self.kind = kind
+
+    # sample rules are applied to the reports, the others to their assemblies
+    @property
+    def level(self):
+        return 'sample' if self.scope == 'sample' else 'assembly'
+
+
+class Standards:
+    """The rules of a standards file, with its version and the hash of its content (which tells
+    whether reports checked against it are up to date)."""
+
+    def __init__(self, path, version, rules, digest):
+        self.path = path
+        self.version = version
+        self.rules = rules
+        self.digest = digest
+        self.sections = list(dict.fromkeys(rule.section for rule in rules))
+        self.groups = list(dict.fromkeys((rule.section, rule.group) for rule in rules))
+
+
+@functools.lru_cache(maxsize=None)
+def load_standards(path=DEFAULT_STANDARDS):
+    with open(path, 'rb') as file:
+        content = file.read()
+    data = yaml.safe_load(content)
+    if not isinstance(data, dict) or 'version' not in data or not data.get('rules'):
+        raise ValueError(f"{path} is not an EBP standards file (with a version and rules)")
+    rules = []
+    for number, definition in enumerate(data['rules'], start=1):
+        try:
+            rules.append(Rule(**definition))
+        except TypeError as e:
+            raise ValueError(f"{path}: invalid rule {number} ({str(e)})")
+    return Standards(path, str(data['version']), rules, hashlib.sha256(content).hexdigest())
+
+
+# METRIC TABLE ####################################################################################
+
+def as_number(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    match = number_pattern.match(str(value))
+    if match is None:
+        return None
+    number = float(match.group(1).replace(',', ''))
+    return int(number) if number.is_integer() else number
+
+
+def is_missing(value):
+    return value is None or str(value).strip() in MISSING_VALUES
+
+
+class MetricTable:
+    """The metrics of a set of EARs (the "Genome Traits" and "Metrics" sections of their YAML), by
+    column, with a row per report (the sample scope) and a row per assembly (stage and haplotype)
+    of each report. A column is read from the reports when a rule first needs it, as numbers or
+    as text (trimmed, lower case), None when the value is missing (empty, or NA for numbers) or
+    cannot be read."""
+
+    def __init__(self, reports):
+        self.reports = reports
+        self.assemblies = []
+        for report, data in enumerate(reports):
+            for header, metrics in ((data or {}).get('Metrics') or {}).items():
+                stage, _, haplotype = str(header).partition(' ')
+                self.assemblies.append((report, stage, haplotype, metrics if isinstance(metrics, dict) else {}))
+        self.columns = {}
+
+    def name(self, report):
+        return (self.reports[report] or {}).get('ToLID') or f"report {report + 1}"
+
+    def value(self, report, metric, value, kind):
+        # text is compared as written, only an empty value is missing: a sex reported as NA
+        # differs from the sex of the sample
+        if kind == 'text':
+            return str(value).strip().lower() if value is not None and str(value).strip() else None
+        if is_missing(value):
+            return None
+        number = as_number(value)
+        if number is None:
+            logging.warning(f"{self.name(report)}: {metric} {value!r} is not a number, not checked")
+        return number
+
+    # "Expected ..." and "Observed ..." Genome Traits of each report
+    def trait(self, metric, kind):
+        column = []
+        for report, data in enumerate(self.reports):
+            side, _, trait = metric.partition(' ')
+            traits = ((data or {}).get('Genome Traits') or {}).get(side) or {}
+            column.append(self.value(report, metric, traits.get(trait), kind))
+        return column
+
+    def column(self, level, metric, kind='number'):
+        key = (level, metric, kind)
+        if key not in self.columns:
+            if metric in DERIVED_METRICS.get(level, {}):
+                self.columns[key] = DERIVED_METRICS[level][metric](self)
+            elif level == 'sample':
+                self.columns[key] = self.trait(metric, kind)
+            elif metric.startswith(('Expected ', 'Observed ')) or metric in DERIVED_METRICS['sample']:
+                # a value of the sample, the same for all its assemblies
+                sample = self.column('sample', metric, kind)
+                self.columns[key] = [sample[report] for report, stage, haplotype, metrics in self.assemblies]
+            else:
+                self.columns[key] = [self.value(report, metric, metrics.get(metric), kind) for report, stage, haplotype, metrics in self.assemblies]
+        return self.columns[key]
+
+
+# Relative difference between the observed and expected haploid size
+def haploid_size_difference(table):
+    expected = table.column('sample', 'Expected Haploid size (bp)')
+    observed = table.column('sample', 'Observed Haploid size (bp)')
+    return [abs(e - o) / e * 100 if e and o is not None else None for e, o in zip(expected, observed)]
+
+
+# Length lost by an assembly from the Pre-curation assembly of its haplotype
+def length_loss(table):
+    total = table.column('assembly', 'Total bp')
+    pre_curation = {(report, haplotype): length for (report, stage, haplotype, metrics), length in zip(table.assemblies, total) if stage == 'Pre-curation'}
+    column = []
+    for (report, stage, haplotype, metrics), length in zip(table.assemblies, total):
+        before = pre_curation.get((report, haplotype))
+        column.append((before - length) / before * 100 if before and length is not None else None)
+    return column
+
+
+DERIVED_METRICS = {
+    'sample': {'Haploid size difference %': haploid_size_difference},
+    'assembly': {'Length loss %': length_loss},
+}
+
+
+# CHECKS ##########################################################################################
+
+# The messages of each report of the table, {section: [message]}, in the order of the standards:
+# group by group, row by row within a group, rule by rule within a row
+def evaluate(table, standards):
+    flagged = [[] for _ in table.reports]
+    for order, rule in enumerate(standards.rules):
+        values = table.column(rule.level, rule.metric, rule.kind)
+        if isinstance(rule.threshold, str):
+            thresholds = table.column(rule.level, rule.threshold, rule.kind)
+        else:
+            thresholds = itertools.repeat(rule.threshold)
+        compare = COMPARISONS[rule.comparison]
+        group = standards.groups.index((rule.section, rule.group))
+        for row, (value, threshold) in enumerate(zip(values, thresholds)):
+            if value is None or threshold is None or not compare(value, threshold):
+                continue
+            if rule.level == 'sample':
+                report, stage, haplotype = row, None, None
+            else:
+                report, stage, haplotype, metrics = table.assemblies[row]
+                if rule.scope not in ('all', stage):
+                    continue
+            message = rule.message.format(haplotype=haplotype, stage=stage, value=value, threshold=threshold)
+            flagged[report].append((group, row, order, rule.section, message))
+
+    results = []
+    for report_flags in flagged:
+        sections = {section: [] for section in standards.sections}
+        for group, row, order, section, message in sorted(report_flags):
+            sections[section].append(message)
+        results.append(sections)
+    return results
+
+
+def check_reports(reports, standards=None):
+    return evaluate(MetricTable(reports), standards or load_standards())
+
+
+# CORPUS ##########################################################################################
+
+# Sections of the EAR YAML files the checks and their results need, kept in the cache
+REPORT_KEYS = ('ToLID', 'Species', 'Tags', 'Genome Traits', 'Metrics')
+METRICS_CACHE_VERSION = 1
+
+
+def default_metrics_cache():
+    return os.path.join(default_cache_dir(), "ear_metrics.json")
+
+
+# The EAR YAML files of the given files and folders (Assembly_Reports/<species>/<ToLID>/...)
+def find_reports(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(glob.glob(os.path.join(path, "**", "*_EAR.yaml"), recursive=True))
+        else:
+            files.append(path)
+    return files
+
+
+def read_report(path):
+    with open(path, 'r') as file:
+        data = yaml.load(file, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+    if not isinstance(data, dict):
+        return None
+    return {key: data.get(key) for key in REPORT_KEYS}
+
+
+def read_reports(paths):
+    reports = []
+    for path in paths:
+        try:
+            reports.append(read_report(path))
+        except (OSError, yaml.YAMLError) as e:
+            logging.warning(f"Could not read {path}: {str(e)}")
+            reports.append(None)
+    return reports
+
+
+# The checked sections of the EAR YAML files, from the cache for those unchanged since they were
+# cached, read (by jobs worker processes) for the others, and the cache updated
+def load_reports(files, cache_path=None, jobs=1):
+    cached = {}
+    if cache_path:
+        try:
+            with open(cache_path, 'r') as file:
+                cache = json.load(file)
+            if cache.get('version') == METRICS_CACHE_VERSION:
+                cached = cache['reports']
+        except (OSError, ValueError):
+            pass
+
+    entries, reports, pending = {}, [], []
+    for index, path in enumerate(files):
+        key = os.path.abspath(path)
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            logging.warning(f"Could not read {path}: {str(e)}")
+            reports.append(None)
+            continue
+        signature = [stat.st_mtime_ns, stat.st_size]
+        entry = cached.get(key)
+        if entry is None or entry['stat'] != signature:
+            entry = {'stat': signature, 'data': None}
+            pending.append(index)
+        entries[key] = entry
+        reports.append(entry['data'])
+
+    if pending:
+        paths = [files[index] for index in pending]
+        if jobs > 1 and len(paths) > jobs:
+            chunks = [paths[start::jobs] for start in range(jobs)]
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                parsed = dict(zip(itertools.chain.from_iterable(chunks), itertools.chain.from_iterable(executor.map(read_reports, chunks))))
+            read = [parsed[path] for path in paths]
+        else:
+            read = read_reports(paths)
+        for index, data in zip(pending, read):
+            reports[index] = data
+            entries[os.path.abspath(files[index])]['data'] = data
+
+    if cache_path and (pending or len(entries) != len(cached)):
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        temporary = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temporary, 'w') as file:
+            json.dump({'version': METRICS_CACHE_VERSION, 'reports': entries}, file)
+        os.replace(temporary, cache_path)
+    return reports, len(pending)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the EARs (the YAML files of Assembly_Reports/) against the EBP standards')
+    parser.add_argument('paths', type=str, nargs='*', default=['Assembly_Reports'], help='EAR YAML files, or folders with them (default: %(default)s)')
+    parser.add_argument('--standards', type=str, default=DEFAULT_STANDARDS, help='EBP standards file (default: ear/ebp_standards.yaml)')
+    parser.add_argument('--format', choices=['text', 'json'], default='text', help='Print the flagged reports as text (default) or all the results as JSON')
+    parser.add_argument('--cache', type=str, default=default_metrics_cache(), help='JSON file caching the metrics of the EARs (default: %(default)s)')
+    parser.add_argument('--no-cache', action='store_true', help='Do not read nor write the metrics cache')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='Worker processes reading the EARs not cached yet (default: %(default)s)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    standards = load_standards(args.standards)
+    files = find_reports(args.paths)
+    reports, read = load_reports(files, None if args.no_cache else args.cache, args.jobs)
+    results = check_reports(reports, standards)
+    seconds = time.perf_counter() - start
+
+    if args.format == 'json':
+        print(json.dumps({
+            'standards': {'path': standards.path, 'version': standards.version},
+            'reports': [{'yaml': path, 'tol_id': (data or {}).get('ToLID'), 'species': (data or {}).get('Species'), 'ok': data is not None, 'flags': flags}
+                        for path, data, flags in zip(files, reports, results)],
+        }, indent=2))
+        return
+
+    flagged = 0
+    for path, data, flags in zip(files, reports, results):
+        if data is None:
+            print(f"FAILED  {path}")
+            continue
+        messages = [message for section in standards.sections for message in flags[section]]
+        if messages:
+            flagged += 1
+            print(f"{data.get('ToLID') or '-'} ({data.get('Species') or '-'}) {path}")
+            for message in messages:
+                print(f"{' ' * 8}! {message}")
+    print(f"\n{flagged} of {len(files)} reports flagged by the EBP standards {standards.version} ({standards.path}), "
+          f"{read} read and {len(files) - read} cached in {seconds:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# ERGA EARs Report Module
+# sidecar.py
+# ERGA Sequencing and Assembly Committee
+#
+# The YAML written next to each PDF ({ToLID}_EAR.yaml), with the structure of those in
+# Assembly_Reports/. make_EAR.py fills it from the values of the report, and also embeds them in
+# the PDF (EAR.json, see ear/eardata.py), which EARpdf_to_yaml.py reads back, or parses the text
+# of older PDFs.
+
+import logging
+import os
+from collections import OrderedDict
+
+from ear.archives import is_member
+from ear.eardata import save_to_yaml
+from ear.report import genome_traits, pipeline_steps, quality_metrics
+
+
+# SIDECAR ########################################################################################
+
+def sidecar_path(pdf_filename):
+    return f"{os.path.splitext(pdf_filename)[0]}.yaml"
+
+
+# Pipeline as EARpdf_to_yaml.py reads it from the PDF tree, several key parameters kept together
+def pipeline_section(pipeline_data):
+    pipeline = OrderedDict()
+    if isinstance(pipeline_data, dict):
+        for tool, version, params in pipeline_steps(pipeline_data):
+            pipeline[tool] = OrderedDict([("ver", version)])
+            if params:
+                pipeline[tool]["key param"] = "/".join(params)
+    return pipeline
+
+
+# Interventions/Gb is a number in the EAR files, when it is one
+def as_number(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+# The content of the report, from the values the report stages gathered
+def build_sidecar(config, taxonomy, artifacts, version, created):
+    data = OrderedDict()
+    data["ERGA Assembly Report"] = version
+    data["Tags"] = config['tags']
+    data["TxID"] = str(taxonomy['taxon_id'])
+    data["ToLID"] = config['tol_id']
+    data["Species"] = config['species']
+    data["Class"] = taxonomy['class']
+    data["Order"] = taxonomy['order']
+
+    data["Genome Traits"] = genome_traits(config, taxonomy, artifacts)
+
+    data["EBP metrics"] = OrderedDict([("EBP quality code", OrderedDict(artifacts['ebp_codes']))])
+
+    data["Curator notes"] = OrderedDict([
+        ("Interventions/Gb", as_number(config['interventions_per_gb'])),
+        ("Contamination notes", f'"{config["contamination_notes"]}"'),
+        ("Other observations", f'"{config["other_notes"]}"'),
+    ])
+
+    data["Metrics"] = quality_metrics(artifacts)
+
+    busco_info_list = artifacts['busco_info_list']
+    if busco_info_list and all(info == busco_info_list[0] for info in busco_info_list):
+        busco_version, (lineage, genomes, buscos), mode, predictor = busco_info_list[0]
+        data["BUSCO"] = OrderedDict([("ver", f"{busco_version} ({mode}, {predictor})"), ("lineage", lineage)])
+    else:
+        data["BUSCO"] = OrderedDict([("ver", "WARNING! possible version mismatch"), ("lineage", "WARNING! possible lineage mismatch")])
+
+    technologies = [(technology, coverage) for item in config['data'] for technology, coverage in item.items()]
+    data["Data"] = OrderedDict([
+        ("Profile", " ".join(str(technology) for technology, coverage in technologies)),
+        ("Coverage", " ".join('NA' if not coverage else str(coverage) for technology, coverage in technologies)),
+    ])
+
+    data["Assembly pipeline"] = pipeline_section(config['asm_pipeline'])
+    data["Curation pipeline"] = pipeline_section(config['curation_pipeline'])
+
+    data["Submitter"] = config['submitter']
+    data["Affiliation"] = config['affiliation']
+    data["Date and time"] = created
+    return data
+
+
+# Write the sidecar of a report, never over the YAML the report was made from. EARpdf_to_yaml.py
+# gives the YAML it extracts the same name, so an existing file is only written over when the
+# caller says so (make_report: the sidecar of its last run, left as written, or --force)
+def write_sidecar(data, output_path, yaml_file, overwrite=False):
+    if not is_member(yaml_file) and os.path.exists(output_path) and os.path.samefile(output_path, yaml_file):
+        logging.warning(f"Not writing {output_path}, it is the input YAML of the report")
+        return None
+    if os.path.exists(output_path) and not overwrite:
+        logging.warning(f"Not writing {output_path}, the file was not written by the last run of this report (use --force to overwrite it)")
+        return None
+    save_to_yaml(data, output_path)
+    return output_path
@@ -0,0 +1,312 @@
+# ERGA EARs Report Module
+# taxdump.py
+# ERGA Sequencing and Assembly Committee
+#
+# Offline taxonomy for nodes without network access. An index is built once from the NCBI taxdump
+# (names.dmp, nodes.dmp) with:
+#   python -m ear.taxdump build /path/to/taxdump -o taxdump.idx
+# and then memory-mapped by make_EAR.py --taxdump-index taxdump.idx. Ploidy and haploid number
+# come from a GoaT attribute snapshot (--goat-snapshot), a TSV export with taxon_id, ploidy and
+# haploid_number columns (and optionally ploidy_source and haploid_number_source).
+
+import argparse
+import array
+import csv
+import hashlib
+import json
+import logging
+import mmap
+import os
+import sys
+import zlib
+
+from ear.timings import count_read
+
+
+INDEX_MAGIC = b"EARTAXv1"
+
+# name classes from names.dmp that can be used to find a species
+LOOKUP_NAME_CLASSES = {"scientific name": 0, "equivalent name": 1, "synonym": 2}
+
+
+def name_key(name):
+    return name.strip().lower().encode("utf-8")
+
+
+# Build the index #################################################################################
+
+def read_dmp(path):
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            yield line.rstrip("\n").rstrip("\t|").split("\t|\t")
+
+
+def build_index(taxdump_dir, index_path):
+    # parent pointers and ranks, as arrays indexed by TxID
+    nodes = []
+    ranks = []
+    rank_codes = {}
+    for fields in read_dmp(os.path.join(taxdump_dir, "nodes.dmp")):
+        rank = fields[2]
+        if rank not in rank_codes:
+            rank_codes[rank] = len(ranks)
+            ranks.append(rank)
+        nodes.append((int(fields[0]), int(fields[1]), rank_codes[rank]))
+    max_taxid = max(taxid for taxid, _, _ in nodes)
+    taxa = len(nodes)
+
+    parents = array.array("i", bytes(4 * (max_taxid + 1)))
+    node_ranks = array.array("B", bytes(max_taxid + 1))
+    for taxid, parent, rank in nodes:
+        parents[taxid] = parent
+        node_ranks[taxid] = rank
+    del nodes
+
+    # scientific names (to report class and order) and the names a species can be looked up by
+    scientific_names = {}
+    lookup = {}
+    for fields in read_dmp(os.path.join(taxdump_dir, "names.dmp")):
+        taxid, name, name_class = int(fields[0]), fields[1], fields[3]
+        if name_class == "scientific name":
+            scientific_names[taxid] = name
+        priority = LOOKUP_NAME_CLASSES.get(name_class)
+        if priority is not None:
+            key = name_key(name)
+            # homonyms: keep the scientific name over synonyms, then the first one seen
+            if key not in lookup or priority < lookup[key][0]:
+                lookup[key] = (priority, taxid)
+
+    sci_offsets = array.array("I", bytes(4 * (max_taxid + 2)))
+    sci_blob = bytearray()
+    for taxid in range(max_taxid + 1):
+        sci_offsets[taxid] = len(sci_blob)
+        if taxid in scientific_names:
+            sci_blob += scientific_names[taxid].encode("utf-8")
+    sci_offsets[max_taxid + 1] = len(sci_blob)
+    del scientific_names
+
+    # open addressing hash table of (name offset, name length, TxID), at most ~70% full
+    table_size = 1
+    while table_size * 0.7 < len(lookup):
+        table_size *= 2
+    mask = table_size - 1
+    table = array.array("I", bytes(12 * table_size))
+    lookup_blob = bytearray()
+    for key, (_, taxid) in lookup.items():
+        slot = zlib.crc32(key) & mask
+        while table[3 * slot + 2]:
+            slot = (slot + 1) & mask
+        table[3 * slot] = len(lookup_blob)
+        table[3 * slot + 1] = len(key)
+        table[3 * slot + 2] = taxid
+        lookup_blob += key
+
+    sections = [
+        ("parents", parents.tobytes()),
+        ("ranks", node_ranks.tobytes()),
+        ("sci_offsets", sci_offsets.tobytes()),
+        ("sci_names", bytes(sci_blob)),
+        ("table", table.tobytes()),
+        ("lookup_names", bytes(lookup_blob)),
+    ]
+    header = {
+        "byteorder": sys.byteorder,
+        "max_taxid": max_taxid,
+        "ranks": ranks,
+        "table_size": table_size,
+        "sections": {},
+    }
+    # section offsets depend on the header length, so size the header with placeholder offsets first
+    header_len = len(json.dumps(header)) + 64 * len(sections) + 64
+    offset = align(len(INDEX_MAGIC) + 4 + header_len)
+    for name, data in sections:
+        header["sections"][name] = [offset, len(data)]
+        offset = align(offset + len(data))
+    header_bytes = json.dumps(header).encode("utf-8").ljust(header_len)
+
+    with open(index_path, "wb") as file:
+        file.write(INDEX_MAGIC)
+        file.write(len(header_bytes).to_bytes(4, "little"))
+        file.write(header_bytes)
+        for name, data in sections:
+            file.seek(header["sections"][name][0])
+            file.write(data)
+
+    return taxa, len(lookup)
+
+
+def align(offset, boundary=8):
+    return (offset + boundary - 1) // boundary * boundary
+
+
+# Use the index ###################################################################################
+
+class TaxdumpIndex:
+    """Read-only view over a taxdump index. The file is memory-mapped, so opening it costs a few
+    milliseconds whatever its size, and only the pages touched by the lookups are read."""
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        with open(index_path, "rb") as file:
+            self.mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mm[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+            raise ValueError(f"{index_path} is not a taxdump index, build it with: python -m ear.taxdump build")
+        header_len = int.from_bytes(self.mm[len(INDEX_MAGIC):len(INDEX_MAGIC) + 4], "little")
+        start = len(INDEX_MAGIC) + 4
+        header = json.loads(self.mm[start:start + header_len].decode("utf-8"))
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError(f"{index_path} was built on a {header['byteorder']}-endian machine, rebuild it here")
+
+        self.ranks = header["ranks"]
+        self.table_size = header["table_size"]
+        view = memoryview(self.mm)
+        sections = {name: view[offset:offset + length] for name, (offset, length) in header["sections"].items()}
+        self.parents = sections["parents"].cast("i")
+        self.node_ranks = sections["ranks"]
+        self.sci_offsets = sections["sci_offsets"].cast("I")
+        self.sci_names = sections["sci_names"]
+        self.table = sections["table"].cast("I")
+        self.lookup_names = sections["lookup_names"]
+
+    def find(self, name):
+        key = name_key(name)
+        mask = self.table_size - 1
+        slot = zlib.crc32(key) & mask
+        while True:
+            taxid = self.table[3 * slot + 2]
+            if not taxid:
+                return None
+            offset, length = self.table[3 * slot], self.table[3 * slot + 1]
+            if length == len(key) and self.lookup_names[offset:offset + length] == key:
+                return taxid
+            slot = (slot + 1) & mask
+
+    def scientific_name(self, taxid):
+        return bytes(self.sci_names[self.sci_offsets[taxid]:self.sci_offsets[taxid + 1]]).decode("utf-8")
+
+    def rank(self, taxid):
+        return self.ranks[self.node_ranks[taxid]]
+
+    def lineage(self, taxid):
+        # from the taxon up to the root (whose parent is itself)
+        lineage = [taxid]
+        while self.parents[taxid] and self.parents[taxid] != taxid:
+            taxid = self.parents[taxid]
+            lineage.append(taxid)
+        return lineage
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    count_read(path)
+    return digest.hexdigest()
+
+
+class TaxdumpTaxonomy:
+    """Taxonomy provider for make_report() working offline: TxID, class and order from a taxdump
+    index, ploidy and haploid number from a local GoaT attribute snapshot."""
+
+    def __init__(self, index_path, snapshot_path=None):
+        self.index_path = index_path
+        self.snapshot_path = snapshot_path
+        self.index = None
+        self.snapshot = None
+        self.digests = None
+        self.resolved = {}
+
+    # the memory map cannot be sent to batch workers, each one maps the file again
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["index"] = None
+        return state
+
+    # Where the taxonomy comes from, for the build manifest: the content of the index and snapshot
+    def source(self):
+        if self.digests is None:
+            self.digests = [file_digest(path) if path else None for path in (self.index_path, self.snapshot_path)]
+        return ['taxdump'] + self.digests
+
+    def load_snapshot(self):
+        self.snapshot = {}
+        if not self.snapshot_path:
+            return
+        with open(self.snapshot_path, "r", newline="") as file:
+            for row in csv.DictReader(file, delimiter="\t"):
+                attributes = {}
+                for field in ("ploidy", "haploid_number"):
+                    value = row.get(field)
+                    if value not in (None, "", "None"):
+                        source = row.get(f"{field}_source") or row.get(f"{field}:aggregation_source") or row.get(f"{field}_aggregation_source") or "direct"
+                        attributes[field] = (value, source)
+                self.snapshot[int(row["taxon_id"])] = attributes
+        count_read(self.snapshot_path)
+
+    def resolve(self, species):
+        if species in self.resolved:
+            return self.resolved[species]
+        if self.index is None:
+            self.index = TaxdumpIndex(self.index_path)
+        if self.snapshot is None:
+            self.load_snapshot()
+
+        taxid = self.index.find(species)
+        if taxid is None:
+            raise LookupError(f"Species '{species}' not found in the taxdump index {self.index_path}")
+        lineage = self.index.lineage(taxid)
+
+        taxonomy = {'taxon_id': str(taxid), 'class': 'NA', 'order': 'NA'}
+        for node in lineage:
+            rank = self.index.rank(node)
+            if rank in ('class', 'order') and taxonomy[rank] == 'NA':
+                taxonomy[rank] = self.index.scientific_name(node)
+
+        # as in GoaT, a value missing for the species is taken from its closest ancestor
+        for field, source_key in (('ploidy', 'ploidy_source'), ('haploid_number', 'haploid_source')):
+            taxonomy[field], taxonomy[source_key] = 'NA', 'NA'
+            for node in lineage:
+                if field in self.snapshot.get(node, {}):
+                    value, source = self.snapshot[node][field]
+                    taxonomy[field] = value
+                    taxonomy[source_key] = source if node == taxid else 'ancestor'
+                    break
+        if not self.snapshot_path:
+            logging.warning("No GoaT snapshot given, ploidy and haploid number are reported as NA")
+
+        self.resolved[species] = taxonomy
+        return taxonomy
+
+    # Resolve the species of a batch. Species that fail are left out (and logged)
+    def resolve_many(self, species_list):
+        taxonomies = {}
+        for species in species_list:
+            try:
+                taxonomies[species] = self.resolve(species)
+            except Exception as e:
+                logging.warning(f"Could not resolve the taxonomy of {species}: {str(e)}")
+        return taxonomies
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or query the offline taxonomy index used by make_EAR.py --taxdump-index')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help='Build the index from an NCBI taxdump folder (names.dmp, nodes.dmp)')
+    build_parser.add_argument('taxdump_dir', type=str, help='Folder with the extracted taxdump.tar.gz')
+    build_parser.add_argument('-o', '--output', type=str, default='taxdump.idx', help='Index file to write (default: %(default)s)')
+    lookup_parser = subparsers.add_parser('lookup', help='Resolve a species with an index (and snapshot)')
+    lookup_parser.add_argument('index', type=str, help='Index built with the build command')
+    lookup_parser.add_argument('species', type=str, help='Species name')
+    lookup_parser.add_argument('--goat-snapshot', type=str, default=None, help='GoaT attribute snapshot (TSV)')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        taxa, names = build_index(args.taxdump_dir, args.output)
+        print(f"Indexed {taxa:,} TxIDs and {names:,} names in {args.output}")
+    else:
+        print(json.dumps(TaxdumpTaxonomy(args.index, args.goat_snapshot).resolve(args.species), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+# ERGA EARs Report Module
+# taxonomy.py
+# ERGA Sequencing and Assembly Committee
+
+import json
+import logging
+import os
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from ear.timings import count_read, count_request
+
+
+GOAT_API = "https://goat.genomehubs.org/api/v2"
+
+
+# Default location of the persistent caches ($XDG_CACHE_HOME/erga-ear or ~/.cache/erga-ear)
+def default_cache_dir():
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "erga-ear")
+
+
+def default_taxonomy_cache():
+    return os.path.join(default_cache_dir(), "goat_taxonomy.jsonl")
+
+
+# GoaT lookups ####################################################################################
+
+# GoaT answers worth retrying (rate limited, or the service is having a bad moment)
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+# TxIDs asked for in one record request
+RECORD_BATCH = 50
+
+
+# Ploidy and haploid number from a GoaT record
+def record_attributes(record):
+    attributes = record['record']['attributes']
+    ploidy_info = attributes['ploidy']
+    haploid_info = attributes['haploid_number']
+
+    return {
+        'ploidy': ploidy_info['value'],
+        'ploidy_source': ploidy_info['aggregation_source'],
+        'haploid_number': haploid_info['value'],
+        'haploid_source': haploid_info['aggregation_source'],
+    }
+
+
+class GoatClient:
+    """Client for the two GoaT API endpoints the report uses. Requests share one keep-alive
+    session per process, time out (connect, read) instead of hanging, and are retried with
+    exponential backoff on connection errors and 429/5xx answers (honouring Retry-After)."""
+
+    def __init__(self, base_url=GOAT_API, connect_timeout=10, read_timeout=60, retries=5, backoff=1):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.session = None
+
+    # the session cannot be sent to batch workers, each one opens its own
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['session'] = None
+        return state
+
+    def get(self, path):
+        if self.session is None:
+            retry = Retry(total=self.retries, backoff_factor=self.backoff, status_forcelist=RETRY_STATUS, raise_on_status=False)
+            adapter = HTTPAdapter(max_retries=retry)
+            self.session = requests.Session()
+            self.session.mount('https://', adapter)
+            self.session.mount('http://', adapter)
+        count_request()
+        response = self.session.get(f"{self.base_url}/{path}", timeout=self.timeout)
+        response.raise_for_status()
+        return response.json() # convert json to dict
+
+    # Get TxID, class and order from GoaT based on species name
+    def search(self, species):
+        # urllib.parse.quote to handle special characters and spaces in the species name
+        species_name = requests.utils.quote(species)
+        goat_data = self.get(f'search?query=tax_name%28{species_name}%29&result=taxon')
+
+        taxon_number = goat_data['results'][0]['result']['taxon_id']
+
+        class_name = 'NA'
+        order_name = 'NA'
+        for result in goat_data['results']:
+            lineage = result['result']['lineage']
+            for node in lineage:
+                if node['taxon_rank'] == 'class':
+                    class_name = node['scientific_name']
+                if node['taxon_rank'] == 'order':
+                    order_name = node['scientific_name']
+
+        return {'taxon_id': taxon_number, 'class': class_name, 'order': order_name}
+
+    # Get ploidy and haploid number from the GoaT records of several TxIDs, RECORD_BATCH per request.
+    # TxIDs a batch request rejects (4xx other than 429) or leaves out are asked for one at a time,
+    # as the single-record request always worked; TxIDs GoaT has no record of are left out
+    def records(self, taxon_numbers):
+        taxon_numbers = [str(taxon_number) for taxon_number in taxon_numbers]
+        attributes = {}
+        for i in range(0, len(taxon_numbers), RECORD_BATCH):
+            batch = taxon_numbers[i:i + RECORD_BATCH]
+            if len(batch) > 1:
+                try:
+                    goat_data = self.get(f"record?recordId={','.join(batch)}&result=taxon&taxonomy=ncbi")
+                    for record in goat_data['records']:
+                        attributes[str(record['record']['taxon_id'])] = record_attributes(record)
+                except requests.HTTPError as e:
+                    if e.response is None or e.response.status_code in RETRY_STATUS:
+                        raise
+                    logging.warning(f"GoaT rejected a request for {len(batch)} records ({str(e)}), asking for them one at a time")
+            for taxon_number in batch:
+                if taxon_number in attributes:
+                    continue
+                goat_data = self.get(f'record?recordId={taxon_number}&result=taxon&taxonomy=ncbi')
+                if goat_data['records']:
+                    attributes[taxon_number] = record_attributes(goat_data['records'][0])
+        return attributes
+
+    # Get ploidy and haploid number from the GoaT record of a TxID
+    def record(self, taxon_number):
+        return self.records([taxon_number])[str(taxon_number)]
+
+
+# Persistent cache ################################################################################
+
+class TaxonomyCache:
+    """JSON-lines store of GoaT answers. Each line holds one entry: its key ("search:<species>" or
+    "record:<TxID>"), the time it was fetched and the data. The last line of a key wins."""
+
+    def __init__(self, path, ttl_days=30):
+        self.path = path
+        self.ttl = ttl_days * 86400
+        self.entries = None
+
+    def load(self):
+        self.entries = {}
+        lines = 0
+        if os.path.exists(self.path):
+            with open(self.path, "r") as file:
+                for line in file:
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                        self.entries[entry['key']] = entry
+                    except (ValueError, KeyError):
+                        logging.warning(f"Skipping malformed line in taxonomy cache {self.path}")
+            count_read(self.path)
+        # keep the file from growing with refreshed or expired entries
+        if lines > 2 * len(self.entries) + 100:
+            self.compact()
+
+    def get(self, key):
+        if self.entries is None:
+            self.load()
+        entry = self.entries.get(key)
+        if entry and time.time() - entry['fetched'] < self.ttl:
+            return entry['data']
+        return None
+
+    def put(self, key, data):
+        if self.entries is None:
+            self.load()
+        entry = {'key': key, 'fetched': time.time(), 'data': data}
+        self.entries[key] = entry
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # one write per line, so concurrent batch workers can append safely
+            with open(self.path, "a") as file:
+                file.write(json.dumps(entry) + "\n")
+        except OSError as e:
+            logging.warning(f"Could not write taxonomy cache {self.path}: {str(e)}")
+
+    def compact(self):
+        now = time.time()
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as file:
+                for entry in self.entries.values():
+                    if now - entry['fetched'] < self.ttl:
+                        file.write(json.dumps(entry) + "\n")
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logging.warning(f"Could not compact taxonomy cache {self.path}: {str(e)}")
+
+
+class GoatTaxonomy:
+    """Resolve the taxonomy of a species from GoaT, through the persistent cache unless it is
+    disabled (cache_path=None). With refresh=True the cache is not read, but still updated."""
+
+    def __init__(self, cache_path=None, ttl_days=30, refresh=False, client=None):
+        self.cache = TaxonomyCache(cache_path, ttl_days) if cache_path else None
+        self.refresh = refresh
+        self.client = client or GoatClient()
+        self.resolved = {}
+
+    # Where the taxonomy comes from, for the build manifest
+    def source(self):
+        return ['goat', self.client.base_url]
+
+    def lookup(self, key):
+        if self.cache and not self.refresh:
+            data = self.cache.get(key)
+            if data is not None:
+                logging.info(f"Taxonomy cache hit: {key}")
+                return data
+        return None
+
+    def store(self, key, data):
+        if self.cache:
+            self.cache.put(key, data)
+
+    def cached(self, key, fetch):
+        data = self.lookup(key)
+        if data is None:
+            logging.info(f"Taxonomy cache miss: {key}, querying GoaT")
+            data = fetch()
+            self.store(key, data)
+        return data
+
+    def resolve(self, species):
+        if species not in self.resolved:
+            taxonomy = dict(self.cached(f"search:{species.strip().lower()}", lambda: self.client.search(species)))
+            taxon_number = str(taxonomy['taxon_id'])
+            taxonomy.update(self.cached(f"record:{taxon_number}", lambda: self.client.record(taxon_number)))
+            self.resolved[species] = taxonomy
+        return self.resolved[species]
+
+    # Resolve the species of a batch: one search per species, then the records of all the TxIDs
+    # not cached yet in as few requests as possible. Species that fail are left out (and logged)
+    def resolve_many(self, species_list):
+        searches = {}
+        for species in species_list:
+            if species in self.resolved or species in searches:
+                continue
+            try:
+                searches[species] = dict(self.cached(f"search:{species.strip().lower()}", lambda: self.client.search(species)))
+            except Exception as e:
+                logging.warning(f"Could not resolve the taxonomy of {species}: {str(e)}")
+
+        records = {}
+        pending = []
+        for taxonomy in searches.values():
+            taxon_number = str(taxonomy['taxon_id'])
+            data = self.lookup(f"record:{taxon_number}")
+            if data is not None:
+                records[taxon_number] = data
+            elif taxon_number not in pending:
+                pending.append(taxon_number)
+        if pending:
+            logging.info(f"Taxonomy cache miss: {len(pending)} records, querying GoaT")
+            try:
+                fetched = self.client.records(pending)
+            except Exception as e:
+                logging.warning(f"Could not get the GoaT records of {', '.join(pending)}: {str(e)}")
+                fetched = {}
+            for taxon_number, data in fetched.items():
+                self.store(f"record:{taxon_number}", data)
+            records.update(fetched)
+
+        for species, taxonomy in searches.items():
+            taxon_number = str(taxonomy['taxon_id'])
+            if taxon_number in records:
+                taxonomy.update(records[taxon_number])
+                self.resolved[species] = taxonomy
+            else:
+                logging.warning(f"No GoaT record for {species} (TxID {taxon_number})")
+        return {species: self.resolved[species] for species in species_list if species in self.resolved}
@@ -0,0 +1,78 @@
+# ERGA EARs Report Module
+# timings.py
+# ERGA Sequencing and Assembly Committee
+
+import threading
+import time
+from contextlib import contextmanager
+
+from ear.archives import path_stat
+
+
+# Files and bytes read from disk, and requests sent to GoaT, by this process. The modules reading
+# report inputs count what they read here, so each stage can be charged with its own I/O
+io_counters = {'files': 0, 'bytes': 0, 'requests': 0}
+io_lock = threading.Lock()
+
+# A thread working for a later stage (the taxonomy lookup, see fetch_taxonomy_background in
+# ear/report.py) counts its I/O apart, or it would be charged to the stages running meanwhile
+thread_counters = threading.local()
+
+
+def current_counters():
+    return getattr(thread_counters, 'counters', None) or io_counters
+
+
+def count_read(file_path, size=None):
+    size = path_stat(file_path)[1] if size is None else size
+    # inputs are read by several threads at once (see prefetch_artifacts in ear/report.py)
+    with io_lock:
+        counters = current_counters()
+        counters['files'] += 1
+        counters['bytes'] += size
+
+
+def count_request():
+    with io_lock:
+        current_counters()['requests'] += 1
+
+
+# Run function(*args) in this thread counting its I/O in counters, which the stage waiting for the
+# result adds to its own (see StageTimings.stage)
+def counted_apart(counters, function, *args):
+    thread_counters.counters = counters
+    try:
+        return function(*args)
+    finally:
+        thread_counters.counters = None
+
+
+class StageTimings:
+    """Wall time and I/O of each stage of a report, in the order they ran. A stage that fails
+    (or exits) is still recorded, up to where it stopped. The I/O a stage waited for, counted apart
+    by another thread, is added to the counters the stage yields."""
+
+    def __init__(self):
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        before = dict(io_counters)
+        waited = dict.fromkeys(io_counters, 0)
+        start = time.perf_counter()
+        try:
+            yield waited
+        finally:
+            record = {'stage': name, 'seconds': round(time.perf_counter() - start, 4)}
+            record.update({counter: io_counters[counter] - before[counter] + waited[counter] for counter in io_counters})
+            self.stages.append(record)
+
+
+# Format the stages of a report as a text table
+def format_timings(stages):
+    lines = [f"{'stage':<18}{'time (s)':>10}{'files':>8}{'bytes':>14}{'requests':>10}"]
+    for record in stages:
+        lines.append(f"{record['stage']:<18}{record['seconds']:>10.3f}{record['files']:>8}{record['bytes']:>14,}{record['requests']:>10}")
+    lines.append(f"{'total':<18}{sum(r['seconds'] for r in stages):>10.3f}{sum(r['files'] for r in stages):>8}"
+                 f"{sum(r['bytes'] for r in stages):>14,}{sum(r['requests'] for r in stages):>10}")
+    return "\n".join(lines)
@@ -0,0 +1,81 @@
+# ERGA EARs Report Module
+# tests/conftest.py
+# ERGA Sequencing and Assembly Committee
+#
+# Tests of the ear package, run from the repository root with:
+#   python -m pytest tests
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# make_EAR.py and the ear package live in the repository root
+sys.path.insert(0, REPO)
+
+from ear.taxdump import build_index
+
+
+# (TxID, parent, rank, scientific name, other names)
+TAXA = [
+    (1, 1, "no rank", "root", []),
+    (40674, 1, "class", "Mammalia", []),
+    (9783, 40674, "order", "Proboscidea", []),
+    (9784, 9783, "family", "Elephantidae", []),
+    (99487, 9784, "species", "Elephas maximus", [("Asian elephant", "genbank common name"), ("Elephas indicus", "synonym")]),
+    (9785, 9784, "species", "Loxodonta africana", [("Elephas maximus", "synonym")]),
+]
+
+
+def dmp_line(*fields):
+    return "\t|\t".join(str(field) for field in fields) + "\t|\n"
+
+
+@pytest.fixture
+def taxdump_index(tmp_path):
+    with open(tmp_path / "nodes.dmp", "w") as file:
+        for taxid, parent, rank, name, others in TAXA:
+            file.write(dmp_line(taxid, parent, rank, "", 0))
+    with open(tmp_path / "names.dmp", "w") as file:
+        for taxid, parent, rank, name, others in TAXA:
+            file.write(dmp_line(taxid, name, "", "scientific name"))
+            for other, name_class in others:
+                file.write(dmp_line(taxid, other, "", name_class))
+    index_path = tmp_path / "taxdump.idx"
+    taxa, names = build_index(str(tmp_path), str(index_path))
+    assert taxa == len(TAXA)
+    return str(index_path)
+
+# GoaT attribute snapshot for the species of the index
+@pytest.fixture
+def goat_snapshot(tmp_path):
+    snapshot = tmp_path / "snapshot.tsv"
+    snapshot.write_text("taxon_id\tploidy\thaploid_number\thaploid_number_source\n"
+                        "99487\t\t28\tdirect\n"
+                        "9783\t2\t\t\n")
+    return str(snapshot)
+
+
+# Synthetic inputs of a report (see bench/make_fixtures.py), small enough for the tests: the path
+# of their EAR.yaml for each ToLID asked for
+@pytest.fixture
+def ear_fixture(tmp_path):
+    pytest.importorskip("reportlab")
+    from bench.make_fixtures import make_fixture
+
+    def make(tol_id="mBenTes1", haplotypes=2):
+        return make_fixture(str(tmp_path / tol_id), haplotypes=haplotypes, image_size=64, scaffolds=20, contigs=60, tol_id=tol_id)
+    return make
+
+
+# Run make_EAR.py offline (taxdump index and GoaT snapshot) in the given folder
+@pytest.fixture
+def run_make_ear(taxdump_index, goat_snapshot):
+    def run(cwd, *args):
+        command = [sys.executable, os.path.join(REPO, "make_EAR.py"), *args, "--taxdump-index", taxdump_index, "--goat-snapshot", goat_snapshot]
+        env = dict(os.environ, XDG_CACHE_HOME=os.path.join(str(cwd), "cache"))
+        return subprocess.run(command, cwd=str(cwd), env=env, capture_output=True, text=True)
+    return run
@@ -0,0 +1,107 @@
+# Results bundles: members of .zip and .tar files read through "bundle::member" paths
+
+import gzip
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from ear import archives
+from ear.artifacts import load_gfastats, open_artifact
+
+
+MEMBERS = {
+    "results/EAR.yaml": b"tol_id: xTes1\n",
+    "results/other.yaml": b"other: 1\n",
+    "results/asm/asm.gfastats": b"# scaffolds: 4\nScaffold N50: 600000\n",
+    "results/merqury/out.qv.gz": gzip.compress(b"asm\t10\t100\t55.1\t1e-6\n"),
+    "results/merqury/out.completeness.stats": b"asm\tall\t90\t100\t90.0\n",
+}
+
+
+def make_bundle(path, kind):
+    if kind == "zip":
+        with zipfile.ZipFile(path, "w") as bundle:
+            for name, content in MEMBERS.items():
+                bundle.writestr(name, content)
+    else:
+        with tarfile.open(path, "w:gz" if kind == "tar.gz" else "w") as bundle:
+            for name, content in MEMBERS.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(content)
+                bundle.addfile(info, io.BytesIO(content))
+    return path
+
+
+@pytest.fixture(params=["zip", "tar", "tar.gz"])
+def bundle(request, tmp_path):
+    return make_bundle(str(tmp_path / f"results.{request.param}"), request.param)
+
+
+def test_split_member():
+    assert archives.split_member("results.zip::./results//EAR.yaml") == ("results.zip", "results/EAR.yaml")
+    assert archives.split_member("results.zip::") == ("results.zip", "")
+    assert archives.split_member("results/EAR.yaml") == (None, "results/EAR.yaml")
+    assert archives.member_path("results.zip", "results/EAR.yaml") == "results.zip::results/EAR.yaml"
+    assert archives.is_member("results.zip::EAR.yaml") and not archives.is_member("EAR.yaml")
+
+
+def test_members(bundle):
+    assert archives.is_archive(bundle)
+    qv = archives.member_path(bundle, "results/merqury/out.qv.gz")
+    assert archives.isfile(qv) and not archives.isdir(qv)
+    assert archives.isdir(f"{bundle}::results/merqury") and not archives.isfile(f"{bundle}::results/merqury")
+    assert archives.listdir(f"{bundle}::results") == ["EAR.yaml", "other.yaml", "asm", "merqury"]
+    assert archives.listdir(f"{bundle}::results/merqury") == ["out.qv.gz", "out.completeness.stats"]
+    assert archives.isdir(f"{bundle}::")
+    with archives.open_binary(f"{bundle}::results/asm/asm.gfastats") as file:
+        assert file.read() == MEMBERS["results/asm/asm.gfastats"]
+
+
+def test_member_stat(bundle):
+    gfastats = f"{bundle}::results/asm/asm.gfastats"
+    # members have the mtime of their bundle
+    assert archives.path_stat(gfastats) == (os.stat(bundle).st_mtime_ns, len(MEMBERS["results/asm/asm.gfastats"]))
+    assert archives.abspath(os.path.relpath(gfastats)) == gfastats
+    assert archives.exists(gfastats)
+    assert not archives.exists(f"{bundle}::results/asm/missing.gfastats")
+    with pytest.raises(FileNotFoundError):
+        archives.open_binary(f"{bundle}::results/asm/missing.gfastats")
+    with pytest.raises(FileNotFoundError):
+        archives.listdir(f"{bundle}::results/missing")
+
+
+def test_member_artifacts(bundle):
+    # compressed members are decompressed while read, as plain files are
+    with open_artifact(f"{bundle}::results/merqury/out.qv.gz") as file:
+        assert file.read() == "asm\t10\t100\t55.1\t1e-6\n"
+    assert load_gfastats(f"{bundle}::results/asm/asm.gfastats").int("Scaffold N50") == 600000
+
+
+def test_find_yaml(bundle):
+    assert archives.find_yaml(bundle) == f"{bundle}::results/EAR.yaml"
+
+
+def test_find_yaml_missing(tmp_path):
+    path = str(tmp_path / "empty.zip")
+    with zipfile.ZipFile(path, "w") as bundle:
+        bundle.writestr("results/asm.gfastats", "# scaffolds: 4\n")
+    with pytest.raises(FileNotFoundError):
+        archives.find_yaml(path)
+
+
+def test_thread_safe(tmp_path):
+    zip_path = make_bundle(str(tmp_path / "results.zip"), "zip")
+    tar_path = make_bundle(str(tmp_path / "results.tar"), "tar")
+    assert archives.thread_safe(f"{zip_path}::results/EAR.yaml")
+    assert not archives.thread_safe(f"{tar_path}::results/EAR.yaml")
+    assert archives.thread_safe(str(tmp_path / "EAR.yaml"))
+
+
+def test_not_archive(tmp_path):
+    path = tmp_path / "EAR.yaml"
+    path.write_text("tol_id: xTes1\n")
+    assert not archives.is_archive(str(path))
+    assert not archives.is_archive(str(tmp_path))
@@ -0,0 +1,298 @@
+# Artifact readers: gfastats reports, compressed artifacts, Nx curves, metrics from FASTA files
+
+import bz2
+import gzip
+import json
+import lzma
+import os
+import random
+from array import array
+
+import pytest
+
+from ear import artifacts
+from ear.artifacts import (GfastatsKeyError, GfastatsReport, busco_mode, load_busco, load_gfastats, nx_curve, open_artifact, parse_busco_json,
+                           parse_busco_text, parse_fasta, parse_fasta_index, read_artifact, scan_gfastats, strip_compression)
+
+
+GFASTATS_CLI = """+++Assembly summary+++: 
+# contigs: 12
+# scaffolds: 4
+Total scaffold length: 1,234,567
+Average scaffold length: 308641.75
+Scaffold N50: 600000
+Scaffold auN: 512345.67
+Contig N50: 150000
+# gaps in scaffolds: 8
+GC content %: 41.20
+"""
+
+# Galaxy writes tab-separated lines, and --nstar-report repeats the N* keys further down
+GFASTATS_GALAXY = """# contigs\t12
+# scaffolds\t4
+Total scaffold length\t1234567
+Scaffold N50\t600000
+Contig N50\t150000
+# gaps in scaffolds\t8
+Scaffold N10\t900000
+Scaffold N50\t1
+"""
+
+
+@pytest.mark.parametrize("content", [GFASTATS_CLI, GFASTATS_GALAXY])
+def test_scan_gfastats(content):
+    values = scan_gfastats(content)
+    assert {key: values[key] for key in ("# scaffolds", "Scaffold N50", "Contig N50", "# gaps in scaffolds")} == {
+        "# scaffolds": "4", "Scaffold N50": "600000", "Contig N50": "150000", "# gaps in scaffolds": "8"}
+    assert "Missing key" not in values
+
+
+def test_scan_gfastats_keys():
+    values = scan_gfastats("+++Assembly summary+++: \n  Number of # contigs: 3\n# contigs: 12\nBase composition (A:C:G:T): 1:2:3:4\n")
+    # whole keys, up to the first ": "
+    assert values == {"+++Assembly summary+++": "", "Number of # contigs": "3", "# contigs": "12", "Base composition (A:C:G:T)": "1:2:3:4"}
+
+
+def report(content):
+    return GfastatsReport("asm.gfastats", scan_gfastats(content))
+
+
+def test_report_values():
+    gfastats = report(GFASTATS_CLI)
+    assert gfastats["Total scaffold length"] == "1,234,567"
+    assert gfastats.int("Total scaffold length") == 1234567
+    assert gfastats.float("GC content %") == 41.2
+    assert gfastats.extract(["Contig N50", "# contigs"]) == ["150000", "12"]
+    assert "Scaffold auN" in gfastats
+    assert "Contig auN" not in gfastats
+    assert gfastats.extract(["Contig auN"], "NA") == ["NA"]
+
+
+def test_report_missing_keys():
+    with pytest.raises(GfastatsKeyError) as error:
+        report(GFASTATS_CLI).extract(["Scaffold N50", "Contig auN", "Scaffold L50"])
+    assert error.value.missing == ["Contig auN", "Scaffold L50"]
+    assert "asm.gfastats has no 'Contig auN', 'Scaffold L50'" in str(error.value)
+
+
+def test_report_record(tmp_path):
+    path = tmp_path / "asm.gfastats"
+    path.write_text(GFASTATS_CLI)
+    record = load_gfastats(str(path)).to_record()
+    # every value, the restored report does not read the file again
+    path.unlink()
+    restored = GfastatsReport.from_record(str(path), record)
+    assert restored.extract(["Scaffold N50", "Contig N50", "GC content %"]) == ["600000", "150000", "41.20"]
+
+
+def test_load_gfastats(tmp_path):
+    path = tmp_path / "asm.gfastats"
+    path.write_text(GFASTATS_GALAXY)
+    report = load_gfastats(str(path))
+    assert report is load_gfastats(str(path))
+    assert report["Scaffold N50"] == "600000"
+
+
+# Compressed artifacts are recognised by their magic number, whatever their name
+
+def compress(kind, content):
+    if kind == "gzip":
+        return gzip.compress(content)
+    if kind == "bzip2":
+        return bz2.compress(content)
+    if kind == "xz":
+        return lzma.compress(content)
+    return pytest.importorskip("zstandard").ZstdCompressor().compress(content)
+
+
+@pytest.mark.parametrize("kind", ["gzip", "bzip2", "xz", "zstd"])
+@pytest.mark.parametrize("name", ["asm.gfastats.gz", "asm.gfastats"])
+def test_open_compressed(tmp_path, kind, name):
+    path = tmp_path / name
+    path.write_bytes(compress(kind, GFASTATS_CLI.encode()))
+    with open_artifact(str(path)) as file:
+        assert file.read() == GFASTATS_CLI
+    assert load_gfastats(str(path))["Scaffold N50"] == "600000"
+
+
+def test_open_plain(tmp_path):
+    path = tmp_path / "asm.gfastats.gz"
+    path.write_text(GFASTATS_CLI)
+    assert read_artifact(str(path)) == GFASTATS_CLI
+
+
+def test_zstd_unavailable(tmp_path, monkeypatch):
+    monkeypatch.setattr(artifacts, "zstandard", None)
+    path = tmp_path / "asm.gfastats.zst"
+    path.write_bytes(b"\x28\xb5\x2f\xfd" + b"\x00" * 16)
+    with pytest.raises(ImportError, match="needs the zstandard package"):
+        open_artifact(str(path))
+
+
+def test_strip_compression():
+    assert strip_compression("out.qv.gz") == "out.qv"
+    assert strip_compression("out.completeness.stats.zst") == "out.completeness.stats"
+    assert strip_compression("out.qv") == "out.qv"
+
+
+# Nx curves: numpy and the pure Python fallback give the same curve
+
+def nx_both(monkeypatch, file_path, lengths):
+    pytest.importorskip("numpy")
+    with_numpy = nx_curve(file_path, array("q", lengths))
+    with monkeypatch.context() as patch:
+        patch.setattr(artifacts, "numpy", None)
+        pure = nx_curve(file_path, array("q", lengths))
+    return with_numpy, pure
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_nx_curve_numpy(monkeypatch, seed):
+    rng = random.Random(seed)
+    # chromosome-scale scaffolds, a tail of small ones, and repeated lengths
+    lengths = [rng.randrange(10**7, 2 * 10**8) for i in range(rng.randrange(1, 40))]
+    lengths += [rng.randrange(1000, 10**6) for i in range(rng.randrange(0, 2000))]
+    lengths += lengths[:10]
+    with_numpy, pure = nx_both(monkeypatch, "asm.fai", lengths)
+    for field in ("count", "total", "nx", "lx"):
+        assert getattr(with_numpy, field) == getattr(pure, field)
+        assert all(type(value) is int for value in with_numpy.nx + with_numpy.lx)
+    assert with_numpy.aun == pytest.approx(pure.aun, rel=1e-12)
+
+
+def test_nx_curve_values(monkeypatch):
+    # total 100: N50 is the 30, reached at 40 + 30 = 70 >= 50, and N71 the 20
+    for curve in nx_both(monkeypatch, "asm.fai", [10, 30, 40, 20]):
+        assert (curve.count, curve.total) == (4, 100)
+        assert curve.nx[40 - 1] == 40 and curve.lx[40 - 1] == 1
+        assert curve.nx[50 - 1] == 30 and curve.lx[50 - 1] == 2
+        assert curve.nx[70 - 1] == 30 and curve.nx[71 - 1] == 20
+        assert curve.nx[100 - 1] == 10 and curve.lx[100 - 1] == 4
+        assert curve.aun == 30.0
+
+
+def test_fasta_index(tmp_path, monkeypatch):
+    path = tmp_path / "asm.fa.fai"
+    path.write_text("scaffold_1\t40\t12\t60\t61\nscaffold_2\t30\t66\t60\t61\nscaffold_3\t10\t110\t60\t61\n")
+    with open(path) as file:
+        curve = parse_fasta_index(file, str(path))
+    assert (curve.count, curve.total, curve.nx[50 - 1], curve.nx[51 - 1]) == (3, 80, 40, 30)
+    with pytest.raises(ValueError, match="No sequence lengths"):
+        nx_curve(str(path), array("q"))
+
+
+# gfastats metrics from a FASTA file. tests/data/asm.gfastats is the report of tests/data/asm.fa
+# in the layout of gfastats --nstar-report, with the values worked out by hand from the sequences
+# (regenerate it with: gfastats tests/data/asm.fa --nstar-report > tests/data/asm.gfastats)
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+FASTA_KEYS = [
+    "# contigs", "Total contig length", "Average contig length", "Contig N50", "Contig auN", "Contig L50", "Contig N90", "Contig L90",
+    "Largest contig", "Smallest contig", "# scaffolds", "Total scaffold length", "Average scaffold length", "Scaffold N50",
+    "Scaffold auN", "Scaffold L50", "Scaffold N90", "Scaffold L90", "Largest scaffold", "Smallest scaffold",
+    "# gaps in scaffolds", "Total gap length in scaffolds", "Average gap length in scaffolds", "GC content %",
+]
+
+
+def fasta_report(path):
+    with open_artifact(path) as file:
+        return parse_fasta(file, path)
+
+
+def assert_same_metrics(report, expected):
+    metrics = report.extract(FASTA_KEYS)
+    assert dict(zip(FASTA_KEYS, metrics)) == dict(zip(FASTA_KEYS, expected.extract(FASTA_KEYS)))
+
+
+@pytest.fixture
+def gfastats_report():
+    path = os.path.join(DATA, "asm.gfastats")
+    with open(path) as file:
+        return GfastatsReport(path, scan_gfastats(file.read()))
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+@pytest.mark.parametrize("chunk_size", [1 << 24, 7])
+def test_fasta_metrics(monkeypatch, gfastats_report, use_numpy, chunk_size):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(artifacts, "numpy", None)
+    # small chunks carry scaffolds, contigs and gaps over to the next chunk
+    monkeypatch.setattr(artifacts, "FASTA_CHUNK_SIZE", chunk_size)
+    report = fasta_report(os.path.join(DATA, "asm.fa"))
+    assert_same_metrics(report, gfastats_report)
+    # and the Nx curves those of --nstar-report
+    for sequences, prefix in (("Scaffolds", "Scaffold"), ("Contigs", "Contig")):
+        curve = report.curves[sequences]
+        assert [curve.n(x) for x in range(10, 101, 10)] == [gfastats_report.int(f"{prefix} N{x}") for x in range(10, 101, 10)]
+        assert [curve.l(x) for x in range(10, 101, 10)] == [gfastats_report.int(f"{prefix} L{x}") for x in range(10, 101, 10)]
+
+
+def test_fasta_compressed_crlf(tmp_path, gfastats_report):
+    with open(os.path.join(DATA, "asm.fa"), "rb") as file:
+        content = file.read().replace(b"\n", b"\r\n")
+    path = tmp_path / "asm.fa.gz"
+    path.write_bytes(gzip.compress(content))
+    assert_same_metrics(fasta_report(str(path)), gfastats_report)
+
+
+def test_load_fasta(gfastats_report):
+    # load_gfastats tells a FASTA from a report by its first character
+    report = load_gfastats(os.path.join(DATA, "asm.fa"))
+    assert_same_metrics(report, gfastats_report)
+    assert load_gfastats(os.path.join(DATA, "asm.gfastats"))["Scaffold N50"] == "95"
+
+
+BUSCO_TEXT = """# BUSCO version is: 5.4.3 
+# The lineage dataset is: mammalia_odb10 (Creation date: 2021-02-19, number of genomes: 24, number of BUSCOs: 9226)
+# Summarized benchmarking in BUSCO notation for file assembly.fa
+# BUSCO was run in mode: euk_genome_met
+# Gene predictor used: metaeuk
+
+\t***** Results: *****
+
+\tC:95.1%[S:93.6%,D:1.5%],F:0.7%,M:4.2%,n:9226\t   
+\t8774\tComplete BUSCOs (C)\t\t\t   
+\t9226\tTotal BUSCO groups searched\t\t   
+"""
+
+
+# short_summary.*.json of the same run, with the mode as asked for or as the text names it
+def busco_json(mode, one_line_summary=True):
+    results = {"Complete percentage": 95.1, "Single copy percentage": 93.6, "Multi copy percentage": 1.5,
+               "Fragmented percentage": 0.7, "Missing percentage": 4.2, "n_markers": 9226}
+    if one_line_summary:
+        results["one_line_summary"] = "C:95.1%[S:93.6%,D:1.5%],F:0.7%,M:4.2%,n:9226"
+    return json.dumps({
+        "parameters": {"mode": mode, "domain": "eukaryota", "lineage_dataset": "/busco_downloads/lineages/mammalia_odb10"},
+        "lineage_dataset": {"name": "mammalia_odb10", "creation_date": "2021-02-19", "number_of_buscos": "9226", "number_of_species": "24"},
+        "versions": {"hmmsearch": 3.1, "bbtools": "39.01", "metaeuk": "6.a5d39d9", "busco": "5.4.3"},
+        "results": results,
+    })
+
+
+@pytest.mark.parametrize("mode, one_line_summary", [("genome", True), ("euk_genome_met", True), ("genome", False)])
+def test_busco_text_and_json(tmp_path, mode, one_line_summary):
+    text_path = tmp_path / "short_summary.specific.mammalia_odb10.asm.txt"
+    text_path.write_text(BUSCO_TEXT)
+    json_path = tmp_path / "short_summary.specific.mammalia_odb10.asm.json"
+    json_path.write_text(busco_json(mode, one_line_summary))
+    with open_artifact(str(text_path)) as file:
+        text = parse_busco_text(file, str(text_path))
+    with open_artifact(str(json_path)) as file:
+        from_json = parse_busco_json(file, str(json_path))
+    assert text.to_record() == from_json.to_record()
+    assert text.mode == "euk_genome_met" and text.scores() == ("93.6%", "1.5%", "0.7%", "4.2%")
+    # the JSON summary next to the text one is preferred
+    assert load_busco(str(text_path)).path == str(json_path)
+
+
+def test_busco_mode():
+    assert busco_mode("genome", "metaeuk") == "euk_genome_met"
+    assert busco_mode("genome", "augustus", "eukaryota") == "euk_genome_aug"
+    assert busco_mode("genome", "prodigal") == "prok_genome_prod"
+    assert busco_mode("transcriptome", None, "prokaryota") == "prok_tran"
+    assert busco_mode("prot", None) == "proteins"
+    assert busco_mode("euk_genome_min", "miniprot") == "euk_genome_min"
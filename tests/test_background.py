@@ -0,0 +1,52 @@
+# The taxonomy looked up in a background thread while the artifacts are parsed
+
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from conftest import REPO
+from ear.report import fetch_taxonomy_background
+
+
+class FailingTaxonomy:
+    def __init__(self):
+        self.release = threading.Event()
+
+    def resolve(self, species):
+        self.release.wait(10)
+        raise LookupError(f"no taxon for {species}")
+
+
+def test_error_raised_when_joined():
+    provider = FailingTaxonomy()
+    # the lookup failing does not stop the report before it needs the taxonomy
+    future = fetch_taxonomy_background({'species': "Elephas maximus"}, provider)
+    assert not future.done()
+    provider.release.set()
+    with pytest.raises(LookupError, match="Elephas maximus"):
+        future.result(10)
+
+
+# A report stopping before it joins the lookup exits without waiting for it
+EXIT_EARLY = """
+import sys, time
+sys.path.insert(0, sys.argv[1])
+from ear.report import fetch_taxonomy_background
+
+class SlowTaxonomy:
+    def resolve(self, species):
+        time.sleep(60)
+
+fetch_taxonomy_background({'species': "Elephas maximus"}, SlowTaxonomy())
+sys.exit("parsing failed")
+"""
+
+
+def test_exit_not_blocked():
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", EXIT_EARLY, REPO], capture_output=True, text=True, timeout=30)
+    assert result.returncode == 1 and "parsing failed" in result.stderr
+    assert time.perf_counter() - start < 20
@@ -0,0 +1,47 @@
+# Batch mode: reports rendered by a process pool, each with its own status, a failing report not
+# stopping the others
+
+import os
+
+import yaml
+
+
+def broken_copy(yaml_file, tol_id):
+    # same inputs, but a gfastats report that is not there
+    with open(yaml_file) as file:
+        data = yaml.safe_load(file)
+    data['ToLID'] = tol_id
+    data['ASSEMBLIES']['Curated']['hap1']['gfastats--nstar-report_txt'] += ".missing"
+    path = os.path.join(os.path.dirname(yaml_file), f"{tol_id}.yaml")
+    with open(path, "w") as file:
+        yaml.safe_dump(data, file, sort_keys=False)
+    return path
+
+
+def test_batch_failure_isolated(tmp_path, ear_fixture, run_make_ear):
+    good = ear_fixture("mBenTes1")
+    broken = broken_copy(ear_fixture("mBenTes2"), "mBenTes2")
+    output_dir = tmp_path / "reports"
+    result = run_make_ear(tmp_path, good, broken, "-j", "2", "-o", str(output_dir), "--no-image-optimisation")
+
+    assert result.returncode == 1, result.stderr
+    assert sorted(os.listdir(output_dir)) == ["mBenTes1_EAR.manifest.json", "mBenTes1_EAR.pdf", "mBenTes1_EAR.yaml"]
+    lines = result.stdout.splitlines()
+    # the summary, in the order the files were given
+    assert lines[0].startswith("OK") and lines[0].endswith(f"{good} -> {output_dir / 'mBenTes1_EAR.pdf'}")
+    failed = [line for line in lines if line.startswith("FAILED")]
+    assert len(failed) == 1 and broken in failed[0]
+    assert "1 of 2 reports created" in result.stdout
+
+
+def test_batch_all_ok(tmp_path, ear_fixture, run_make_ear):
+    yaml_files = [ear_fixture("mBenTes1"), ear_fixture("mBenTes2")]
+    output_dir = tmp_path / "reports"
+    result = run_make_ear(tmp_path, *yaml_files, "-j", "2", "-o", str(output_dir), "--no-image-optimisation")
+    assert result.returncode == 0, result.stderr
+    assert {"mBenTes1_EAR.pdf", "mBenTes2_EAR.pdf"} <= set(os.listdir(output_dir))
+    assert "2 of 2 reports created" in result.stdout
+    # a second run keeps them
+    result = run_make_ear(tmp_path, *yaml_files, "-j", "2", "-o", str(output_dir), "--no-image-optimisation")
+    assert result.returncode == 0
+    assert [line.split()[0] for line in result.stdout.splitlines() if line.startswith(("OK", "KEPT"))] == ["KEPT", "KEPT"]
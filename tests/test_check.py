@@ -0,0 +1,57 @@
+# --check: the warnings of the report, without rendering it
+
+import json
+import os
+import subprocess
+import sys
+
+from conftest import REPO
+
+
+# make_EAR.py --check, telling on stderr whether reportlab was imported
+CHECK = """
+import os, runpy, sys
+sys.argv = sys.argv[1:]
+sys.path.insert(0, os.path.dirname(sys.argv[0]))
+try:
+    runpy.run_path(sys.argv[0], run_name='__main__')
+finally:
+    sys.stderr.write('reportlab imported: %s\\n' % any(name.split('.')[0] == 'reportlab' for name in sys.modules))
+"""
+
+
+# A curated assembly below the QV threshold, for the checks to warn about
+def lower_qv(yaml_file):
+    path = os.path.join(os.path.dirname(yaml_file), "curated", "merqury", "out.qv")
+    with open(path) as file:
+        rows = [line.split("\t") for line in file]
+    rows[0][3] = "35.0000"
+    with open(path, "w") as file:
+        file.write("".join("\t".join(row) for row in rows))
+
+
+def test_check_warnings(tmp_path, ear_fixture, run_make_ear, taxdump_index, goat_snapshot):
+    yaml_file = ear_fixture("mBenTes1")
+    lower_qv(yaml_file)
+
+    check_dir = tmp_path / "check"
+    check_dir.mkdir()
+    command = [sys.executable, "-c", CHECK, os.path.join(REPO, "make_EAR.py"), yaml_file, "--check", "json",
+               "--taxdump-index", taxdump_index, "--goat-snapshot", goat_snapshot]
+    env = dict(os.environ, XDG_CACHE_HOME=str(tmp_path / "cache"))
+    result = subprocess.run(command, cwd=str(check_dir), env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert "reportlab imported: False" in result.stderr
+    [checked] = json.loads(result.stdout)
+    assert checked['ok'] and checked['tol_id'] == "mBenTes1"
+    # nothing written but the log
+    assert os.listdir(str(check_dir)) == ["EAR.log"]
+
+    render_dir = tmp_path / "render"
+    render_dir.mkdir()
+    result = run_make_ear(render_dir, yaml_file, "--no-image-optimisation")
+    assert result.returncode == 0, result.stderr
+    with open(render_dir / "mBenTes1_EAR.manifest.json") as file:
+        warnings = json.load(file)['warnings']
+    assert any("QV" in warning for warning in warnings)
+    assert checked['traits'] + checked['curated'] == [warning.lstrip('. ') for warning in warnings]
@@ -0,0 +1,50 @@
+# Report data formats: the EAR.json embedded in the PDF, and what reading it back imports
+
+import json
+import os
+import subprocess
+import sys
+from collections import OrderedDict
+
+import pytest
+
+from ear.eardata import EAR_DATA_SCHEMA, decode_ear_data, encode_ear_data, save_to_yaml
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DATA = OrderedDict([
+    ("ERGA Assembly Report", "v24.09.10"),
+    ("Tags", "ERGA-BGE"),
+    ("Species", "Elephas maximus"),
+    ("Genome Traits", OrderedDict([("Expected", OrderedDict([("Haploid size (bp)", "3,300,000,000"), ("Ploidy", 2)]))])),
+    ("Curator notes", OrderedDict([("Interventions/Gb", 12), ("Other observations", '"Café, ±1"')])),
+])
+
+
+def test_round_trip():
+    decoded = decode_ear_data(encode_ear_data(DATA))
+    assert decoded == DATA
+    assert list(decoded) == list(DATA)
+    assert list(decoded["Genome Traits"]["Expected"]) == ["Haploid size (bp)", "Ploidy"]
+
+
+def test_other_schema():
+    content = json.dumps({'schema': EAR_DATA_SCHEMA + 1, 'data': {}}).encode()
+    assert decode_ear_data(content) is None
+
+
+def test_save_to_yaml(tmp_path):
+    path = tmp_path / "EAR.yaml"
+    save_to_yaml(DATA, str(path))
+    lines = path.read_text(encoding="utf-8").split("\n")
+    # a blank line after the Tags, and before the Curator notes section
+    assert lines[:4] == ["ERGA Assembly Report: v24.09.10", "Tags: ERGA-BGE", "", "Species: Elephas maximus"]
+    assert lines[lines.index("Curator notes:") - 1] == ""
+
+
+def test_pdf_to_yaml_imports():
+    pytest.importorskip("pdfplumber")
+    code = "import sys, EARpdf_to_yaml; print(' '.join(sorted(set(sys.modules) & {'numpy', 'requests', 'reportlab', 'ear.report', 'ear.rules'})))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=REPO, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ""
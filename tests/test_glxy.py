@@ -0,0 +1,40 @@
+# The Galaxy wrapper runs from a tool folder holding it, make_EAR.py and ear/, outside the repository
+
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("reportlab")
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_wrapper(tool_dir, *args):
+    env = dict(os.environ)
+    env.pop("PYTHONPATH", None)
+    return subprocess.run([sys.executable, os.path.join(tool_dir, "make_EAR_glxy.py"), *args],
+                          cwd=tool_dir, env=env, capture_output=True, text=True)
+
+
+def test_tool_folder(tmp_path):
+    tool_dir = str(tmp_path / "tool")
+    os.mkdir(tool_dir)
+    shutil.copy(os.path.join(REPO, "glxy", "make_EAR_glxy.py"), tool_dir)
+    shutil.copy(os.path.join(REPO, "make_EAR.py"), tool_dir)
+    shutil.copytree(os.path.join(REPO, "ear"), os.path.join(tool_dir, "ear"), ignore=shutil.ignore_patterns("__pycache__"))
+    result = run_wrapper(tool_dir, "--help")
+    assert result.returncode == 0, result.stderr
+    assert "usage:" in result.stdout
+    assert os.path.isfile(os.path.join(tool_dir, "ear", "ebp_standards.yaml"))
+
+
+def test_engine_missing(tmp_path):
+    tool_dir = str(tmp_path / "tool")
+    os.mkdir(tool_dir)
+    shutil.copy(os.path.join(REPO, "glxy", "make_EAR_glxy.py"), tool_dir)
+    result = run_wrapper(tool_dir, "--help")
+    assert result.returncode != 0
+    assert "make_EAR.py and the ear/ folder must be installed next to make_EAR_glxy.py" in result.stderr
@@ -0,0 +1,94 @@
+# GoaT client against the local stub of bench/goat_stub.py: record batches, retries and fallbacks
+
+import logging
+import threading
+
+import pytest
+
+pytest.importorskip("requests")
+
+from bench.goat_stub import serve
+from ear.taxonomy import RECORD_BATCH, GoatClient, GoatTaxonomy
+
+
+SPECIES = {
+    f"Testus species{i}": {"taxon_id": str(1000 + i), "class": "Testclass", "order": "Testorder", "ploidy": 2, "haploid_number": i}
+    for i in range(120)
+}
+
+
+@pytest.fixture
+def goat():
+    servers = []
+
+    def start(**options):
+        server = serve(0, SPECIES, **options)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server.stub, f"http://127.0.0.1:{server.server_address[1]}/api/v2"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def taxon_ids(count):
+    return [str(1000 + i) for i in range(count)]
+
+
+def test_records_batched(goat):
+    stub, url = goat()
+    records = GoatClient(url, retries=0).records(taxon_ids(120))
+    # 50 + 50 + 20 TxIDs
+    assert stub.requests == -(-120 // RECORD_BATCH) == 3
+    assert len(records) == 120
+    assert records["1007"] == {"ploidy": 2, "ploidy_source": "direct", "haploid_number": 7, "haploid_source": "direct"}
+
+
+def test_records_single_request_fallback(goat, caplog):
+    stub, url = goat(single_record=True)
+    with caplog.at_level(logging.WARNING):
+        records = GoatClient(url, retries=0).records(taxon_ids(3))
+    assert "one at a time" in caplog.text
+    # the rejected batch, then one request per TxID
+    assert stub.requests == 4
+    assert sorted(records) == ["1000", "1001", "1002"]
+
+
+def test_records_unknown_left_out(goat):
+    stub, url = goat()
+    records = GoatClient(url, retries=0).records(["1000", "999"])
+    assert sorted(records) == ["1000"]
+
+
+def test_retry_after_503(goat):
+    stub, url = goat(fail=2)
+    records = GoatClient(url, retries=3, backoff=0).records(taxon_ids(2))
+    assert stub.requests == 3
+    assert sorted(records) == ["1000", "1001"]
+
+
+def test_retries_exhausted(goat, caplog):
+    stub, url = goat(fail=100)
+    taxonomy = GoatTaxonomy(None, client=GoatClient(url, retries=2, backoff=0))
+    # the species are left out of the batch (and logged) instead of failing it
+    with caplog.at_level(logging.WARNING):
+        assert taxonomy.resolve_many(["Testus species1", "Testus species2"]) == {}
+    assert "Could not resolve the taxonomy of Testus species1" in caplog.text
+    # one request and two retries per species
+    assert stub.requests == 6
+
+
+def test_records_exhausted_then_resolved(goat, tmp_path):
+    stub, url = goat()
+    taxonomy = GoatTaxonomy(str(tmp_path / "goat.jsonl"), client=GoatClient(url, retries=1, backoff=0))
+    # the searches are cached, the record request and its retry fail
+    for species in ("Testus species1", "Testus species2"):
+        taxonomy.cached(f"search:{species.lower()}", lambda: taxonomy.client.search(species))
+    stub.fail = 2
+    assert taxonomy.resolve_many(["Testus species1", "Testus species2"]) == {}
+    # nothing is remembered of the failure, the next batch asks again
+    resolved = taxonomy.resolve_many(["Testus species1", "Testus species2"])
+    assert resolved["Testus species2"]["haploid_number"] == 2
+    assert resolved["Testus species2"]["taxon_id"] == "1002"
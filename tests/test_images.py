@@ -0,0 +1,65 @@
+# Image optimisation: the PDF of the optimised images is smaller than the PDF of the originals, and
+# an image that would not get smaller is embedded as it is
+
+import os
+import random
+
+import pytest
+
+PILImage = pytest.importorskip("PIL.Image")
+pytest.importorskip("reportlab")
+
+from reportlab.platypus import SimpleDocTemplate
+
+from bench.make_fixtures import write_png
+from ear.images import ImageOptimiser
+from ear.pdf import embed_image
+
+
+# A HiC-like map (rows repeating the same profile, which deflates very well) and a noisy plot
+@pytest.fixture
+def images(tmp_path):
+    hic_map = str(tmp_path / "FullMap.png")
+    write_png(hic_map, 2000, 2000)
+    rng = random.Random(1)
+    plot = PILImage.new("RGB", (1500, 1250), (255, 255, 255))
+    pixels = plot.load()
+    for x in range(plot.width):
+        base = int(600 + 400 * ((x / plot.width) - 0.5) ** 2 * 4)
+        for y in range(base, plot.height):
+            pixels[x, y] = (30 + rng.randrange(40), 90 + rng.randrange(40), 200)
+    blobplot = str(tmp_path / "blobplot.png")
+    plot.save(blobplot)
+    return [hic_map, blobplot]
+
+
+def pdf_size(path, image_optimiser, images):
+    SimpleDocTemplate(path).build([embed_image(image_optimiser, png_file, 8, 8) for png_file in images])
+    return os.path.getsize(path)
+
+
+@pytest.mark.parametrize("image_format", ["jpeg", "png"])
+def test_pdf_not_larger(tmp_path, images, image_format):
+    cache_dir = str(tmp_path / "cache")
+    original = pdf_size(str(tmp_path / "original.pdf"), ImageOptimiser(enabled=False), images)
+    optimised = pdf_size(str(tmp_path / "optimised.pdf"), ImageOptimiser(image_format=image_format, cache_dir=cache_dir), images)
+    assert optimised <= original
+
+
+def test_default_pdf_smaller(tmp_path, images):
+    original = pdf_size(str(tmp_path / "original.pdf"), ImageOptimiser(enabled=False), images)
+    optimised = pdf_size(str(tmp_path / "optimised.pdf"), ImageOptimiser(cache_dir=str(tmp_path / "cache")), images)
+    assert optimised < 0.8 * original
+
+
+def test_original_kept(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    # smaller than its drawn size and flat, recompressing it gains nothing in the PDF
+    png_file = str(tmp_path / "flat.png")
+    PILImage.new("RGB", (200, 100), (40, 120, 200)).save(png_file)
+    optimiser = ImageOptimiser(image_format="png", cache_dir=cache_dir)
+    assert optimiser.prepare(png_file, 8, 4) == png_file
+    assert [name.endswith(".original") for name in os.listdir(cache_dir)] == [True]
+    # and the decision is cached
+    assert optimiser.prepare(png_file, 8, 4) == png_file
+    assert len(os.listdir(cache_dir)) == 1
@@ -0,0 +1,153 @@
+# Build manifest: when a report is kept, and what makes make_report rebuild it
+
+import json
+import os
+
+import pytest
+
+from ear.manifest import MANIFEST_VERSION, BuildManifest
+
+
+OPTIONS = {'ear_version': 'v24.09.10', 'images': None}
+
+
+@pytest.fixture
+def built(tmp_path):
+    inputs = []
+    for name, content in (("EAR.yaml", "tol_id: xTes1\n"), ("asm.gfastats", "# scaffolds: 4\n")):
+        inputs.append(str(tmp_path / name))
+        with open(inputs[-1], "w") as file:
+            file.write(content)
+    pdf = str(tmp_path / "xTes1_EAR.pdf")
+    with open(pdf, "wb") as file:
+        file.write(b"%PDF-1.4\n")
+    path = str(tmp_path / "xTes1_EAR.manifest.json")
+    BuildManifest(path).write(inputs, [pdf], OPTIONS, ["a warning"])
+    return path, inputs, pdf
+
+
+def test_up_to_date(built):
+    path, inputs, pdf = built
+    manifest = BuildManifest(path)
+    assert manifest.up_to_date(dict(OPTIONS))
+    assert manifest.warnings == ["a warning"]
+
+
+def test_no_manifest(tmp_path):
+    assert not BuildManifest(str(tmp_path / "missing.manifest.json")).up_to_date(OPTIONS)
+
+
+def test_other_manifest_version(built):
+    path, inputs, pdf = built
+    with open(path) as file:
+        data = json.load(file)
+    data['manifest_version'] = MANIFEST_VERSION - 1
+    with open(path, "w") as file:
+        json.dump(data, file)
+    assert not BuildManifest(path).up_to_date(OPTIONS)
+
+
+def test_options_changed(built):
+    path, inputs, pdf = built
+    assert not BuildManifest(path).up_to_date(dict(OPTIONS, images=[True, 200, 'jpeg', 85]))
+
+
+def test_input_changed(built):
+    path, inputs, pdf = built
+    with open(inputs[1], "w") as file:
+        file.write("# scaffolds: 5\n")
+    manifest = BuildManifest(path)
+    assert not manifest.up_to_date(OPTIONS)
+    assert manifest.changed_inputs() == [inputs[1]]
+
+
+def test_input_removed(built):
+    path, inputs, pdf = built
+    os.remove(inputs[1])
+    assert not BuildManifest(path).up_to_date(OPTIONS)
+
+
+def test_input_touched(built):
+    path, inputs, pdf = built
+    stat = os.stat(inputs[1])
+    os.utime(inputs[1], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert BuildManifest(path).up_to_date(OPTIONS)
+    # the new mtime is recorded, the next check does not hash the file again
+    with open(path) as file:
+        assert json.load(file)['inputs'][inputs[1]]['mtime_ns'] == stat.st_mtime_ns + 10**9
+
+
+def test_output_modified(built):
+    path, inputs, pdf = built
+    with open(pdf, "ab") as file:
+        file.write(b"%%EOF\n")
+    assert not BuildManifest(path).up_to_date(OPTIONS)
+
+
+def test_output_removed(built):
+    path, inputs, pdf = built
+    os.remove(pdf)
+    assert not BuildManifest(path).up_to_date(OPTIONS)
+
+
+# make_report: the taxonomy source is one of the options, and a refreshed taxonomy rebuilds
+
+class FixedTaxonomy:
+    def __init__(self, source, refresh=False):
+        self.refresh = refresh
+        self.digest = source
+
+    def source(self):
+        return ['fixed', self.digest]
+
+    def resolve(self, species):
+        return {'taxon_id': '99487', 'class': 'Mammalia', 'order': 'Proboscidea', 'ploidy': '2', 'ploidy_source': 'direct', 'haploid_number': '28', 'haploid_source': 'direct'}
+
+
+@pytest.fixture
+def report(tmp_path):
+    pytest.importorskip("reportlab")
+    from bench.make_fixtures import make_fixture
+    from ear.images import ImageOptimiser
+    import make_EAR
+
+    yaml_file = make_fixture(str(tmp_path / "inputs"), image_size=64, scaffolds=20, contigs=60)
+    output_dir = str(tmp_path / "out")
+    os.mkdir(output_dir)
+
+    def build(taxonomy_provider):
+        return make_EAR.make_report(yaml_file, output_dir, taxonomy_provider=taxonomy_provider, image_optimiser=ImageOptimiser(enabled=False), io_threads=1)
+
+    cwd = os.getcwd()
+    # EAR.log is written in the working directory
+    os.chdir(tmp_path)
+    yield build
+    os.chdir(cwd)
+
+
+def test_report_taxonomy_source(report):
+    assert report(FixedTaxonomy("a"))['rebuilt']
+    assert not report(FixedTaxonomy("a"))['rebuilt']
+    assert report(FixedTaxonomy("b"))['rebuilt']
+
+
+def test_report_refresh_taxonomy(report):
+    assert report(FixedTaxonomy("a"))['rebuilt']
+    assert report(FixedTaxonomy("a", refresh=True))['rebuilt']
+    assert not report(FixedTaxonomy("a"))['rebuilt']
+
+
+def test_taxonomy_sources(tmp_path):
+    from ear.taxdump import TaxdumpTaxonomy
+    from ear.taxonomy import GoatClient, GoatTaxonomy
+
+    assert GoatTaxonomy(None, client=GoatClient("http://127.0.0.1:8089/api/v2/")).source() == ['goat', "http://127.0.0.1:8089/api/v2"]
+    index = tmp_path / "taxdump.idx"
+    snapshot = tmp_path / "snapshot.tsv"
+    index.write_bytes(b"EARTAXv1")
+    snapshot.write_text("taxon_id\tploidy\thaploid_number\n99487\t2\t28\n")
+    source = TaxdumpTaxonomy(str(index), str(snapshot)).source()
+    assert source[0] == 'taxdump' and len(source) == 3
+    assert TaxdumpTaxonomy(str(index)).source() == source[:2] + [None]
+    snapshot.write_text("taxon_id\tploidy\thaploid_number\n99487\t2\t29\n")
+    assert TaxdumpTaxonomy(str(index), str(snapshot)).source() != source
@@ -0,0 +1,122 @@
+# merqury results: the folder index and the QV and k-mer completeness of each assembly
+
+import gzip
+import json
+import os
+
+import pytest
+
+from ear import archives
+from ear.artifacts import MERQURY_ROWS, MerquryTable, completeness_from_table, load_merqury, load_merqury_table, qv_from_table
+from ear.manifest import BuildManifest
+
+
+QV_TABLE = "asm1\t41000\t1980000001\t55.1234\t3.07e-06\nasm2\t52000\t1980000002\t54.2345\t3.77e-06\nBoth\t93000\t3960000003\t54.6543\t3.42e-06\n"
+COMPLETENESS_TABLE = "asm1\tall\t955000000\t1000000000\t95.5000\nasm2\tall\t945000000\t1000000000\t94.5000\nboth\tall\t990000000\t1000000000\t99.0000\n"
+
+
+def write(path, content, compressed=False):
+    with (gzip.open(path, "wt") if compressed else open(path, "w")) as file:
+        file.write(content)
+
+
+@pytest.fixture(params=[False, True], ids=["plain", "gzip"])
+def merqury_folder(request, tmp_path):
+    folder = tmp_path / "merqury"
+    folder.mkdir()
+    suffix = ".gz" if request.param else ""
+    # per-scaffold tables first, as some listings give them
+    write(folder / f"a.asm1.qv{suffix}", "scaffold_1\t1\t1000\t60.0\t1e-06\nscaffold_2\t2\t2000\t57.0\t2e-06\n", request.param)
+    write(folder / f"a.asm2.qv{suffix}", "".join(f"scaffold_{n}\t1\t1000\t60.0\t1e-06\n" for n in range(40)), request.param)
+    write(folder / f"out.qv{suffix}", QV_TABLE, request.param)
+    write(folder / f"out.completeness.stats{suffix}", COMPLETENESS_TABLE, request.param)
+    for name in ("out.spectra-cn.ln.png", "out.spectra-asm.ln.png", "out.asm1.spectra-cn.ln.png", "out.asm2.spectra-cn.ln.png",
+                 "out.spectra-cn.fl.png", "out.asm1.spectra-cn.st.png", ".hidden.ln.png"):
+        (folder / name).write_bytes(b"\x89PNG\r\n\x1a\n")
+    return str(folder)
+
+
+def test_one_listing(merqury_folder, monkeypatch):
+    listings = []
+    listdir = archives.listdir
+    monkeypatch.setattr(archives, "listdir", lambda path: listings.append(path) or listdir(path))
+    results = load_merqury(merqury_folder)
+    for order in range(3):
+        results.qv(order)
+        results.completeness(order)
+    assert load_merqury(merqury_folder) is results
+    assert listings == [merqury_folder]
+
+
+def test_values_per_haplotype(merqury_folder):
+    results = load_merqury(merqury_folder)
+    # the per-scaffold tables (of two and of forty scaffolds) are skipped
+    assert [results.qv(order) for order in range(3)] == ["55.1234", "54.2345", "54.6543"]
+    assert [results.completeness(order) for order in range(3)] == ["95.5000", "94.5000", "99.0000"]
+    assert results.qv(3) is None and results.completeness(3) is None
+
+
+def test_png_classification(merqury_folder):
+    results = load_merqury(merqury_folder)
+    names = sorted(os.path.basename(path) for path in results.png_files)
+    assert names == ["out.asm1.spectra-cn.ln.png", "out.asm2.spectra-cn.ln.png", "out.spectra-asm.ln.png", "out.spectra-cn.ln.png"]
+    assert [os.path.basename(path) for path in results.spectra_asm_files] == ["out.spectra-asm.ln.png"]
+    assert sorted(os.path.basename(path) for path in results.spectra_cn_files) == ["out.asm1.spectra-cn.ln.png", "out.asm2.spectra-cn.ln.png", "out.spectra-cn.ln.png"]
+    assert len(results.qv_files) == 3 and len(results.completeness_files) == 1
+
+
+def rows(content):
+    return [line.split("\t") for line in content.splitlines(True)]
+
+
+def test_both_row():
+    # diploid: a row per assembly and "Both"
+    assert qv_from_table(rows(QV_TABLE), 2) == "54.6543"
+    assert completeness_from_table(rows(COMPLETENESS_TABLE), 2) == "99.0000"
+    # haploid: the one assembly
+    assert qv_from_table(rows("asm\t10\t100\t48.5\t1e-05\n"), 0) == "48.5"
+    # a table of two rows is a per-scaffold one
+    assert qv_from_table(rows("scaffold_1\t1\t1000\t60.0\t1e-06\nscaffold_2\t2\t2000\t57.0\t2e-06\n"), 0) is None
+    assert qv_from_table(rows(QV_TABLE.replace("Both", "scaffold_3")), 0) is None
+
+
+def table_path(folder, prefix):
+    return os.path.join(folder, [name for name in os.listdir(folder) if name.startswith(prefix)][0])
+
+
+def test_load_table(merqury_folder):
+    table = load_merqury_table(table_path(merqury_folder, "out.qv"))
+    assert [table.qv(order) for order in range(3)] == ["55.1234", "54.2345", "54.6543"]
+    assert table.qv(3) is None
+
+
+# Only the values of the first rows are kept, not the rows of a per-scaffold table
+def test_table_values(merqury_folder):
+    table = load_merqury_table(table_path(merqury_folder, "a.asm2.qv"))
+    assert len(table.values) == MERQURY_ROWS
+    assert [table.qv(order) for order in range(3)] == [None, None, None]
+    record = json.loads(json.dumps(table.to_record()))
+    assert MerquryTable.from_record(table.path, record).values == table.values
+    # a row too short for the column
+    short = MerquryTable.from_rows("short", rows("asm1\tall\t955000000\n"))
+    assert (short.qv(0), short.completeness(0)) == (None, None)
+
+
+# The build manifest records the QV and completeness of each table, not its rows, also for the
+# per-scaffold tables read before the one with all the assemblies
+def test_manifest_records(tmp_path, merqury_folder):
+    results = load_merqury(merqury_folder)
+    tables = results.qv_files + results.completeness_files
+    for file_path in tables:
+        load_merqury_table(file_path)
+    path = tmp_path / "xTes1_EAR.manifest.json"
+    BuildManifest(str(path)).write([merqury_folder] + tables, [], {}, [])
+    records = json.loads(path.read_text())['records']['parse_merqury_table']
+    assert sorted(records) == sorted(archives.abspath(file_path) for file_path in tables)
+    for file_path, record in records.items():
+        assert len(record['values']) <= MERQURY_ROWS
+        assert all(len(value) == 2 for value in record['values'])
+        if "asm" in os.path.basename(file_path):
+            assert all(qv is None for qv, completeness in record['values'])
+    assert "scaffold_" not in path.read_text()
+    assert len(json.dumps(records)) < 300 * len(records)
@@ -0,0 +1,26 @@
+# Quality metrics table of the PDF: split in groups of up to MAX_TABLE_COLUMNS assemblies
+
+import pytest
+
+from ear.report import load_config, parse_artifacts
+
+
+# (haplotypes, assemblies in each table): a Pre-curation and a Curated column per haplotype
+@pytest.mark.parametrize("haplotypes, sizes", [(1, [2]), (4, [4, 4]), (5, [4, 4, 2]), (9, [4, 4, 4, 4, 2])])
+def test_column_chunks(ear_fixture, haplotypes, sizes):
+    from ear.pdf import MAX_TABLE_COLUMNS, column_chunks
+
+    table = parse_artifacts(load_config(ear_fixture(f"mBenTes{haplotypes}", haplotypes)))['asm_table_data']
+    assert len(table[0]) - 1 == 2 * haplotypes
+    chunks = column_chunks(table)
+    assert [len(chunk[0]) - 1 for chunk in chunks] == sizes
+    assert all(size <= MAX_TABLE_COLUMNS for size in sizes)
+    for chunk in chunks:
+        # every table has all the metrics, in their first column
+        assert [row[0] for row in chunk] == [row[0] for row in table]
+    # each assembly in one table, in the order of the full table
+    headers = [header for chunk in chunks for header in chunk[0][1:]]
+    assert headers == table[0][1:]
+    assert len(set(headers)) == len(headers)
+    for index, row in enumerate(table):
+        assert [value for chunk in chunks for value in chunk[index][1:]] == row[1:]
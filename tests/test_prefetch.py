@@ -0,0 +1,45 @@
+# Inputs of a report read at once on a thread pool: the same artifacts as read one after another
+
+import pytest
+
+from ear import artifacts
+from ear.artifacts import MerquryResults, artifact_cache
+from ear.report import load_config, parse_artifacts, prefetch_artifacts
+from ear.timings import StageTimings
+
+
+# The artifact cache in comparable terms: records, or the files of a merqury folder
+def cache_contents():
+    contents = {}
+    for key, value in artifact_cache.items():
+        if isinstance(value, MerquryResults):
+            value = (value.qv_files, value.completeness_files, value.png_files)
+        elif hasattr(value, 'to_record'):
+            value = value.to_record()
+        contents[key] = value
+    return contents
+
+
+def parse(config, io_threads, images):
+    artifact_cache.clear()
+    timings = StageTimings()
+    with timings.stage('parse artifacts'):
+        prefetch_artifacts(config, io_threads, images)
+        parse_artifacts(config)
+    [stage] = timings.stages
+    return cache_contents(), (stage['files'], stage['bytes'])
+
+
+@pytest.mark.parametrize("io_threads", [2, 8])
+def test_prefetch_same_as_serial(ear_fixture, io_threads):
+    config = load_config(ear_fixture("mBenTes1", haplotypes=2))
+    serial, serial_io = parse(config, 1, False)
+    assert serial
+    # each file read once, whatever the number of threads
+    assert parse(config, io_threads, False) == (serial, serial_io)
+    # with the images, only the PNG files the report shows are added
+    contents, io = parse(config, io_threads, True)
+    added = set(contents) - set(serial)
+    assert added and all(kind == 'bytes' and path.endswith('.png') for kind, path, mtime_ns, size in added)
+    assert {key: contents[key] for key in serial} == serial
+    artifact_cache.clear()
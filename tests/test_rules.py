@@ -0,0 +1,98 @@
+# EBP standards rules applied to the metrics of EARs
+
+import pytest
+
+from ear.rules import MetricTable, Rule, Standards, check_reports, load_standards
+
+
+def metrics(total, qv="55.1", kmer="95.5", single="92.0%", duplicated="1.5%", gaps="75", l90="9"):
+    return {"Total bp": total, "GC %": "41.5", "Gaps/Gbp": gaps, "Scaffold L90": l90, "QV": qv, "Kmer compl.": kmer, "BUSCO sing.": single, "BUSCO dupl.": duplicated}
+
+
+def report(expected_sex="XY", observed_sex="XY", observed_size="1,980,000,000", observed_ploidy="2", curated=None):
+    return {
+        "ToLID": "mTesTes1",
+        "Genome Traits": {
+            "Expected": {"Haploid size (bp)": "1,950,000,000", "Haploid Number": "28 (source: direct)", "Ploidy": "2 (source: ancestor)", "Sample Sex": expected_sex},
+            "Observed": {"Haploid size (bp)": observed_size, "Haploid Number": "28", "Ploidy": observed_ploidy, "Sample Sex": observed_sex},
+        },
+        "Metrics": {
+            "Pre-curation hap1": metrics("2,000,000,000"),
+            "Pre-curation hap2": metrics("2,000,000,000"),
+            "Curated hap1": metrics("1,980,000,000"),
+            "Curated hap2": curated or metrics("1,980,000,000"),
+        },
+    }
+
+
+def test_passing_report():
+    assert check_reports([report()]) == [{"traits": [], "curated": []}]
+
+
+def test_flagged_report():
+    curated = metrics("1,900,000,000", qv="39.9", kmer="89", single="85.0%", duplicated="6.1%", gaps="1,200", l90="30")
+    results = check_reports([report(observed_size="2,500,000,000", observed_ploidy="4", curated=curated)])
+    assert results[0]["traits"] == [
+        "Observed Haploid size (bp) has >20% difference with Expected",
+        "Observed Ploidy is different from Expected",
+    ]
+    # quality rules first, then curation ones, each in the order of the standards
+    assert results[0]["curated"] == [
+        "QV value is less than 40 for hap2",
+        "Kmer completeness value is less than 90 for hap2",
+        "BUSCO single copy value is less than 90% for hap2",
+        "BUSCO duplicated value is more than 5% for hap2",
+        "Assembly length loss > 3% for hap2",
+        "More than 1000 gaps/Gbp for hap2",
+        "Not 90% of assembly in chromosomes for hap2",
+    ]
+
+
+@pytest.mark.parametrize("observed_sex, flagged", [("XY", False), (" xy ", False), ("XX", True), ("NA", True), ("", False), (None, False)])
+def test_sex(observed_sex, flagged):
+    # as the report always did, a sex observed as NA differs from the sex of the sample
+    traits = check_reports([report(observed_sex=observed_sex)])[0]["traits"]
+    assert traits == (["Observed sex is different from Sample sex"] if flagged else [])
+
+
+def test_missing_numbers():
+    # NA numbers are not checked, nor are values that are not numbers
+    curated = metrics("1,980,000,000", qv="NA", kmer="N/A", single="", duplicated="unknown")
+    assert check_reports([report(observed_ploidy="NA", curated=curated)]) == [{"traits": [], "curated": []}]
+
+
+def test_several_reports():
+    results = check_reports([report(), None, report(observed_sex="XX")])
+    assert results[0]["traits"] == [] and results[1]["traits"] == []
+    assert results[2]["traits"] == ["Observed sex is different from Sample sex"]
+
+
+def test_table_columns():
+    table = MetricTable([report(observed_sex="NA")])
+    assert table.column("sample", "Observed Sample Sex", "text") == ["na"]
+    assert table.column("sample", "Expected Ploidy") == [2]
+    assert table.column("assembly", "Total bp") == [2000000000, 2000000000, 1980000000, 1980000000]
+    assert table.column("assembly", "Length loss %")[2] == pytest.approx(1.0)
+    assert table.column("sample", "Haploid size difference %") == [pytest.approx(30 / 19.5)]
+
+
+def test_custom_rule():
+    rule = Rule("qv", "curated", "all", "QV", ">=", 55, "QV {value} of {stage} {haplotype}")
+    standards = Standards("test.yaml", "1", [rule], "")
+    assert check_reports([report()], standards)[0]["curated"] == [
+        "QV 55.1 of Pre-curation hap1", "QV 55.1 of Pre-curation hap2", "QV 55.1 of Curated hap1", "QV 55.1 of Curated hap2",
+    ]
+
+
+def test_invalid_standards(tmp_path):
+    with pytest.raises(ValueError, match="unknown comparison"):
+        Rule("qv", "curated", "Curated", "QV", "=<", 40, "QV")
+    with pytest.raises(ValueError, match="unknown kind"):
+        Rule("qv", "curated", "Curated", "QV", "<", 40, "QV", kind="date")
+    path = tmp_path / "standards.yaml"
+    path.write_text("version: 1\nrules:\n  - name: qv\n    metric: QV\n")
+    with pytest.raises(ValueError, match="invalid rule 1"):
+        load_standards(str(path))
+    path.write_text("rules: []\n")
+    with pytest.raises(ValueError, match="is not an EBP standards file"):
+        load_standards(str(path))
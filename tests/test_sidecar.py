@@ -0,0 +1,61 @@
+# The YAML written next to each PDF: the same as EARpdf_to_yaml.py extracts from the PDF, and
+# never written over a file the report did not write
+
+import os
+
+import pytest
+
+from ear.eardata import save_to_yaml
+
+
+@pytest.fixture
+def rendered(tmp_path, ear_fixture, run_make_ear):
+    yaml_file = ear_fixture("mBenTes1")
+    output = tmp_path / "out"
+    output.mkdir()
+    result = run_make_ear(output, yaml_file, "--no-image-optimisation")
+    assert result.returncode == 0, result.stderr
+    return yaml_file, output
+
+
+def test_sidecar_matches_pdf_to_yaml(rendered, monkeypatch):
+    pytest.importorskip("pdfplumber")
+    import EARpdf_to_yaml
+
+    yaml_file, output = rendered
+    sidecar = (output / "mBenTes1_EAR.yaml").read_text(encoding="utf-8")
+    pdf = str(output / "mBenTes1_EAR.pdf")
+    # from the data embedded in the PDF, then from its text as for older PDFs
+    embedded = output / "embedded.yaml"
+    save_to_yaml(EARpdf_to_yaml.extract_data_from_pdf(pdf), str(embedded))
+    assert embedded.read_text(encoding="utf-8") == sidecar
+    monkeypatch.setattr(EARpdf_to_yaml, "extract_embedded_data", lambda pdf_path: None)
+    from_text = output / "text.yaml"
+    save_to_yaml(EARpdf_to_yaml.extract_data_from_pdf(pdf), str(from_text))
+    assert from_text.read_text(encoding="utf-8") == sidecar
+
+
+def test_sidecar_not_overwritten(rendered, run_make_ear):
+    yaml_file, output = rendered
+    sidecar = output / "mBenTes1_EAR.yaml"
+    # edited after the report was made: the report is rebuilt, the YAML left alone
+    sidecar.write_text(sidecar.read_text(encoding="utf-8") + "# checked\n", encoding="utf-8")
+    result = run_make_ear(output, yaml_file, "--no-image-optimisation")
+    assert result.returncode == 0, result.stderr
+    assert sidecar.read_text(encoding="utf-8").endswith("# checked\n")
+    assert "Not writing" in (output / "EAR.log").read_text()
+    result = run_make_ear(output, yaml_file, "--no-image-optimisation", "--force")
+    assert result.returncode == 0, result.stderr
+    assert not sidecar.read_text(encoding="utf-8").endswith("# checked\n")
+
+
+def test_sidecar_rewritten(rendered, run_make_ear):
+    yaml_file, output = rendered
+    # the sidecar of the last run is written again when the report is rebuilt
+    sidecar = output / "mBenTes1_EAR.yaml"
+    os.utime(str(sidecar), ns=(0, 0))
+    os.remove(str(output / "mBenTes1_EAR.pdf"))
+    result = run_make_ear(output, yaml_file, "--no-image-optimisation")
+    assert result.returncode == 0, result.stderr
+    assert "Not writing" not in (output / "EAR.log").read_text()
+    assert sidecar.stat().st_mtime_ns > 0
@@ -0,0 +1,56 @@
+# Offline taxonomy: taxdump index built from a small names.dmp/nodes.dmp, and the provider
+# resolving species with it and a GoaT attribute snapshot
+
+import pytest
+
+from conftest import TAXA
+from ear.taxdump import TaxdumpIndex, TaxdumpTaxonomy
+
+
+def test_find_by_scientific_name_and_synonym(taxdump_index):
+    index = TaxdumpIndex(taxdump_index)
+    assert index.find("Elephas maximus") == 99487
+    assert index.find("  elephas MAXIMUS ") == 99487
+    assert index.find("Elephas indicus") == 99487
+    # common names are not looked up
+    assert index.find("Asian elephant") is None
+    assert index.find("Homo sapiens") is None
+
+
+def test_scientific_name_over_synonym(taxdump_index):
+    # "Elephas maximus" is also a synonym of Loxodonta africana, the scientific name wins
+    assert TaxdumpIndex(taxdump_index).find("Elephas maximus") == 99487
+
+
+def test_lineage_ranks_and_names(taxdump_index):
+    index = TaxdumpIndex(taxdump_index)
+    assert index.lineage(99487) == [99487, 9784, 9783, 40674, 1]
+    assert index.rank(9783) == "order"
+    assert index.scientific_name(40674) == "Mammalia"
+
+
+def test_not_an_index(tmp_path):
+    path = tmp_path / "not.idx"
+    path.write_bytes(b"something else")
+    with pytest.raises(ValueError):
+        TaxdumpIndex(str(path))
+
+
+def test_resolve_with_snapshot(taxdump_index, tmp_path):
+    snapshot = tmp_path / "snapshot.tsv"
+    snapshot.write_text("taxon_id\tploidy\thaploid_number\thaploid_number_source\n"
+                        "99487\t\t28\tdirect\n"
+                        "9783\t2\t\t\n")
+    taxonomy = TaxdumpTaxonomy(taxdump_index, str(snapshot)).resolve("Elephas maximus")
+    assert taxonomy['taxon_id'] == "99487"
+    assert (taxonomy['class'], taxonomy['order']) == ("Mammalia", "Proboscidea")
+    assert (taxonomy['haploid_number'], taxonomy['haploid_source']) == ("28", "direct")
+    # missing for the species, taken from its closest ancestor
+    assert (taxonomy['ploidy'], taxonomy['ploidy_source']) == ("2", "ancestor")
+
+
+def test_resolve_unknown_species(taxdump_index):
+    provider = TaxdumpTaxonomy(taxdump_index)
+    with pytest.raises(LookupError):
+        provider.resolve("Homo sapiens")
+    assert provider.resolve_many(["Homo sapiens", "Elephas maximus"]).keys() == {"Elephas maximus"}
@@ -0,0 +1,117 @@
+# Persistent GoaT cache: hits, TTL expiry, --refresh-taxonomy and compaction of the JSON-lines file
+
+import json
+import types
+
+import pytest
+
+from ear import taxonomy
+from ear.taxonomy import GoatTaxonomy, TaxonomyCache
+
+DAY = 86400
+
+
+class FakeClient:
+    """GoaT answers for any species, counting the requests (a different answer each time)."""
+
+    def __init__(self):
+        self.requests = []
+
+    def search(self, species):
+        self.requests.append(f"search:{species}")
+        return {'taxon_id': '99487', 'class': 'Mammalia', 'order': 'Proboscidea'}
+
+    def record(self, taxon_number):
+        self.requests.append(f"record:{taxon_number}")
+        return {'ploidy': 2, 'ploidy_source': 'direct', 'haploid_number': len(self.requests), 'haploid_source': 'direct'}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = types.SimpleNamespace(value=1_700_000_000.0)
+    monkeypatch.setattr(taxonomy, "time", types.SimpleNamespace(time=lambda: now.value))
+    return now
+
+
+def provider(path, client, ttl_days=30, refresh=False):
+    return GoatTaxonomy(str(path), ttl_days, refresh, client)
+
+
+def test_cache_hit(tmp_path, clock):
+    path = tmp_path / "goat.jsonl"
+    client = FakeClient()
+    first = provider(path, client).resolve("Elephas maximus")
+    assert client.requests == ["search:Elephas maximus", "record:99487"]
+    # another run, a day later, reads it from the file
+    clock.value += DAY
+    assert provider(path, client).resolve("Elephas maximus") == first
+    assert len(client.requests) == 2
+    # species are cached trimmed and case-insensitive
+    assert provider(path, client).resolve(" elephas MAXIMUS")['haploid_number'] == first['haploid_number']
+    assert len(client.requests) == 2
+
+
+def test_cache_expired(tmp_path, clock):
+    path = tmp_path / "goat.jsonl"
+    client = FakeClient()
+    provider(path, client, ttl_days=30).resolve("Elephas maximus")
+    clock.value += 31 * DAY
+    again = provider(path, client, ttl_days=30).resolve("Elephas maximus")
+    assert client.requests == ["search:Elephas maximus", "record:99487"] * 2
+    assert again['haploid_number'] == 4
+    # the new answers are cached
+    assert provider(path, client, ttl_days=30).resolve("Elephas maximus") == again
+    assert len(client.requests) == 4
+
+
+def test_refresh(tmp_path, clock):
+    path = tmp_path / "goat.jsonl"
+    client = FakeClient()
+    provider(path, client).resolve("Elephas maximus")
+    # --refresh-taxonomy: the cache is not read, but updated
+    refreshed = provider(path, client, refresh=True).resolve("Elephas maximus")
+    assert len(client.requests) == 4
+    assert provider(path, client).resolve("Elephas maximus") == refreshed
+    assert len(client.requests) == 4
+
+
+def test_no_cache(clock):
+    client = FakeClient()
+    GoatTaxonomy(None, client=client).resolve("Elephas maximus")
+    GoatTaxonomy(None, client=client).resolve("Elephas maximus")
+    assert len(client.requests) == 4
+
+
+def test_compaction(tmp_path, clock):
+    path = tmp_path / "goat.jsonl"
+    cache = TaxonomyCache(str(path), ttl_days=30)
+    for n in range(200):
+        clock.value += 1
+        for species in ("elephas maximus", "homo sapiens"):
+            cache.put(f"search:{species}", {'taxon_id': str(n)})
+    cache.put("search:old species", {'taxon_id': '1'})
+    with open(path) as file:
+        lines = file.readlines()
+    assert len(lines) == 401
+    # an expired entry, and a line that is not JSON
+    with open(path, "a") as file:
+        file.write(json.dumps({'key': 'search:expired', 'fetched': clock.value - 40 * DAY, 'data': {}}) + "\n")
+        file.write("not json\n")
+
+    compacted = TaxonomyCache(str(path), ttl_days=30)
+    assert compacted.get("search:elephas maximus") == {'taxon_id': '199'}
+    with open(path) as file:
+        entries = [json.loads(line) for line in file]
+    # the latest line of each key, without the expired one
+    assert sorted(entry['key'] for entry in entries) == ["search:elephas maximus", "search:homo sapiens", "search:old species"]
+    assert all(entry['data'] == {'taxon_id': '199'} for entry in entries if entry['key'] != "search:old species")
+
+
+def test_no_compaction_below_threshold(tmp_path, clock):
+    path = tmp_path / "goat.jsonl"
+    cache = TaxonomyCache(str(path))
+    for n in range(50):
+        cache.put("search:elephas maximus", {'taxon_id': str(n)})
+    assert TaxonomyCache(str(path)).get("search:elephas maximus") == {'taxon_id': '49'}
+    with open(path) as file:
+        assert len(file.readlines()) == 50
@@ -0,0 +1,63 @@
+# Stage timings: each stage charged with its own I/O, the taxonomy lookup with what it read in
+# the background
+
+import json
+import os
+import threading
+
+from ear.timings import StageTimings, count_read, counted_apart, io_counters
+
+
+def test_stage_counts(tmp_path):
+    path = tmp_path / "input.txt"
+    path.write_text("12345")
+    timings = StageTimings()
+    with timings.stage('read'):
+        count_read(str(path))
+        count_read(str(path), 3)
+    with timings.stage('idle'):
+        pass
+    assert [(r['stage'], r['files'], r['bytes'], r['requests']) for r in timings.stages] == [('read', 2, 8, 0), ('idle', 0, 0, 0)]
+
+
+# The reads of a thread counting apart go to the stage waiting for it, not to the one running
+# while it reads
+def test_background_reads_charged_to_waiting_stage(tmp_path):
+    path = tmp_path / "snapshot.tsv"
+    path.write_text("taxon_id\n")
+    counters = dict.fromkeys(io_counters, 0)
+    reading, done = threading.Event(), threading.Event()
+
+    def lookup():
+        reading.wait()
+        count_read(str(path))
+        done.set()
+    thread = threading.Thread(target=counted_apart, args=(counters, lookup))
+    thread.start()
+    timings = StageTimings()
+    with timings.stage('parse artifacts'):
+        reading.set()
+        done.wait()
+    thread.join()
+    with timings.stage('fetch taxonomy') as waited:
+        waited.update(counters)
+    parse, fetch = timings.stages
+    assert (parse['files'], parse['bytes']) == (0, 0)
+    assert (fetch['files'], fetch['bytes']) == (1, len("taxon_id\n"))
+
+
+def test_timings_json(tmp_path, ear_fixture, run_make_ear, goat_snapshot):
+    yaml_file = ear_fixture("mBenTes1")
+    result = run_make_ear(tmp_path, yaml_file, "--timings", "json", "--no-image-optimisation")
+    assert result.returncode == 0, result.stderr
+    stages = {r['stage']: r for r in json.loads(result.stdout[result.stdout.index("{"):])['timings']}
+    assert list(stages) == ['load config', 'check manifest', 'parse artifacts', 'fetch taxonomy', 'evaluate checks',
+                            'build flowables', 'write PDF', 'write sidecar', 'write manifest']
+    assert (stages['load config']['files'], stages['load config']['bytes']) == (1, os.path.getsize(yaml_file))
+    # the taxdump index and the snapshot, hashed for the manifest
+    assert stages['check manifest']['files'] == 2
+    # the lookup reads the snapshot, whichever stage runs meanwhile
+    assert (stages['fetch taxonomy']['files'], stages['fetch taxonomy']['bytes']) == (1, os.path.getsize(goat_snapshot))
+    assert stages['parse artifacts']['files'] > 0 and stages['parse artifacts']['bytes'] > 0
+    assert all(stages[name]['files'] == 0 for name in ('evaluate checks', 'write PDF', 'write sidecar'))
+    assert all(r['requests'] == 0 for r in stages.values())